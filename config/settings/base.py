@@ -10,6 +10,36 @@ SECRET_KEY = os.getenv("SECRET_KEY", "insecure-dev-key")
 DEBUG = os.getenv("DEBUG", "0") == "1"
 ALLOWED_HOSTS = [h for h in os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",") if h]
 IMPORT_TOKEN = os.getenv("IMPORT_TOKEN", "")
+# Загрузка событий печати через COPY (только PostgreSQL; на SQLite используется ORM)
+PRINT_EVENTS_COPY_LOADER = os.getenv("PRINT_EVENTS_COPY_LOADER", "1") == "1"
+# Импорт пользователей AD пачками (bulk upsert); 0 — построчно
+USERS_IMPORT_BULK = os.getenv("USERS_IMPORT_BULK", "1") == "1"
+# CSV пользователей — полная выгрузка AD: деактивировать отсутствующих в ней (кроме staff)
+USERS_SYNC_DEACTIVATE_MISSING = os.getenv("USERS_SYNC_DEACTIVATE_MISSING", "0") == "1"
+# Пагинация списка событий: offset (номера страниц) | keyset (курсор по времени, без OFFSET)
+PRINT_EVENTS_PAGINATION = os.getenv("PRINT_EVENTS_PAGINATION", "offset")
+# Число событий в списке: exact (COUNT(*)) | estimate (оценка планировщика PostgreSQL)
+PRINT_EVENTS_COUNT = os.getenv("PRINT_EVENTS_COUNT", "exact")
+# Дерево печати: full (все уровни в одной странице) | lazy (отделы, остальное — по раскрытию)
+PRINT_TREE_MODE = os.getenv("PRINT_TREE_MODE", "full")
+# Крупнейших детей на узел дерева печати, остальные — строкой «прочие»; 0 — без ограничения
+PRINT_TREE_TOP_K = int(os.getenv("PRINT_TREE_TOP_K", "50"))
+# Помесячное секционирование printing_printevent (PostgreSQL): миграция 0009 секционирует таблицу
+# при PRINT_EVENTS_PARTITIONING=1; секции создаются на PRINT_EVENTS_PARTITIONS_AHEAD месяцев вперёд
+PRINT_EVENTS_PARTITIONING = os.getenv("PRINT_EVENTS_PARTITIONING", "0") == "1"
+PRINT_EVENTS_PARTITIONS_AHEAD = int(os.getenv("PRINT_EVENTS_PARTITIONS_AHEAD", "3"))
+# Прогрев кэша статистики после импорта: thread (фоновый поток) | sync | off
+STATS_WARM_MODE = os.getenv("STATS_WARM_MODE", "thread")
+STATS_WARM_PERIODS = os.getenv("STATS_WARM_PERIODS", "current_month,touched_months,dashboard")
+STATS_WARM_DELAY = float(os.getenv("STATS_WARM_DELAY", "2"))
+# Метрики Prometheus на /metrics; METRICS_TOKEN — обязательный Bearer-токен запроса (пусто — без токена)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Каталог снимков метрик процессов: с ним /metrics суммирует все воркеры gunicorn (пусто — только свой)
+METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR", "")
+# Журнал SQL-запросов по отпечаткам (/slow-queries/) и лог запросов дольше порога, мс
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "0") == "1"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
 
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -30,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "printing.middleware.MetricsMiddleware",
+    "printing.middleware.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -109,6 +141,35 @@ def _db_from_env():
 
 DATABASES = {"default": _db_from_env()}
 
+
+def _cache_from_env():
+    # Кэш общий для gunicorn-воркеров и watcher'а только при CACHE_BACKEND=file (общий том
+    # /app/data) или redis; locmem живёт в пределах одного процесса
+    backend = os.getenv("CACHE_BACKEND", "locmem").lower()
+    timeout = int(os.getenv("CACHE_TIMEOUT", "300"))
+    if backend == "locmem":
+        return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "advisor", "TIMEOUT": timeout}
+    if backend == "file":
+        return {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_LOCATION") or str(BASE_DIR / "data" / "cache"),
+            "TIMEOUT": timeout,
+            "KEY_PREFIX": "advisor",
+            "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "10000"))},
+        }
+    if backend == "redis":
+        # Требует пакет redis; подойдёт любой Redis-совместимый сервер (Redis, Valkey, KeyDB)
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_LOCATION") or "redis://127.0.0.1:6379/1",
+            "TIMEOUT": timeout,
+            "KEY_PREFIX": "advisor",
+        }
+    raise ValueError("Unsupported CACHE_BACKEND")
+
+
+CACHES = {"default": _cache_from_env()}
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
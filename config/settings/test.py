@@ -23,6 +23,8 @@ DATABASES = {
 
 # Disable heavy middleware for tests
 MIDDLEWARE = [
+    "printing.middleware.MetricsMiddleware",
+    "printing.middleware.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -43,5 +45,8 @@ CACHES = {
     }
 }
 
+# Statistics cache warming runs explicitly in tests
+STATS_WARM_MODE = "off"
+
 # Disable Windows auth for tests
 ENABLE_WINDOWS_AUTH = False
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 
-from .models import Building, Computer, Department, Port, Printer, PrinterModel, PrintEvent
+from .models import Building, Computer, Department, IngestLedger, Port, Printer, PrinterModel, PrintEvent
 from .resources import (
     BuildingResource,
     ComputerResource,
@@ -11,6 +11,8 @@ from .resources import (
     PrinterResource,
     PrintEventResource,
 )
+from .rollups import refresh_daily_rollups, rollup_key
+from .services import invalidate_statistics_cache
 
 
 @admin.register(Building)
@@ -72,3 +74,43 @@ class PrintEventAdmin(ImportExportModelAdmin):
     ordering = ("-timestamp",)
     date_hierarchy = "timestamp"
     raw_id_fields = ("user", "printer", "computer", "port")
+
+    # Сигнал post_delete на PrintEvent не используется, чтобы каскадные удаления оставались
+    # быстрыми, поэтому суточные итоги пересчитываются здесь
+    def delete_model(self, request, obj):
+        key = rollup_key(obj)
+        super().delete_model(request, obj)
+        refresh_daily_rollups([key])
+        invalidate_statistics_cache()
+
+    def delete_queryset(self, request, queryset):
+        keys = {rollup_key(event) for event in queryset.only("timestamp", "user_id", "printer_id")}
+        super().delete_queryset(request, queryset)
+        refresh_daily_rollups(keys)
+        invalidate_statistics_cache()
+
+
+@admin.register(IngestLedger)
+class IngestLedgerAdmin(admin.ModelAdmin):
+    list_display = (
+        "file_name",
+        "kind",
+        "source",
+        "status",
+        "created_count",
+        "duplicates_count",
+        "errors_count",
+        "skipped_count",
+        "duration",
+        "events_per_second",
+        "started_at",
+    )
+    list_filter = ("status", "kind", "source")
+    search_fields = ("file_name", "content_hash")
+    ordering = ("-started_at",)
+    date_hierarchy = "started_at"
+    readonly_fields = ("content_hash", "byte_size", "started_at", "finished_at", "duration", "metrics")
+
+    @admin.display(description="Событий/с")
+    def events_per_second(self, obj):
+        return obj.events_per_second
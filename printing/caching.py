@@ -0,0 +1,117 @@
+"""
+Кэширование тяжёлой статистики с защитой от «набега» (cache stampede).
+
+Ключи статистики содержат версию (``get_stats_cache_token``), поэтому после импорта все они
+промахиваются одновременно. ``get_or_compute`` пускает на пересчёт ключа только один
+запрос (single-flight: блокировка через атомарный ``cache.add``, общая для воркеров gunicorn
+при общем кэше); остальные отдают предыдущее значение (stale-while-revalidate — ключ без
+версии, обновляемый при каждом пересчёте) или недолго ждут результата.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from typing import TYPE_CHECKING, Any
+
+from django.core.cache import cache
+
+from .metrics import STATS_CACHE
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 60  # сек; блокировка упавшего вычисления освобождается сама
+WAIT_TIMEOUT = 5.0  # сек ожидания чужого пересчёта, затем считаем сами
+POLL_INTERVAL = 0.05
+STALE_TIMEOUT = 7 * 24 * 3600
+
+_MISSING = object()
+
+
+def get_or_compute(
+    key: str,
+    compute: Callable[[], Any],
+    timeout: int | None,
+    *,
+    stale_key: str | None = None,
+    stale_timeout: int | None = STALE_TIMEOUT,
+    lock_timeout: int = LOCK_TIMEOUT,
+    wait: float = WAIT_TIMEOUT,
+    metric: str | None = None,
+) -> Any:
+    """
+    Cache-aside с single-flight: значение ``key`` из кэша или результат ``compute()``.
+
+    Args:
+        key: Ключ кэша (обычно с версией статистики)
+        compute: Вычисление значения; вызывается одним процессом/потоком на ключ
+        timeout: Время жизни значения, сек
+        stale_key: Ключ последнего вычисленного значения (без версии). Если задан, запросы,
+            не получившие блокировку, сразу отдают его вместо ожидания
+        stale_timeout: Время жизни ``stale_key``, сек
+        lock_timeout: Время жизни блокировки, сек
+        wait: Сколько ждать чужого пересчёта, прежде чем посчитать самостоятельно
+        metric: Метка ``key`` счётчика ``advisor_stats_cache_requests_total`` (семейство
+            ключей без токена версии); без неё обращения не учитываются
+
+    Example:
+        >>> stats = get_or_compute(
+        ...     f"department_stats_top_{token}_{period}",
+        ...     lambda: list(department_queryset),
+        ...     300,
+        ...     stale_key=f"department_stats_top_{period}",
+        ...     metric="department_stats",
+        ... )
+    """
+
+    def record(result: str) -> None:
+        if metric is not None:
+            STATS_CACHE.inc(key=metric, result=result)
+
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        record("hit")
+        return value
+
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, lock_timeout):
+        record("miss")
+        try:
+            return _compute_and_store(key, compute, timeout, stale_key, stale_timeout)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    if stale_key is not None:
+        stale = cache.get(stale_key, _MISSING)
+        if stale is not _MISSING:
+            record("stale")
+            return stale
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            record("wait")
+            return value
+        if cache.get(lock_key) is None:
+            break  # пересчёт завершился ошибкой или блокировка истекла
+    logger.warning(f"Не дождались пересчёта {key}, вычисляю самостоятельно")
+    record("miss")
+    return _compute_and_store(key, compute, timeout, stale_key, stale_timeout)
+
+
+def _compute_and_store(
+    key: str, compute: Callable[[], Any], timeout: int | None, stale_key: str | None, stale_timeout: int | None
+) -> Any:
+    value = compute()
+    cache.set(key, value, timeout)
+    if stale_key is not None:
+        cache.set(stale_key, value, stale_timeout)
+    return value
@@ -2,11 +2,15 @@
 Health check endpoint for Docker and load balancers.
 """
 
+import hmac
 import logging
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db import connection
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound, JsonResponse
+
+from .metrics import CONTENT_TYPE, REGISTRY
 
 logger = logging.getLogger(__name__)
 
@@ -44,3 +48,19 @@ def health_check(request):
     status_code = 200 if health_status["status"] == "healthy" else 503
 
     return JsonResponse(health_status, status=status_code)
+
+
+def metrics_view(request):
+    """
+    Метрики Prometheus всех воркеров gunicorn (см. printing.metrics).
+
+    Если задан METRICS_TOKEN, требуется заголовок ``Authorization: Bearer <токен>``.
+    """
+    if not settings.METRICS_ENABLED:
+        return HttpResponseNotFound()
+    expected = (settings.METRICS_TOKEN or "").strip()
+    if expected:
+        provided = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(provided.encode(), expected.encode()):
+            return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.collect(settings.METRICS_MULTIPROCESS_DIR), content_type=CONTENT_TYPE)
@@ -9,5 +9,5 @@ def import_users_from_csv(file):
     return import_users_from_csv_stream(file)
 
 
-def import_print_events_from_json(events):
-    return import_print_events(events)
+def import_print_events_from_json(events, resolver=None):
+    return import_print_events(events, resolver=resolver)
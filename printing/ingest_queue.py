@@ -0,0 +1,261 @@
+"""
+Очередь обработки входящих файлов для watcher-демона.
+
+``OrderedWorkerPool`` раздаёт файлы пулу потоков: файлы разных источников (``dc``, ``print1``,
+``print2`` — префикс ``<source>__`` из ``scripts/ingest_mover.sh``) обрабатываются параллельно,
+а файлы одного источника — строго по очереди, в порядке поступления. Каждый поток работает
+со своим соединением Django (они thread-local); устаревшие соединения закрываются до и после
+каждого файла.
+
+``RetryScheduler`` откладывает повторную обработку файла после ошибки: вместо ``time.sleep``
+в потоке обработки файл ставится в очередь с моментом следующей попытки, и отдельный поток
+возвращает его в пул, когда срок наступает. Состояние повторов хранится в JSON-файле и
+подхватывается после перезапуска watcher'а.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from django.db import close_old_connections
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SOURCE_SEPARATOR = "__"
+
+
+def source_key(path: str) -> str:
+    """Возвращает источник файла по префиксу ``<source>__`` (пустая строка, если префикса нет)."""
+    name = os.path.basename(path)
+    source, sep, _ = name.partition(SOURCE_SEPARATOR)
+    return source if sep else ""
+
+
+class OrderedWorkerPool:
+    """
+    Пул потоков с сохранением порядка внутри ключа.
+
+    Args:
+        handler: Функция обработки одного файла (получает путь)
+        workers: Число потоков
+        key_func: Ключ упорядочивания; файлы с одинаковым ключом не обрабатываются одновременно
+
+    Example:
+        >>> pool = OrderedWorkerPool(handler._process_file, workers=4)
+        >>> pool.submit("/app/data/watch/print1__events.json")
+        >>> pool.wait()
+    """
+
+    def __init__(self, handler: Callable[[str], None], workers: int = 1, key_func: Callable[[str], str] = source_key):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.key_func = key_func
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        self._queues: dict[str, deque[str]] = {}
+        self._active_keys: set[str] = set()
+        self._pending: set[str] = set()
+        self._cond = threading.Condition()
+
+    def submit(self, path: str) -> bool:
+        """Ставит файл в очередь. Возвращает False, если он уже ожидает или обрабатывается."""
+        key = self.key_func(path)
+        with self._cond:
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+            self._queues.setdefault(key, deque()).append(path)
+            if key in self._active_keys:
+                return True
+            self._active_keys.add(key)
+        self._executor.submit(self._drain, key)
+        return True
+
+    def _drain(self, key: str) -> None:
+        while True:
+            with self._cond:
+                queue = self._queues.get(key)
+                if not queue:
+                    self._queues.pop(key, None)
+                    self._active_keys.discard(key)
+                    self._cond.notify_all()
+                    return
+                path = queue.popleft()
+            close_old_connections()
+            try:
+                self.handler(path)
+            except Exception:
+                logger.error(f"Необработанная ошибка при обработке {path}", exc_info=True)
+            finally:
+                close_old_connections()
+                with self._cond:
+                    self._pending.discard(path)
+                    self._cond.notify_all()
+
+    @property
+    def backlog(self) -> int:
+        """Число файлов, ожидающих или находящихся в обработке."""
+        with self._cond:
+            return len(self._pending)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Ждёт, пока все поставленные файлы будут обработаны."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+@dataclass
+class RetryState:
+    """Состояние повторов одного файла (время — Unix timestamp)."""
+
+    path: str
+    attempts: int
+    first_failed_at: float
+    next_attempt_at: float
+    last_error: str = ""
+
+
+class RetryScheduler:
+    """
+    Планировщик отложенных повторов обработки файлов.
+
+    Args:
+        submit: Функция, возвращающая файл в обработку (обычно ``OrderedWorkerPool.submit``)
+        state_file: JSON-файл состояния; None — состояние только в памяти
+
+    Example:
+        >>> retries = RetryScheduler(pool.submit, "/app/data/watcher_retry_state.json")
+        >>> retries.start()
+        >>> retries.schedule(path, delay=4, error="PermissionError: ...")
+    """
+
+    def __init__(self, submit: Callable[[str], Any], state_file: str | None = None):
+        self.submit = submit
+        self.state_file = state_file
+        self._states: dict[str, RetryState] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self._load()
+
+    def __contains__(self, path: object) -> bool:
+        with self._cond:
+            return path in self._states
+
+    def get(self, path: str) -> RetryState | None:
+        with self._cond:
+            return self._states.get(path)
+
+    def snapshot(self) -> list[RetryState]:
+        """Текущие ожидающие повторы, ближайшие первыми."""
+        with self._cond:
+            return sorted(self._states.values(), key=lambda state: state.next_attempt_at)
+
+    def schedule(self, path: str, delay: float, error: str = "") -> RetryState:
+        """Планирует следующую попытку через ``delay`` секунд и увеличивает счётчик попыток."""
+        now = time.time()
+        with self._cond:
+            state = self._states.get(path)
+            if state is None:
+                state = RetryState(path=path, attempts=0, first_failed_at=now, next_attempt_at=now)
+                self._states[path] = state
+            state.attempts += 1
+            state.next_attempt_at = now + delay
+            state.last_error = error
+            heapq.heappush(self._heap, (state.next_attempt_at, path))
+            self._save()
+            self._cond.notify_all()
+            return state
+
+    def forget(self, path: str) -> None:
+        """Удаляет состояние файла (успешная обработка, карантин или файл исчез)."""
+        with self._cond:
+            if self._states.pop(path, None) is not None:
+                self._save()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ingest-retry", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _pop_due(self) -> list[str]:
+        """Забирает наступившие повторы; устаревшие записи кучи (перепланированные, забытые) пропускаются."""
+        now = time.time()
+        due: list[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            when, path = heapq.heappop(self._heap)
+            state = self._states.get(path)
+            if state is not None and state.next_attempt_at == when:
+                due.append(path)
+        return due
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                due = self._pop_due()
+                if not due:
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout)
+                    continue
+            for path in due:
+                if not os.path.exists(path):
+                    logger.info(f"Файл {path} исчез до повторной попытки, повтор отменён")
+                    self.forget(path)
+                    continue
+                logger.info(f"Повторная обработка {path}")
+                self.submit(path)
+
+    def _load(self) -> None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                entries = json.load(f)
+            states = [RetryState(**entry) for entry in entries]
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Не удалось прочитать состояние повторов {self.state_file}: {e}")
+            return
+        for state in states:
+            if os.path.exists(state.path):
+                self._states[state.path] = state
+                heapq.heappush(self._heap, (state.next_attempt_at, state.path))
+        if self._states:
+            logger.info(f"Восстановлено отложенных повторов: {len(self._states)}")
+
+    def _save(self) -> None:
+        if not self.state_file:
+            return
+        tmp_path = f"{self.state_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([asdict(state) for state in self._states.values()], f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить состояние повторов {self.state_file}: {e}")
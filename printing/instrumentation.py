@@ -0,0 +1,120 @@
+"""
+Поэтапные замеры импорта событий печати.
+
+``IngestStats`` собирает время и число SQL-запросов по этапам импорта (чтение, разбор, поиск
+дубликатов, разрешение справочников, вставка, суточные итоги, сигналы и кэш) и пропускную
+способность. Запросы считаются через ``connection.execute_wrapper``, поэтому DEBUG не нужен::
+
+    stats = IngestStats()
+    with stats.track_queries():
+        with stats.stage("parse"):
+            ...
+    metrics = stats.as_dict()  # попадает в результат импорта, лог и IngestLedger.metrics
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+
+from django.db import connection
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+# Этапы импорта событий в порядке выполнения
+INGEST_STAGES = ("read", "parse", "dedup", "resolve", "insert", "rollups", "signals")
+
+
+class IngestStats:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.rows = 0  # прочитано событий
+        self.seconds = dict.fromkeys(INGEST_STAGES, 0.0)
+        self.queries = dict.fromkeys(INGEST_STAGES, 0)
+        self._current: str | None = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Относит время и запросы блока к этапу ``name`` (этапы не вкладываются)."""
+        previous, self._current = self._current, name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - started
+            self._current = previous
+
+    def _count_query(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any) -> Any:
+        if self._current is not None:
+            self.queries[self._current] += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def track_queries(self) -> Iterator[None]:
+        with connection.execute_wrapper(self._count_query):
+            yield
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Returns:
+            dict: ``{"rows", "seconds", "events_per_second", "queries", "stages": {этап: {"seconds", "queries"}}}``
+        """
+        seconds = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "seconds": round(seconds, 4),
+            "events_per_second": round(self.rows / seconds, 1) if seconds else None,
+            "queries": sum(self.queries.values()),
+            "stages": {
+                name: {"seconds": round(self.seconds[name], 4), "queries": self.queries[name]} for name in INGEST_STAGES
+            },
+        }
+
+
+def format_ingest_metrics(metrics: dict[str, Any]) -> str:
+    """Метрики импорта одной строкой ``key=value`` (удобно для grep и разбора логов)."""
+    parts = [
+        f"rows={metrics['rows']}",
+        f"seconds={metrics['seconds']}",
+        f"events_per_second={metrics['events_per_second']}",
+        f"queries={metrics['queries']}",
+    ]
+    parts.extend(
+        f"{name}={stage['seconds']:.3f}s/{stage['queries']}q" for name, stage in metrics.get("stages", {}).items()
+    )
+    return " ".join(parts)
+
+
+def summarize_ingest_metrics(metrics_list: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Сводит метрики нескольких импортов: суммы по этапам и доля каждого этапа во времени.
+
+    Returns:
+        dict: ``{"files", "rows", "seconds", "events_per_second", "queries",
+        "stages": {этап: {"seconds", "queries", "share"}}}``
+    """
+    files = rows = queries = 0
+    seconds = 0.0
+    stages = {name: {"seconds": 0.0, "queries": 0} for name in INGEST_STAGES}
+    for metrics in metrics_list:
+        files += 1
+        rows += metrics.get("rows", 0)
+        seconds += metrics.get("seconds", 0.0)
+        queries += metrics.get("queries", 0)
+        for name, stage in metrics.get("stages", {}).items():
+            total = stages.setdefault(name, {"seconds": 0.0, "queries": 0})
+            total["seconds"] += stage.get("seconds", 0.0)
+            total["queries"] += stage.get("queries", 0)
+    for stage in stages.values():
+        stage["seconds"] = round(stage["seconds"], 4)
+        stage["share"] = round(stage["seconds"] / seconds, 4) if seconds else 0.0
+    return {
+        "files": files,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "events_per_second": round(rows / seconds, 1) if seconds else None,
+        "queries": queries,
+        "stages": stages,
+    }
@@ -0,0 +1,151 @@
+"""
+Журнал импорта (IngestLedger): повторно доставленный файл распознаётся по SHA-256 и размеру
+содержимого и не разбирается заново.
+
+Типичный сценарий::
+
+    content_hash, size = hash_stream(f)
+    entry, claimed = claim_ingest(content_hash, size, kind=IngestLedger.KIND_EVENTS, source=IngestLedger.SOURCE_WATCHER)
+    if not claimed:
+        ...  # уже импортирован (entry.status == DONE) или импортируется параллельно (PROCESSING)
+    try:
+        result = import_print_events(...)
+    except Exception as exc:
+        record_ingest_failure(entry, exc)
+        raise
+    record_ingest_result(entry, result)  # только ошибки и ни одной записи — статус FAILED
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from datetime import timedelta
+from typing import IO, Any
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import IngestLedger
+
+logger = logging.getLogger(__name__)
+
+HASH_READ_SIZE = 1024 * 1024
+# Запись «обрабатывается» старше этого считается брошенной (процесс упал) и захватывается снова
+PROCESSING_TIMEOUT = timedelta(hours=1)
+# Счётчики результата импорта, означающие, что содержимое хотя бы частично применено
+_PROGRESS_COUNTS = ("created", "duplicates", "updated", "unchanged", "deactivated")
+
+
+class IngestInProgressError(RuntimeError):
+    """То же содержимое сейчас импортирует другой поток или процесс."""
+
+
+def hash_stream(
+    stream: IO[bytes], read_size: int = HASH_READ_SIZE, copy_to: IO[bytes] | None = None
+) -> tuple[str, int]:
+    """
+    Считает SHA-256 и размер содержимого потока, читая его блоками.
+
+    Поток читается до конца; позиция не восстанавливается. Непозиционируемый поток
+    (тело HTTP-запроса) можно одновременно скопировать в ``copy_to`` для последующего разбора.
+
+    Returns:
+        tuple[str, int]: (hex-дайджест, размер в байтах)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := stream.read(read_size):
+        digest.update(chunk)
+        size += len(chunk)
+        if copy_to is not None:
+            copy_to.write(chunk)
+    return digest.hexdigest(), size
+
+
+def claim_ingest(
+    content_hash: str, byte_size: int, *, kind: str, source: str, file_name: str = ""
+) -> tuple[IngestLedger, bool]:
+    """
+    Регистрирует начало импорта содержимого.
+
+    Захват атомарен: из двух одновременных доставок одного содержимого импорт выполняет одна.
+
+    Returns:
+        tuple[IngestLedger, bool]: (запись, True) — запись переведена в статус «обрабатывается»,
+        импорт нужно выполнить; (запись, False) — разбор не нужен: содержимое уже успешно
+        импортировано (``STATUS_DONE``, счётчик пропусков увеличивается) или импортируется
+        сейчас (``STATUS_PROCESSING`` моложе PROCESSING_TIMEOUT)
+    """
+    defaults = {"kind": kind, "source": source, "file_name": file_name[:255], "attempts": 1}
+    try:
+        with transaction.atomic():
+            entry, created = IngestLedger.objects.get_or_create(
+                content_hash=content_hash, byte_size=byte_size, defaults=defaults
+            )
+    except IntegrityError:
+        # Параллельная регистрация того же содержимого
+        entry, created = IngestLedger.objects.get(content_hash=content_hash, byte_size=byte_size), False
+
+    if created:
+        return entry, True
+    if entry.status == IngestLedger.STATUS_DONE:
+        IngestLedger.objects.filter(pk=entry.pk).update(skipped_count=F("skipped_count") + 1)
+        logger.info(f"Содержимое {file_name or content_hash} уже импортировано ({entry.finished_at}), пропускаю")
+        return entry, False
+    now = timezone.now()
+    if entry.status == IngestLedger.STATUS_PROCESSING:
+        if entry.started_at > now - PROCESSING_TIMEOUT:
+            logger.info(f"Содержимое {file_name or content_hash} уже импортируется (с {entry.started_at})")
+            return entry, False
+        logger.warning(f"Импорт {entry.file_name or content_hash} с {entry.started_at} не завершён, захватываю заново")
+
+    # Повтор после ошибки или брошенного импорта. Условие на прежние статус и время начала
+    # не даёт двум доставкам захватить запись одновременно
+    claimed = IngestLedger.objects.filter(pk=entry.pk, status=entry.status, started_at=entry.started_at).update(
+        status=IngestLedger.STATUS_PROCESSING,
+        source=source,
+        file_name=defaults["file_name"],
+        attempts=F("attempts") + 1,
+        started_at=now,
+        finished_at=None,
+    )
+    entry.refresh_from_db()
+    return entry, bool(claimed)
+
+
+def _finish(entry: IngestLedger, status: str) -> None:
+    entry.status = status
+    entry.finished_at = timezone.now()
+    entry.duration = (entry.finished_at - entry.started_at).total_seconds()
+
+
+def record_ingest_result(entry: IngestLedger, result: dict[str, Any]) -> bool:
+    """
+    Сохраняет счётчики из результата импорта и отмечает импорт завершённым.
+
+    Результат только с ошибками (ни одной созданной, обновлённой или уже существующей записи —
+    например, ``"Users import failed: ..."``) отмечается как неудачный: следующая доставка того же
+    содержимого будет импортирована снова.
+
+    Returns:
+        bool: True — импорт отмечен успешным (``STATUS_DONE``)
+    """
+    errors = result.get("errors") or []
+    succeeded = not errors or any(result.get(key) for key in _PROGRESS_COUNTS)
+    _finish(entry, IngestLedger.STATUS_DONE if succeeded else IngestLedger.STATUS_FAILED)
+    entry.created_count = result.get("created", 0)
+    entry.duplicates_count = result.get("duplicates", 0)
+    entry.errors_count = len(errors)
+    entry.metrics = result.get("metrics") or {}
+    entry.last_error = "" if succeeded else str(errors[0])[:1000]
+    entry.save()
+    return succeeded
+
+
+def record_ingest_failure(entry: IngestLedger, exc: BaseException) -> None:
+    """Отмечает неудачный импорт; следующая доставка того же содержимого будет импортирована снова."""
+    _finish(entry, IngestLedger.STATUS_FAILED)
+    entry.last_error = f"{type(exc).__name__}: {exc}"
+    entry.save()
@@ -0,0 +1,113 @@
+"""
+Быстрая загрузка событий печати в PostgreSQL через COPY.
+
+Строки PrintEvent с уже разрешёнными внешними ключами передаются в временную staging-таблицу
+через ``COPY FROM STDIN`` и затем переносятся в ``printing_printevent`` одним
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING``. На остальных СУБД (SQLite в тестах и
+dev-окружении) ``copy_loader_available()`` возвращает False и используется ORM-путь.
+"""
+
+from __future__ import annotations
+
+import io
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import PrintEvent
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+STAGING_TABLE = "printing_printevent_staging"
+COPY_COLUMNS = (
+    "document_id",
+    "document_name",
+    "user_id",
+    "printer_id",
+    "job_id",
+    "timestamp",
+    "byte_size",
+    "pages",
+    "created_at",
+    "computer_id",
+    "port_id",
+)
+
+
+def copy_loader_available() -> bool:
+    """COPY-загрузка включена настройкой PRINT_EVENTS_COPY_LOADER и поддерживается СУБД."""
+    return bool(getattr(settings, "PRINT_EVENTS_COPY_LOADER", False)) and connection.vendor == "postgresql"
+
+
+def _copy_value(value: Any) -> str:
+    """Сериализует значение для текстового формата COPY."""
+    if value is None:
+        return "\\N"
+    text = value.isoformat() if isinstance(value, datetime) else str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_payload(rows: Sequence[PrintEvent]) -> io.StringIO:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(getattr(row, column)) for column in COPY_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_into(cursor: Any, sql: str, payload: io.StringIO) -> None:
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, "copy_expert"):  # psycopg2
+        raw_cursor.copy_expert(sql, payload)
+    else:  # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            copy.write(payload.getvalue())
+
+
+def copy_print_events(rows: Sequence[PrintEvent]) -> list[PrintEvent]:
+    """
+    Загружает события через COPY в staging-таблицу и переносит их в printing_printevent.
+
+    Конфликты уникальности (уже загруженный ``job_id``) пропускаются на стороне БД.
+    Нарушение внешнего ключа или другая ошибка поднимается как ``DatabaseError`` после
+    отката всей пачки — вызывающий код может повторить её через ORM.
+
+    Args:
+        rows: Несохранённые экземпляры PrintEvent с заполненными ``*_id``
+
+    Returns:
+        list[PrintEvent]: Действительно вставленные строки (без дубликатов)
+
+    Example:
+        >>> inserted = copy_print_events(rows)
+        >>> duplicates = len(rows) - len(inserted)
+    """
+    if not rows:
+        return []
+    qn = connection.ops.quote_name
+    columns = ", ".join(qn(column) for column in COPY_COLUMNS)
+    staging = qn(STAGING_TABLE)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {qn(PrintEvent._meta.db_table)} WITH NO DATA"
+        )
+        _copy_into(cursor, f"COPY {staging} ({columns}) FROM STDIN", _copy_payload(rows))
+        cursor.execute(
+            f"INSERT INTO {qn(PrintEvent._meta.db_table)} ({columns}) "
+            f"SELECT {columns} FROM {staging} ON CONFLICT DO NOTHING RETURNING {qn('id')}, {qn('job_id')}"
+        )
+        inserted_ids = {job_id: pk for pk, job_id in cursor.fetchall()}
+        cursor.execute(f"DROP TABLE {staging}")
+    inserted: list[PrintEvent] = []
+    for row in rows:
+        pk = inserted_ids.pop(row.job_id, None)
+        if pk is not None:
+            row.pk = pk
+            inserted.append(row)
+    return inserted
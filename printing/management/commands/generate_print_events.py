@@ -0,0 +1,108 @@
+import time
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from printing.partitions import ensure_partitions
+from printing.services import invalidate_statistics_cache
+from printing.synthetic import (
+    BATCH_SIZE,
+    DEFAULT_PREFIX,
+    SyntheticDataError,
+    SyntheticDimensions,
+    generate_dimensions,
+    load_print_events,
+    write_event_files,
+    write_users_csv,
+)
+
+
+class Command(BaseCommand):  # type: ignore[misc]
+    help = (
+        "Генерирует синтетический набор данных печати для нагрузочного тестирования: "
+        "в БД (COPY/bulk_create) или в файлы формата watcher (JSON событий и CSV пользователей AD)"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--events", type=int, default=100_000, help="Число событий (по умолчанию 100000)")
+        parser.add_argument("--departments", type=int, default=20, help="Число отделов")
+        parser.add_argument("--buildings", type=int, default=5, help="Число зданий")
+        parser.add_argument("--printers", type=int, default=100, help="Число принтеров")
+        parser.add_argument("--users", type=int, default=1000, help="Число пользователей")
+        parser.add_argument("--days", type=int, default=90, help="Период событий до текущего момента, дней")
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Зерно генератора: одинаковое зерно — одинаковые данные"
+        )
+        parser.add_argument(
+            "--prefix", default=DEFAULT_PREFIX, help="Префикс кодов и имён, отличающий набор от реальных данных"
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Событий в одной пачке загрузки")
+        parser.add_argument(
+            "--output-dir",
+            help="Не писать в БД, а выгрузить <prefix>_users.csv и <prefix>_events_NNNNN.json в каталог",
+        )
+        parser.add_argument("--per-file", type=int, default=5000, help="Событий в одном JSON-файле (с --output-dir)")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["events"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--events не может быть отрицательным, --batch-size — меньше 1")
+        started = time.monotonic()
+        output_dir = Path(options["output_dir"]) if options["output_dir"] else None
+        try:
+            dims = generate_dimensions(
+                departments=options["departments"],
+                buildings=options["buildings"],
+                printers=options["printers"],
+                users=options["users"],
+                seed=options["seed"],
+                prefix=options["prefix"],
+                save=output_dir is None,
+            )
+            if output_dir is not None:
+                self._write_files(dims, output_dir, options)
+            else:
+                self._load(dims, options)
+        except SyntheticDataError as e:
+            raise CommandError(str(e)) from e
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.monotonic() - started:.1f} с"))
+
+    def _load(self, dims: SyntheticDimensions, options: dict[str, Any]) -> None:
+        total = options["events"]
+
+        def progress(created: int) -> None:
+            self.stdout.write(f"Загружено событий: {created} из {total}")
+
+        created = load_print_events(
+            dims,
+            total,
+            days=options["days"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            progress=progress,
+        )
+        partitions = ensure_partitions()
+        invalidate_statistics_cache()
+        self.stdout.write(
+            f"Справочники: {len(dims.departments)} отделов, {len(dims.buildings)} зданий, "
+            f"{len(dims.printers)} принтеров, {len(dims.users)} пользователей"
+        )
+        if partitions:
+            self.stdout.write(f"Созданы секции: {', '.join(partitions)}")
+        self.stdout.write(f"Создано событий: {created}")
+
+    def _write_files(self, dims: SyntheticDimensions, output_dir: Path, options: dict[str, Any]) -> None:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        users_path = output_dir / f"{dims.prefix}_users.csv"
+        with users_path.open("w", encoding="utf-8", newline="") as f:
+            write_users_csv(dims, f)
+        paths = write_event_files(
+            dims,
+            output_dir,
+            options["events"],
+            per_file=options["per_file"],
+            days=options["days"],
+            seed=options["seed"],
+        )
+        self.stdout.write(f"Пользователи: {users_path}")
+        self.stdout.write(f"Файлов событий: {len(paths)} в {output_dir}")
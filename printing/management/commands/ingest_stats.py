@@ -0,0 +1,40 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from printing.instrumentation import summarize_ingest_metrics
+from printing.models import IngestLedger
+
+
+class Command(BaseCommand):  # type: ignore[misc]
+    help = "Сводка поэтапных замеров последних импортов событий (журнал IngestLedger): какой этап преобладает"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--last", type=int, default=50, help="Сколько последних импортов учесть (по умолчанию 50)")
+        parser.add_argument(
+            "--source",
+            choices=[value for value, _label in IngestLedger.SOURCE_CHOICES],
+            help="Только watcher или upload",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["last"] < 1:
+            raise CommandError("--last должно быть положительным")
+        entries = IngestLedger.objects.filter(kind=IngestLedger.KIND_EVENTS, status=IngestLedger.STATUS_DONE)
+        if options["source"]:
+            entries = entries.filter(source=options["source"])
+        metrics = [
+            entry.metrics for entry in entries.order_by("-started_at")[: options["last"]] if entry.metrics.get("stages")
+        ]
+        if not metrics:
+            self.stdout.write("Нет импортов с замерами")
+            return
+
+        summary = summarize_ingest_metrics(metrics)
+        self.stdout.write(
+            f"Импортов: {summary['files']}, событий: {summary['rows']}, {summary['seconds']:.2f} с, "
+            f"{summary['events_per_second']} событий/с, запросов: {summary['queries']}"
+        )
+        self.stdout.write(f"{'Этап':<10} {'Время, с':>10} {'Доля':>7} {'Запросов':>9}")
+        for name, stage in summary["stages"].items():
+            self.stdout.write(f"{name:<10} {stage['seconds']:>10.3f} {stage['share']:>7.1%} {stage['queries']:>9}")
@@ -0,0 +1,74 @@
+from datetime import date
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+from printing.partitions import (
+    PartitioningError,
+    add_months,
+    convert_to_partitioned,
+    detach_partitions,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+)
+
+
+class Command(BaseCommand):  # type: ignore[misc]
+    help = "Помесячные секции таблицы событий печати (PostgreSQL): status, convert, ensure, detach"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("action", choices=["status", "convert", "ensure", "detach"])
+        parser.add_argument(
+            "--ahead", type=int, help="ensure/convert: месяцев вперёд (по умолчанию — PRINT_EVENTS_PARTITIONS_AHEAD)"
+        )
+        parser.add_argument("--before", help="detach: отсоединить секции раньше этого месяца, YYYY-MM")
+        parser.add_argument("--keep-months", type=int, help="detach: оставить столько последних месяцев")
+        parser.add_argument("--drop", action="store_true", help="detach: удалить отсоединённые секции")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        action = options["action"]
+        try:
+            if action == "status":
+                self._status()
+            elif action == "convert":
+                created = convert_to_partitioned(options["ahead"])
+                self.stdout.write(self.style.SUCCESS(f"Таблица секционирована: {len(created)} секций"))
+            elif action == "ensure":
+                if not is_partitioned():
+                    raise CommandError("Таблица событий не секционирована (см. print_event_partitions convert)")
+                created = ensure_partitions(options["ahead"])
+                self.stdout.write(self.style.SUCCESS(f"Создано секций: {len(created)}"))
+                for name in created:
+                    self.stdout.write(f"  {name}")
+            else:
+                detached = detach_partitions(self._detach_before(options), drop=options["drop"])
+                verb = "Удалено" if options["drop"] else "Отсоединено"
+                self.stdout.write(self.style.SUCCESS(f"{verb} секций: {len(detached)}"))
+                for name in detached:
+                    self.stdout.write(f"  {name}")
+        except PartitioningError as e:
+            raise CommandError(str(e)) from e
+
+    def _status(self) -> None:
+        if not is_partitioned():
+            self.stdout.write("Таблица событий не секционирована")
+            return
+        partitions = list_partitions()
+        self.stdout.write(f"Секций: {len(partitions)}")
+        for name, _month in partitions:
+            self.stdout.write(f"  {name}")
+
+    def _detach_before(self, options: dict[str, Any]) -> date:
+        if bool(options["before"]) == (options["keep_months"] is not None):
+            raise CommandError("Для detach укажите ровно одно из --before и --keep-months")
+        if options["before"]:
+            try:
+                return date.fromisoformat(f"{options['before']}-01")
+            except ValueError as e:
+                raise CommandError(f"Неверный месяц: {options['before']}") from e
+        if options["keep_months"] < 1:
+            raise CommandError("--keep-months должен быть не меньше 1")
+        return add_months(month_start(timezone.localdate()), 1 - options["keep_months"])
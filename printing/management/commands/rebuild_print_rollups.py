@@ -0,0 +1,28 @@
+from datetime import date
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from printing.rollups import rebuild_daily_rollups
+from printing.services import invalidate_statistics_cache
+
+
+class Command(BaseCommand):  # type: ignore[misc]
+    help = "Перестраивает суточные итоги печати (PrintDailyRollup) по событиям PrintEvent"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--start", help="Первая дата периода, YYYY-MM-DD (по умолчанию — первое событие)")
+        parser.add_argument("--end", help="Последняя дата периода, YYYY-MM-DD (по умолчанию — последнее событие)")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) if options["end"] else None
+        except ValueError as e:
+            raise CommandError(f"Неверная дата: {e}") from e
+        if start and end and start > end:
+            raise CommandError("--start позже --end")
+
+        created = rebuild_daily_rollups(start, end)
+        invalidate_statistics_cache()
+        self.stdout.write(self.style.SUCCESS(f"Итоги перестроены: {created} строк"))
@@ -0,0 +1,37 @@
+from datetime import date
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from printing.warming import WARM_PERIODS, warm_statistics_cache
+
+
+class Command(BaseCommand):  # type: ignore[misc]
+    help = "Прогревает кэш статистики, дерева печати и dashboard"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--date",
+            action="append",
+            default=[],
+            help="Дата, YYYY-MM-DD: прогреть её месяц (touched_months); можно указать несколько раз",
+        )
+        parser.add_argument(
+            "--periods",
+            help=f"Виды периодов через запятую: {', '.join(WARM_PERIODS)} (по умолчанию — STATS_WARM_PERIODS)",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            dates = [date.fromisoformat(value) for value in options["date"]]
+        except ValueError as e:
+            raise CommandError(f"Неверная дата: {e}") from e
+        periods = None
+        if options["periods"]:
+            periods = [period.strip() for period in options["periods"].split(",") if period.strip()]
+            unknown = set(periods) - set(WARM_PERIODS)
+            if unknown:
+                raise CommandError(f"Неизвестные периоды: {', '.join(sorted(unknown))}")
+
+        warmed = warm_statistics_cache(dates, periods)
+        self.stdout.write(self.style.SUCCESS(f"Кэш прогрет: {warmed} периодов"))
@@ -0,0 +1,310 @@
+"""
+Метрики веб-приложения и watcher'а в текстовом формате Prometheus (exposition format 0.0.4).
+
+Реестр — собственный и минимальный (счётчики, gauge, гистограммы с метками), без внешних
+зависимостей. Веб отдаёт метрики на ``/metrics`` (``health.metrics_view``), watcher — встроенным
+HTTP-сервером (``start_metrics_server``).
+
+У gunicorn несколько воркеров, а запрос ``/metrics`` попадает в один из них. Если задан
+``METRICS_MULTIPROCESS_DIR``, каждый процесс не чаще раза в ``FLUSH_INTERVAL`` секунд сохраняет
+снимок своих счётчиков и гистограмм в ``<каталог>/<pid>.json``, а ``/metrics`` складывает снимки
+всех процессов (значения завершившихся воркеров тоже остаются в сумме). Gauge не складываются:
+в выдачу попадают только значения отвечающего процесса.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FLUSH_INTERVAL = 5.0  # сек между сохранениями снимка процесса
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Registry | None = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels: dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            samples = {json.dumps(key): value for key, value in self._values.items()}
+        return {"kind": self.kind, "help": self.documentation, "labelnames": self.labelnames, "samples": samples}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._function: Callable[[], dict[LabelValues, float]] | None = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, function: Callable[[], dict[LabelValues, float]]) -> None:
+        """Значения вычисляются при каждой выдаче: ``function() -> {значения меток: число}``."""
+        self._function = function
+
+    def snapshot(self) -> dict[str, Any]:
+        if self._function is not None:
+            try:
+                values = self._function()
+            except Exception:  # noqa: BLE001 - сбой одной метрики не должен ломать выдачу
+                logger.warning(f"Не удалось вычислить {self.name}", exc_info=True)
+                values = {}
+            with self._lock:
+                self._values = {tuple(key): float(value) for key, value in values.items()}
+        return super().snapshot()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args: Any, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # [счётчики по корзинам (не накопленные)..., сумма, количество]
+            sample = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[index] += 1
+                    break
+            sample[-2] += value
+            sample[-1] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        data = super().snapshot()
+        data["samples"] = {key: list(value) for key, value in data["samples"].items()}
+        data["buckets"] = self.buckets
+        return data
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def register(self, metric: Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def clear(self) -> None:
+        """Обнуляет значения всех метрик (для тестов)."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def flush(self, directory: str | None, *, force: bool = False) -> None:
+        """Сохраняет снимок процесса в ``directory`` не чаще раза в FLUSH_INTERVAL."""
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        path = Path(directory) / f"{os.getpid()}.json"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_suffix(".tmp")
+            partial.write_text(json.dumps(self.snapshot(), ensure_ascii=False), encoding="utf-8")
+            partial.replace(path)
+        except OSError:
+            logger.warning(f"Не удалось сохранить снимок метрик в {path}", exc_info=True)
+
+    def collect(self, directory: str | None = None) -> str:
+        """Метрики в формате Prometheus: этот процесс плюс снимки остальных из ``directory``."""
+        merged = self.snapshot()
+        if directory:
+            own = f"{os.getpid()}.json"
+            for path in sorted(Path(directory).glob("*.json")) if Path(directory).is_dir() else ():
+                if path.name == own:
+                    continue
+                try:
+                    _merge(merged, json.loads(path.read_text(encoding="utf-8")))
+                except (OSError, ValueError):
+                    logger.warning(f"Пропущен повреждённый снимок метрик {path}", exc_info=True)
+        return render(merged)
+
+
+def _merge(target: dict[str, dict[str, Any]], other: dict[str, dict[str, Any]]) -> None:
+    for name, data in other.items():
+        if data["kind"] == "gauge":
+            continue
+        current = target.setdefault(name, {**data, "samples": {}})
+        if current["kind"] != data["kind"] or list(current.get("buckets", ())) != list(data.get("buckets", ())):
+            continue  # снимок процесса со старой версией кода
+        samples = current["samples"]
+        for key, value in data["samples"].items():
+            if data["kind"] == "histogram":
+                base = samples.get(key, [0] * len(value))
+                samples[key] = [a + b for a, b in zip(base, value, strict=True)]
+            else:
+                samples[key] = samples.get(key, 0.0) + value
+
+
+def render(metrics: dict[str, dict[str, Any]]) -> str:
+    lines: list[str] = []
+    for name, data in sorted(metrics.items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['kind']}")
+        labelnames = data["labelnames"]
+        for key, value in sorted(data["samples"].items()):
+            labels = json.loads(key)
+            if data["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(data["buckets"], value[:-2], strict=True):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {_format_value(cumulative)}")
+            # Корзина +Inf включает и наблюдения больше последней границы — это общее количество
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {_format_value(value[-1])}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {_format_value(value[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Веб ---
+HTTP_REQUEST_DURATION = Histogram(
+    "advisor_http_request_duration_seconds", "Время обработки HTTP-запроса", ("view", "method")
+)
+HTTP_REQUESTS = Counter(
+    "advisor_http_requests_total", "HTTP-запросы по представлению и коду ответа", ("view", "status")
+)
+DB_QUERIES = Counter("advisor_db_queries_total", "SQL-запросы, выполненные при обработке HTTP-запросов", ("view",))
+DB_QUERY_SECONDS = Counter(
+    "advisor_db_query_duration_seconds_total", "Суммарное время SQL-запросов HTTP-запросов", ("view",)
+)
+STATS_CACHE = Counter(
+    "advisor_stats_cache_requests_total",
+    "Обращения к кэшу статистики: hit, miss (пересчёт), stale (прежнее значение), wait (дождались чужого пересчёта)",
+    ("key", "result"),
+)
+
+# --- Импорт (веб-загрузка и watcher) ---
+INGEST_EVENTS = Counter(
+    "advisor_ingest_events_total", "События печати, обработанные импортом", ("result",)
+)  # created | duplicate | error
+INGEST_STAGE_SECONDS = Counter("advisor_ingest_stage_seconds_total", "Время этапов импорта событий", ("stage",))
+
+# --- Watcher ---
+WATCHER_FILES = Counter(
+    "advisor_watcher_files_total", "Файлы, обработанные watcher'ом", ("kind", "status")
+)  # status: done | skipped (уже импортирован) | failed
+WATCHER_RETRIES = Counter("advisor_watcher_retries_total", "Запланированные повторы обработки файлов")
+WATCHER_QUARANTINED = Counter("advisor_watcher_quarantined_total", "Файлы, перемещённые в quarantine", ("reason",))
+WATCHER_BACKLOG = Gauge("advisor_watcher_backlog_files", "Файлы, ожидающие обработки", ("state",))  # waiting | retry
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+    health: Callable[[], bool] | None = None
+
+    def do_GET(self) -> None:  # noqa: N802 - имя метода задаёт BaseHTTPRequestHandler
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            status, body = 200, self.registry.collect()
+        elif path == "/healthz":
+            healthy = self.health is None or self.health()
+            status, body = (200, "ok\n") if healthy else (503, "unhealthy\n")
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass  # запросы Prometheus раз в несколько секунд не нужны в логе watcher'а
+
+
+def start_metrics_server(
+    port: int, host: str = "0.0.0.0", health: Callable[[], bool] | None = None  # noqa: S104
+) -> ThreadingHTTPServer:
+    """
+    Запускает HTTP-сервер ``/metrics`` и ``/healthz`` в фоновом потоке.
+
+    ``health`` — проверка живости для ``/healthz`` (False — ответ 503); без неё всегда 200.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"health": staticmethod(health) if health else None})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
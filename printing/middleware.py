@@ -0,0 +1,86 @@
+"""
+Middleware метрик HTTP (время ответа по представлениям, коды ответов, число и время SQL-запросов)
+и журнала медленных запросов (см. printing.querylog).
+
+Метка ``view`` — имя URL (``dashboard``, ``print_events``, ``statistics``, ``print_tree``,
+``import_print_events`` ...), для админки — ``admin``, для ненайденных адресов — ``unmatched``:
+так число рядов метрик не зависит от адресов запросов.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from .metrics import DB_QUERIES, DB_QUERY_SECONDS, HTTP_REQUEST_DURATION, HTTP_REQUESTS, REGISTRY
+from .querylog import QUERY_LOG, log_queries, snapshot_dir
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.http import HttpRequest, HttpResponse
+
+
+def _view_label(request: HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    if "admin" in match.namespaces:
+        return "admin"
+    return match.url_name or "unnamed"
+
+
+class _QueryTimer:
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        # Потоковые ответы (экспорт) учитываются до отдачи тела: время — до первого байта
+        view = _view_label(request)
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, view=view, method=request.method)
+        HTTP_REQUESTS.inc(view=view, status=response.status_code)
+        if timer.count:
+            DB_QUERIES.inc(timer.count, view=view)
+            DB_QUERY_SECONDS.inc(timer.seconds, view=view)
+        REGISTRY.flush(getattr(settings, "METRICS_MULTIPROCESS_DIR", ""))
+        return response
+
+
+class SlowQueryMiddleware:
+    """Отпечатки и время SQL-запросов по представлениям; включается SLOW_QUERY_LOG."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        if not getattr(settings, "SLOW_QUERY_LOG", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        # Метка вычисляется при каждом запросе к БД: URL разрешается уже внутри get_response
+        with log_queries(lambda: _view_label(request)):
+            response = self.get_response(request)
+        QUERY_LOG.flush(snapshot_dir())
+        return response
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("printing", "0006_rename_printing_pr_user_id_tim_idx_printing_pr_user_id_584d4a_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestLedger",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("content_hash", models.CharField(max_length=64, verbose_name="SHA-256 содержимого")),
+                ("byte_size", models.BigIntegerField(verbose_name="Размер, байт")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("events", "События печати"), ("users", "Пользователи AD")],
+                        max_length=16,
+                        verbose_name="Тип данных",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[("watcher", "Watcher"), ("upload", "Загрузка через веб")],
+                        max_length=16,
+                        verbose_name="Источник",
+                    ),
+                ),
+                ("file_name", models.CharField(blank=True, max_length=255, verbose_name="Имя файла")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("processing", "Обрабатывается"), ("done", "Импортирован"), ("failed", "Ошибка")],
+                        default="processing",
+                        max_length=16,
+                        verbose_name="Статус",
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0, verbose_name="Попыток импорта")),
+                ("created_count", models.PositiveIntegerField(default=0, verbose_name="Создано записей")),
+                ("duplicates_count", models.PositiveIntegerField(default=0, verbose_name="Пропущено дубликатов")),
+                ("errors_count", models.PositiveIntegerField(default=0, verbose_name="Ошибок")),
+                ("skipped_count", models.PositiveIntegerField(default=0, verbose_name="Повторных поставок пропущено")),
+                ("last_error", models.TextField(blank=True, verbose_name="Последняя ошибка")),
+                ("duration", models.FloatField(blank=True, null=True, verbose_name="Длительность, с")),
+                ("started_at", models.DateTimeField(default=django.utils.timezone.now, verbose_name="Начало импорта")),
+                ("finished_at", models.DateTimeField(blank=True, null=True, verbose_name="Окончание импорта")),
+            ],
+            options={
+                "verbose_name": "Импортированный файл",
+                "verbose_name_plural": "Журнал импорта",
+                "ordering": ["-started_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("content_hash", "byte_size"), name="printing_ingest_ledger_content_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
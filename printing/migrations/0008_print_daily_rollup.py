@@ -0,0 +1,103 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def fill_rollups(apps, schema_editor):
+    # Агрегация заморожена здесь, а не импортирована из printing.rollups:
+    # миграция должна работать с историческими моделями и при последующих изменениях модуля.
+    PrintEvent = apps.get_model("printing", "PrintEvent")
+    PrintDailyRollup = apps.get_model("printing", "PrintDailyRollup")
+    rows = (
+        PrintEvent.objects.annotate(day=TruncDate("timestamp"))
+        .values("day", "user_id", "printer_id", "user__department_id")
+        .annotate(total_pages=Sum("pages"), total_documents=Count("id"), total_bytes=Sum("byte_size"))
+        .order_by()
+        .iterator(chunk_size=1000)
+    )
+    batch = []
+    for row in rows:
+        batch.append(
+            PrintDailyRollup(
+                date=row["day"],
+                user_id=row["user_id"],
+                printer_id=row["printer_id"],
+                department_id=row["user__department_id"],
+                pages=row["total_pages"] or 0,
+                documents=row["total_documents"],
+                byte_size=row["total_bytes"] or 0,
+            )
+        )
+        if len(batch) >= 1000:
+            PrintDailyRollup.objects.bulk_create(batch)
+            batch = []
+    PrintDailyRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("printing", "0007_ingest_ledger"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PrintDailyRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField(verbose_name="Дата")),
+                ("pages", models.BigIntegerField(default=0, verbose_name="Страниц")),
+                ("documents", models.IntegerField(default=0, verbose_name="Документов")),
+                ("byte_size", models.BigIntegerField(default=0, verbose_name="Размер в байтах")),
+                (
+                    "department",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="print_rollups",
+                        to="printing.department",
+                        verbose_name="Отдел",
+                    ),
+                ),
+                (
+                    "printer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="print_rollups",
+                        to="printing.printer",
+                        verbose_name="Принтер",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="print_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Суточные итоги печати",
+                "verbose_name_plural": "Суточные итоги печати",
+                "ordering": ["-date"],
+                "indexes": [
+                    models.Index(fields=["date", "department"], name="printing_pr_date_bf096e_idx"),
+                    models.Index(fields=["user", "date"], name="printing_pr_user_id_4cc3cb_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "user", "printer"), name="printing_rollup_date_user_printer_uniq"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+# DDL секционирования заморожен здесь, а не импортирован из printing.partitions: миграция должна
+# выполнять тот же SQL, что и при её выпуске, как бы ни менялся модуль. Команда
+# ``print_event_partitions convert`` использует printing.partitions.convert_to_partitioned.
+TABLE = "printing_printevent"
+LEGACY_TABLE = f"{TABLE}_unpartitioned"
+DEFAULT_PARTITION = f"{TABLE}_default"
+ID_SEQUENCE = f"{TABLE}_partitioned_id_seq"
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month):
+    return f"'{timezone.make_aware(datetime.combine(month, datetime.min.time())).isoformat()}'"
+
+
+def partition_print_events(apps, schema_editor):
+    # Секционирование по желанию: только PostgreSQL и PRINT_EVENTS_PARTITIONING=1.
+    # Включить его позже можно командой ``manage.py print_event_partitions convert``
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql" or not getattr(settings, "PRINT_EVENTS_PARTITIONING", False):
+        return
+    qn = connection.ops.quote_name
+    table, legacy = qn(TABLE), qn(LEGACY_TABLE)
+    months_ahead = getattr(settings, "PRINT_EVENTS_PARTITIONS_AHEAD", 3)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone()[0] == "p":
+            return
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute("SELECT conname FROM pg_constraint WHERE confrelid = to_regclass(%s) AND contype = 'f'", [TABLE])
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise RuntimeError(f"На {TABLE} ссылаются внешние ключи: {', '.join(referencing)}")
+
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes i JOIN pg_index x ON x.indexrelid = to_regclass(i.indexname) "
+            "WHERE i.tablename = %s AND NOT x.indisunique",
+            [TABLE],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) "
+            "AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT MIN({qn('timestamp')}), COALESCE(MAX({qn('id')}), 0) FROM {table}")
+        first_timestamp, max_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({qn('timestamp')})"
+        )
+        cursor.execute(f"CREATE SEQUENCE {qn(ID_SEQUENCE)} OWNED BY {table}.{qn('id')}")
+        cursor.execute("SELECT setval(%s, %s, %s)", [ID_SEQUENCE, max(max_id, 1), bool(max_id)])
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {qn('id')} SET DEFAULT nextval('{ID_SEQUENCE}')")
+        cursor.execute(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT")
+
+        current = timezone.localdate().replace(day=1)
+        month = timezone.localtime(first_timestamp).date().replace(day=1) if first_timestamp else current
+        while month <= _add_months(current, months_ahead):
+            name = qn(f"{TABLE}_p{month:%Y_%m}")
+            start, end = _bound(month), _bound(_add_months(month, 1))
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ({start}) TO ({end})")
+            month = _add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        cursor.execute(f"DROP TABLE {legacy}")
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {qn(TABLE + '_pkey')} PRIMARY KEY ({qn('id')}, {qn('timestamp')})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {qn(TABLE + '_job_id_timestamp_uniq')} "
+            f"UNIQUE ({qn('job_id')}, {qn('timestamp')})"
+        )
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {qn(name)} {definition}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("printing", "0008_print_daily_rollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_print_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("printing", "0009_printevent_partitioning"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingestledger",
+            name="metrics",
+            field=models.JSONField(blank=True, default=dict, verbose_name="Метрики импорта"),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from .building import Building
 from .department import Department
+from .ingest_ledger import IngestLedger
 from .print_event import Computer, Port, PrintEvent
+from .print_rollup import PrintDailyRollup
 from .printer import Printer, PrinterModel
 
 __all__ = [
@@ -11,4 +13,6 @@ __all__ = [
     "PrintEvent",
     "Computer",
     "Port",
+    "IngestLedger",
+    "PrintDailyRollup",
 ]
@@ -0,0 +1,62 @@
+from django.db import models
+from django.utils import timezone
+
+
+class IngestLedger(models.Model):
+    """Журнал импортированных файлов: одна запись на содержимое (хэш + размер)."""
+
+    KIND_EVENTS = "events"
+    KIND_USERS = "users"
+    KIND_CHOICES = [
+        (KIND_EVENTS, "События печати"),
+        (KIND_USERS, "Пользователи AD"),
+    ]
+
+    SOURCE_WATCHER = "watcher"
+    SOURCE_UPLOAD = "upload"
+    SOURCE_CHOICES = [
+        (SOURCE_WATCHER, "Watcher"),
+        (SOURCE_UPLOAD, "Загрузка через веб"),
+    ]
+
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PROCESSING, "Обрабатывается"),
+        (STATUS_DONE, "Импортирован"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
+    content_hash = models.CharField("SHA-256 содержимого", max_length=64)
+    byte_size = models.BigIntegerField("Размер, байт")
+    kind = models.CharField("Тип данных", max_length=16, choices=KIND_CHOICES)
+    source = models.CharField("Источник", max_length=16, choices=SOURCE_CHOICES)
+    file_name = models.CharField("Имя файла", max_length=255, blank=True)
+    status = models.CharField("Статус", max_length=16, choices=STATUS_CHOICES, default=STATUS_PROCESSING)
+    attempts = models.PositiveIntegerField("Попыток импорта", default=0)
+    created_count = models.PositiveIntegerField("Создано записей", default=0)
+    duplicates_count = models.PositiveIntegerField("Пропущено дубликатов", default=0)
+    errors_count = models.PositiveIntegerField("Ошибок", default=0)
+    skipped_count = models.PositiveIntegerField("Повторных поставок пропущено", default=0)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    duration = models.FloatField("Длительность, с", null=True, blank=True)
+    # Поэтапные замеры импорта событий (printing.instrumentation.IngestStats.as_dict)
+    metrics = models.JSONField("Метрики импорта", default=dict, blank=True)
+    started_at = models.DateTimeField("Начало импорта", default=timezone.now)
+    finished_at = models.DateTimeField("Окончание импорта", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Импортированный файл"
+        verbose_name_plural = "Журнал импорта"
+        ordering = ["-started_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["content_hash", "byte_size"], name="printing_ingest_ledger_content_uniq"),
+        ]
+
+    @property
+    def events_per_second(self) -> float | None:
+        return self.metrics.get("events_per_second")
+
+    def __str__(self):
+        return f"{self.file_name or self.content_hash[:12]} ({self.get_status_display()})"
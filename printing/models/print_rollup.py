@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import models
+
+
+class PrintDailyRollup(models.Model):
+    """
+    Суточные итоги печати по паре (пользователь, принтер).
+
+    Поддерживается импортом событий (см. printing.rollups) и перестраивается командой
+    ``rebuild_print_rollups``. ``department`` — отдел пользователя (как в статистике по отделам).
+    """
+
+    date = models.DateField("Дата")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="print_rollups", verbose_name="Пользователь"
+    )
+    printer = models.ForeignKey(
+        "printing.Printer", on_delete=models.CASCADE, related_name="print_rollups", verbose_name="Принтер"
+    )
+    department = models.ForeignKey(
+        "printing.Department",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="print_rollups",
+        verbose_name="Отдел",
+    )
+    pages = models.BigIntegerField("Страниц", default=0)
+    documents = models.IntegerField("Документов", default=0)
+    byte_size = models.BigIntegerField("Размер в байтах", default=0)
+
+    class Meta:
+        verbose_name = "Суточные итоги печати"
+        verbose_name_plural = "Суточные итоги печати"
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "user", "printer"], name="printing_rollup_date_user_printer_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["date", "department"]),
+            models.Index(fields=["user", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.user} @ {self.printer}: {self.pages}"
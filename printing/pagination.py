@@ -0,0 +1,157 @@
+"""
+Пагинация больших списков событий печати.
+
+- ``keyset_paginate`` — пагинация по курсору (seek) на ``(timestamp, id)``: страница
+  выбирается условием ``WHERE (timestamp, id) < (курсор)`` по индексу, без OFFSET, поэтому
+  глубокие страницы не дороже первой.
+- ``estimate_count`` / ``EstimatedCountPaginator`` — оценка числа строк по плану запроса
+  PostgreSQL вместо полного ``COUNT(*)``.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from django.db.models import QuerySet
+
+# Ниже этого порога оценка перепроверяется точным COUNT (он дёшев, а оценка на малых выборках груба)
+EXACT_COUNT_THRESHOLD = 10_000
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или подделан."""
+
+
+def encode_cursor(timestamp: datetime, pk: int) -> str:
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        timestamp, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(token) from e
+
+
+@dataclass
+class KeysetPage:
+    """Страница keyset-пагинации (совместима по смыслу с ``django.core.paginator.Page``)."""
+
+    object_list: list[Any]
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    count: int | None = None  # оценка общего числа строк, если запрошена
+    next_url: str | None = None
+    previous_url: str | None = None
+    first_url: str | None = None
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+
+def keyset_paginate(
+    queryset: QuerySet[Any], per_page: int, *, after: str | None = None, before: str | None = None
+) -> KeysetPage:
+    """
+    Возвращает страницу ``queryset`` в порядке ``-timestamp, -id``.
+
+    Args:
+        queryset: Отфильтрованный QuerySet событий (его сортировка заменяется)
+        per_page: Размер страницы
+        after: Курсор — страница после строки курсора (следующая)
+        before: Курсор — страница перед строкой курсора (предыдущая)
+
+    Raises:
+        InvalidCursor: Курсор не разбирается
+
+    Example:
+        >>> page = keyset_paginate(PrintEvent.objects.all(), 50)
+        >>> page = keyset_paginate(PrintEvent.objects.all(), 50, after=page.next_cursor)
+    """
+    if before:
+        timestamp, pk = decode_cursor(before)
+        rows = list(
+            queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)).order_by("timestamp", "pk")[
+                : per_page + 1
+            ]
+        )
+        more_before = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        more_after = True
+    else:
+        if after:
+            timestamp, pk = decode_cursor(after)
+            queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+        rows = list(queryset.order_by("-timestamp", "-pk")[: per_page + 1])
+        more_after = len(rows) > per_page
+        rows = rows[:per_page]
+        more_before = bool(after)
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1].timestamp, rows[-1].pk) if rows and more_after else None,
+        previous_cursor=encode_cursor(rows[0].timestamp, rows[0].pk) if rows and more_before else None,
+    )
+
+
+def estimate_count(queryset: QuerySet[Any]) -> int:
+    """
+    Оценивает число строк queryset.
+
+    На PostgreSQL берёт ``Plan Rows`` из ``EXPLAIN`` (статистика планировщика, без чтения
+    таблицы); небольшие оценки и остальные СУБД — точный ``count()``.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return int(queryset.count())
+    sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    return int(queryset.count()) if estimate < EXACT_COUNT_THRESHOLD else estimate
+
+
+class EstimatedCountPaginator(Paginator):  # type: ignore[misc]
+    """Paginator, использующий ``estimate_count`` вместо ``COUNT(*)``."""
+
+    @cached_property  # type: ignore[misc]
+    def count(self) -> int:
+        object_list = self.object_list
+        # django-tables2 передаёт BoundRows → TableQuerysetData → QuerySet
+        queryset = getattr(getattr(object_list, "data", None), "data", object_list)
+        if hasattr(queryset, "query"):
+            return estimate_count(queryset)
+        return len(object_list)
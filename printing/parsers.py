@@ -0,0 +1,126 @@
+"""
+Потоковый разбор JSON-выгрузок событий печати.
+
+Выгрузка print-сервера — один JSON-массив объектов. ``iter_json_array`` читает поток
+блоками и отдаёт элементы массива по одному, так что в памяти одновременно находится
+только буфер чтения и текущий элемент, а не весь файл.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+from typing import IO, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+READ_SIZE = 64 * 1024  # символов/байт за одно чтение из потока
+MAX_ITEM_SIZE = 16 * 1024 * 1024  # предел размера одного элемента массива, символов
+_WHITESPACE = " \t\n\r"
+
+
+class JSONArrayExpectedError(ValueError):
+    """Верхний уровень документа — не JSON-массив."""
+
+
+class _JSONArrayReader:
+    def __init__(self, stream: IO[Any], encoding: str, read_size: int) -> None:
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._read_size = read_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Дочитывает следующий блок в буфер. Возвращает False, если поток исчерпан."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._read_size)
+        text = self._decoder.decode(chunk, final=not chunk) if isinstance(chunk, bytes) else chunk or ""
+        if not chunk:
+            self._eof = True
+        # Отбрасываем уже разобранную часть буфера, чтобы он не рос вместе с файлом
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        return bool(chunk) or bool(text)
+
+    def _peek(self) -> str:
+        """Пропускает пробелы и возвращает следующий значимый символ ('' в конце потока)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _decode_value(self, decoder: json.JSONDecoder) -> Any:
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Повреждённый элемент не должен заставить дочитать в память весь файл
+                if len(self._buffer) - self._pos < MAX_ITEM_SIZE and self._fill():
+                    continue
+                raise
+            # Значение, упёршееся в конец буфера (например, число), могло быть обрезано
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def open_array(self) -> None:
+        first = self._peek()
+        if not first:
+            raise json.JSONDecodeError("Expecting value", self._buffer, self._pos)
+        if first != "[":
+            raise JSONArrayExpectedError("Expected a JSON array at the top level")
+        self._pos += 1
+
+    def items(self) -> Iterator[Any]:
+        decoder = json.JSONDecoder()
+        if self._peek() == "]":
+            self._pos += 1
+        else:
+            while True:
+                self._peek()
+                yield self._decode_value(decoder)
+                delimiter = self._peek()
+                self._pos += 1
+                if delimiter == "]":
+                    break
+                if delimiter != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", self._buffer, self._pos - 1)
+        if self._peek():
+            raise json.JSONDecodeError("Extra data", self._buffer, self._pos)
+
+
+def iter_json_array(stream: IO[Any], *, encoding: str = "utf-8-sig", read_size: int = READ_SIZE) -> Iterator[Any]:
+    """
+    Лениво разбирает JSON-массив верхнего уровня из потока.
+
+    Начало массива проверяется сразу при вызове, поэтому неверный формат документа
+    обнаруживается до начала импорта. Ошибки синтаксиса внутри массива поднимаются
+    как ``json.JSONDecodeError`` в момент, когда итерация до них доходит.
+
+    Args:
+        stream: Бинарный или текстовый поток с методом ``read(size)`` (файл, UploadedFile, HttpRequest)
+        encoding: Кодировка бинарного потока (по умолчанию UTF-8 с необязательным BOM)
+        read_size: Размер блока чтения
+
+    Returns:
+        Iterator: Генератор элементов массива
+
+    Raises:
+        JSONArrayExpectedError: Документ не является массивом
+        json.JSONDecodeError: Документ пуст или повреждён
+
+    Example:
+        >>> with open("events.json", "rb") as f:
+        ...     result = import_print_events(iter_json_array(f))
+    """
+    reader = _JSONArrayReader(stream, encoding, read_size)
+    reader.open_array()
+    return reader.items()
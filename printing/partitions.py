@@ -0,0 +1,268 @@
+"""
+Помесячное секционирование ``printing_printevent`` (PostgreSQL, по желанию).
+
+Статистика, дерево и список событий всегда фильтруют по ``timestamp``, поэтому в секционированной
+по месяцам таблице планировщик читает только секции периода (partition pruning), а удаление
+старых событий сводится к отсоединению секции (``DETACH PARTITION``) вместо DELETE миллионов строк.
+
+- ``convert_to_partitioned`` превращает обычную таблицу в секционированную (команда
+  ``print_event_partitions convert``; миграция 0009 при PRINT_EVENTS_PARTITIONING=1 выполняет
+  замороженную копию того же DDL);
+- ``ensure_partitions`` создаёт секции на PRINT_EVENTS_PARTITIONS_AHEAD месяцев вперёд и переносит
+  в отдельные секции строки, попавшие в секцию по умолчанию (watcher вызывает её периодически);
+- ``detach_partitions`` отсоединяет секции старше заданного месяца: они остаются отдельными
+  таблицами-архивами (``pg_dump -t``) или удаляются. Суточные итоги PrintDailyRollup не трогаются —
+  статистика за архивные месяцы сохраняется.
+
+Ограничения PostgreSQL: первичный ключ и уникальные ограничения секционированной таблицы должны
+включать ключ секционирования, поэтому они становятся ``(id, timestamp)`` и ``(job_id, timestamp)``.
+Повторно загруженное событие имеет тот же ``timestamp`` и по-прежнему отбрасывается.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from datetime import date, datetime
+from typing import Any
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import PrintEvent
+
+logger = logging.getLogger(__name__)
+
+TABLE = PrintEvent._meta.db_table
+LEGACY_TABLE = f"{TABLE}_unpartitioned"
+DEFAULT_PARTITION = f"{TABLE}_default"
+ID_SEQUENCE = f"{TABLE}_partitioned_id_seq"
+_PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+class PartitioningError(Exception):
+    """Таблицу событий нельзя секционировать или она не секционирована."""
+
+
+def partitioning_supported() -> bool:
+    return bool(connection.vendor == "postgresql")
+
+
+def is_partitioned() -> bool:
+    """``printing_printevent`` — секционированная таблица."""
+    if not partitioning_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def _bound(month: date) -> str:
+    # Границы — полночь 1-го числа в TIME_ZONE: месяц секции совпадает с месяцем в интерфейсе
+    moment = timezone.make_aware(datetime.combine(month, datetime.min.time()))
+    return f"'{moment.isoformat()}'"
+
+
+def list_partitions() -> list[tuple[str, date | None]]:
+    """Секции таблицы событий: (имя, месяц); для секции по умолчанию месяц None."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions: list[tuple[str, date | None]] = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        partitions.append((name, date(int(match[1]), int(match[2]), 1) if match else None))
+    return partitions
+
+
+def _create_partition(cursor: Any, month: date) -> bool:
+    name = partition_name(month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+    qn = connection.ops.quote_name
+    start, end = _bound(month), _bound(add_months(month, 1))
+    in_range = f"{qn('timestamp')} >= {start} AND {qn('timestamp')} < {end}"
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} WHERE {in_range})")
+    if cursor.fetchone()[0]:
+        # Строки месяца уже лежат в секции по умолчанию: переносим их в новую таблицу и присоединяем её
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} WHERE {in_range} RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved"
+        )
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} FOR VALUES FROM ({start}) TO ({end})")
+    else:
+        cursor.execute(f"CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM ({start}) TO ({end})")
+    logger.info(f"Создана секция {name}")
+    return True
+
+
+def _default_partition_months(cursor: Any) -> list[date]:
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', {qn('timestamp')} AT TIME ZONE %s)::date "
+        f"FROM {qn(DEFAULT_PARTITION)}",
+        [settings.TIME_ZONE],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_partitions(months_ahead: int | None = None, today: date | None = None) -> list[str]:
+    """
+    Создаёт секции с текущего месяца на ``months_ahead`` вперёд и для месяцев, чьи строки
+    оказались в секции по умолчанию (импорт давних или будущих событий).
+
+    Args:
+        months_ahead: Сколько месяцев вперёд; None — PRINT_EVENTS_PARTITIONS_AHEAD
+        today: Текущая дата (для тестов)
+
+    Returns:
+        list[str]: Имена созданных секций; пусто, если таблица не секционирована
+    """
+    if not is_partitioned():
+        return []
+    if months_ahead is None:
+        months_ahead = getattr(settings, "PRINT_EVENTS_PARTITIONS_AHEAD", 3)
+    current = month_start(today or timezone.localdate())
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Отложенные проверки внешних ключей не дают выполнять ALTER TABLE в той же транзакции
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        months = {add_months(current, offset) for offset in range(months_ahead + 1)}
+        months.update(_default_partition_months(cursor))
+        for month in sorted(months):
+            if _create_partition(cursor, month):
+                created.append(partition_name(month))
+    return created
+
+
+def convert_to_partitioned(months_ahead: int | None = None) -> list[str]:
+    """
+    Пересоздаёт ``printing_printevent`` секционированной по месяцам и переносит в неё события.
+
+    Выполняется в одной транзакции под эксклюзивной блокировкой таблицы; время — порядка
+    полной копии таблицы, поэтому на больших базах запускайте в окно обслуживания.
+
+    Returns:
+        list[str]: Имена созданных секций
+
+    Raises:
+        PartitioningError: Не PostgreSQL, таблица уже секционирована или на неё ссылаются внешние ключи
+    """
+    if not partitioning_supported():
+        raise PartitioningError("Секционирование поддерживается только на PostgreSQL")
+    if is_partitioned():
+        raise PartitioningError(f"{TABLE} уже секционирована")
+    if months_ahead is None:
+        months_ahead = getattr(settings, "PRINT_EVENTS_PARTITIONS_AHEAD", 3)
+    qn = connection.ops.quote_name
+    table, legacy = qn(TABLE), qn(LEGACY_TABLE)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute("SELECT conname FROM pg_constraint WHERE confrelid = to_regclass(%s) AND contype = 'f'", [TABLE])
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise PartitioningError(f"На {TABLE} ссылаются внешние ключи: {', '.join(referencing)}")
+
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes i JOIN pg_index x ON x.indexrelid = to_regclass(i.indexname) "
+            "WHERE i.tablename = %s AND NOT x.indisunique",
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) "
+            "AND contype = 'f'",
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT MIN({qn('timestamp')}), COALESCE(MAX({qn('id')}), 0) FROM {table}")
+        first_timestamp, max_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({qn('timestamp')})"
+        )
+        # IDENTITY-столбцы в секционированных таблицах появились только в PostgreSQL 17 — обычная последовательность
+        cursor.execute(f"CREATE SEQUENCE {qn(ID_SEQUENCE)} OWNED BY {table}.{qn('id')}")
+        cursor.execute("SELECT setval(%s, %s, %s)", [ID_SEQUENCE, max(max_id, 1), bool(max_id)])
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {qn('id')} SET DEFAULT nextval('{ID_SEQUENCE}')")
+        cursor.execute(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT")
+
+        current = month_start(timezone.localdate())
+        month = month_start(timezone.localtime(first_timestamp).date()) if first_timestamp else current
+        created = []
+        while month <= add_months(current, months_ahead):
+            _create_partition(cursor, month)
+            created.append(partition_name(month))
+            month = add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        cursor.execute(f"DROP TABLE {legacy}")
+        # Ограничения, индексы (определения сняты до переименования и ссылаются на новую таблицу) и внешние
+        # ключи — с прежними именами, после удаления старой таблицы; секции наследуют их автоматически
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {qn(TABLE + '_pkey')} PRIMARY KEY ({qn('id')}, {qn('timestamp')})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {qn(TABLE + '_job_id_timestamp_uniq')} "
+            f"UNIQUE ({qn('job_id')}, {qn('timestamp')})"
+        )
+        for _name, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {qn(name)} {definition}")
+    logger.info(f"{TABLE} секционирована: {len(created)} помесячных секций")
+    return created
+
+
+def detach_partitions(before: date, *, drop: bool = False) -> list[str]:
+    """
+    Отсоединяет помесячные секции раньше месяца ``before``.
+
+    Отсоединённая секция становится обычной таблицей-архивом с тем же именем (её можно выгрузить
+    ``pg_dump -t`` и удалить); при ``drop=True`` она удаляется сразу. Кэш статистики за эти
+    месяцы сбрасывается.
+
+    Returns:
+        list[str]: Имена отсоединённых секций
+    """
+    if not is_partitioned():
+        raise PartitioningError(f"{TABLE} не секционирована")
+    from .services import invalidate_statistics_cache  # local import
+
+    qn = connection.ops.quote_name
+    limit = month_start(before)
+    old = [(name, month) for name, month in list_partitions() if month is not None and month < limit]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        for name, _month in old:
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {qn(name)}")
+            logger.info(f"Секция {name} {'удалена' if drop else 'отсоединена'}")
+    if old:
+        invalidate_statistics_cache(dates=[month for _name, month in old])
+    return [name for name, _month in old]
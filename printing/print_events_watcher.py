@@ -5,7 +5,13 @@
 - При появлении JSON-файла импортирует события печати (import_print_events_from_json).
 - При появлении CSV-файла импортирует пользователей AD (import_users_from_csv).
 - После успешной обработки перемещает файл в каталог обработанных (PROCESSED_DIR).
+- Повторно доставленный файл (тот же SHA-256 и размер в журнале IngestLedger) не разбирается заново.
 - Все действия и ошибки логируются в отдельный лог-файл (LOG_FILE_NAME).
+- Файлы обрабатываются пулом из WATCHER_WORKERS потоков: разные источники (префикс ``<source>__``)
+  параллельно, файлы одного источника — по очереди (см. printing.ingest_queue).
+- Ошибочный файл повторяется с backoff без блокировки потоков (RetryScheduler); состояние повторов
+  хранится в WATCHER_RETRY_STATE_FILE, исчерпав попытки, файл уходит в QUARANTINE_DIR.
+- Метрики Prometheus и проверка живости отдаются на WATCHER_METRICS_PORT (``/metrics``, ``/healthz``).
 
 Запуск:
     python -m printing.print_events_watcher
@@ -16,15 +22,13 @@
     - LOG_TO_FILE, LOG_TO_CONSOLE для управления каналами логирования
 """
 
-import hashlib
-import json
 import logging
 import logging.config
 import os
 import shutil
 import sys
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import django
 from dotenv import load_dotenv
@@ -51,6 +55,23 @@ MAX_RETRIES = int(os.getenv("WATCHER_MAX_RETRIES", "5"))
 BACKOFF_BASE = float(os.getenv("WATCHER_BACKOFF_BASE", "2"))  # секунд
 BACKOFF_MAX = float(os.getenv("WATCHER_BACKOFF_MAX", "30"))  # секунд
 DEADLINE_SECONDS = int(os.getenv("WATCHER_DEADLINE_SECONDS", "300"))
+# Состояние отложенных повторов (переживает перезапуск watcher'а)
+RETRY_STATE_FILE = os.getenv(
+    "WATCHER_RETRY_STATE_FILE", os.path.join(os.path.dirname(os.path.abspath(WATCH_DIR)), "watcher_retry_state.json")
+)
+
+# Сохранять кэш справочников (принтеры, пользователи, ...) между файлами
+RESOLVER_CACHE = os.getenv("WATCHER_RESOLVER_CACHE", "0") == "1"
+
+# Число потоков обработки файлов (1 — последовательная обработка)
+WORKERS = int(os.getenv("WATCHER_WORKERS", "1"))
+
+# Как часто создавать будущие секции таблицы событий (если она секционирована), секунд
+PARTITION_CHECK_INTERVAL = 3600
+
+# HTTP-порт метрик Prometheus и /healthz (0 — не запускать)
+METRICS_PORT = int(os.getenv("WATCHER_METRICS_PORT", "9108"))
+METRICS_HOST = os.getenv("WATCHER_METRICS_HOST", "0.0.0.0")  # noqa: S104 - порт доступен только в сети compose
 
 # --- Django setup ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -59,6 +80,26 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.development")
 django.setup()
 
 from printing.importers import import_print_events_from_json, import_users_from_csv  # noqa: E402
+from printing.ingest_queue import OrderedWorkerPool, RetryScheduler  # noqa: E402
+from printing.instrumentation import format_ingest_metrics  # noqa: E402
+from printing.ledger import (  # noqa: E402
+    IngestInProgressError,
+    claim_ingest,
+    hash_stream,
+    record_ingest_failure,
+    record_ingest_result,
+)
+from printing.metrics import (  # noqa: E402
+    WATCHER_BACKLOG,
+    WATCHER_FILES,
+    WATCHER_QUARANTINED,
+    WATCHER_RETRIES,
+    start_metrics_server,
+)
+from printing.models import IngestLedger  # noqa: E402
+from printing.parsers import iter_json_array  # noqa: E402
+from printing.partitions import ensure_partitions  # noqa: E402
+from printing.resolvers import get_shared_resolver  # noqa: E402
 
 logging.config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
@@ -72,15 +113,32 @@ class PrintEventHandler(FileSystemEventHandler):
     - Импортирует пользователей AD из CSV-файлов.
     - Перемещает обработанные файлы в PROCESSED_DIR.
     - Логирует все действия и ошибки.
+
+    Args:
+        pool: Пул обработки; без него файл обрабатывается прямо в потоке наблюдателя
+        retries: Планировщик повторов; по умолчанию — в памяти, с возвратом файла в ``_dispatch``
     """
 
+    def __init__(self, pool: OrderedWorkerPool | None = None, retries: RetryScheduler | None = None) -> None:
+        super().__init__()
+        self.pool = pool
+        self.retries = retries or RetryScheduler(self._dispatch)
+
+    def _dispatch(self, fname: str) -> None:
+        if os.path.splitext(fname)[1].lower() not in (".json", ".csv"):
+            return
+        if self.pool is not None:
+            self.pool.submit(fname)
+        else:
+            self._process_file(fname)
+
     def _move_to_quarantine(self, fname: str, reason: str) -> None:
         try:
             os.makedirs(QUARANTINE_DIR, exist_ok=True)
             ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
             try:
                 with open(fname, "rb") as rf:
-                    digest = hashlib.sha256(rf.read()).hexdigest()[:12]
+                    digest = hash_stream(rf)[0][:12]
             except Exception:
                 digest = "nohash"
             ext = os.path.splitext(fname)[1].lower()
@@ -91,90 +149,119 @@ class PrintEventHandler(FileSystemEventHandler):
         except Exception as qe:
             logger.error(f"Не удалось переместить в quarantine {fname}: {qe}", exc_info=True)
 
+    def _import_file(self, fname: str, ext: str) -> None:
+        """
+        Импортирует файл и перемещает его в PROCESSED_DIR (одна попытка).
+
+        Содержимое, уже импортированное ранее (журнал IngestLedger), не разбирается повторно.
+        """
+        kind = IngestLedger.KIND_EVENTS if ext == ".json" else IngestLedger.KIND_USERS
+        with open(fname, "rb") as f:
+            hash_started = time.perf_counter()
+            content_hash, size = hash_stream(f)
+            hash_seconds = time.perf_counter() - hash_started
+            entry, claimed = claim_ingest(
+                content_hash, size, kind=kind, source=IngestLedger.SOURCE_WATCHER, file_name=os.path.basename(fname)
+            )
+            if not claimed and entry.status == IngestLedger.STATUS_PROCESSING:
+                # Такой же файл сейчас обрабатывает другой поток: повторим позже, когда станет ясен итог
+                raise IngestInProgressError(f"Содержимое {fname} уже импортируется (sha256 {content_hash[:12]})")
+            if not claimed:
+                logger.info(f"Файл {fname} уже импортирован ранее (sha256 {content_hash[:12]}), разбор пропущен")
+            else:
+                f.seek(0)
+                try:
+                    if ext == ".json":
+                        # Потоковое чтение и импорт событий печати (файл не загружается в память целиком)
+                        resolver = get_shared_resolver() if RESOLVER_CACHE else None
+                        result = import_print_events_from_json(iter_json_array(f), resolver=resolver)
+                        result["metrics"]["hash_seconds"] = round(hash_seconds, 4)
+                        metrics = result["metrics"]
+                        logger.info(
+                            f"Загружено из {os.path.basename(fname)}: created={result['created']} "
+                            f"duplicates={result['duplicates']} errors={len(result['errors'])} "
+                            f"bytes={size} hash={hash_seconds:.3f}s {format_ingest_metrics(metrics)}",
+                            extra={"ingest_file": os.path.basename(fname), "ingest_metrics": metrics},
+                        )
+                    else:
+                        # Чтение и импорт пользователей
+                        result = import_users_from_csv(f)
+                        logger.info(f"Импорт пользователей завершён: {result}")
+                except Exception as e:
+                    record_ingest_failure(entry, e)
+                    raise
+                if not record_ingest_result(entry, result):
+                    # Только ошибки (например, сбой импорта пользователей) — файл повторяется, затем quarantine
+                    raise RuntimeError(f"Импорт {fname} не применил ни одной записи: {entry.last_error}")
+        # Перемещение файла в каталог обработанных
+        dest = os.path.join(PROCESSED_DIR, os.path.basename(fname))
+        shutil.move(fname, dest)
+        logger.info(f"Файл перемещён в {dest}")
+        WATCHER_FILES.inc(kind=kind, status="done" if claimed else "skipped")
+
+    def _schedule_retry(self, fname: str, ext: str, exc: Exception) -> None:
+        """Планирует повтор с backoff или, если попытки/дедлайн исчерпаны, перемещает файл в quarantine."""
+        if isinstance(exc, IngestInProgressError):
+            # Не ошибка файла: ждём итога параллельного импорта, попытки и дедлайн не расходуются
+            # (брошенный импорт журнал сам отдаст через PROCESSING_TIMEOUT)
+            self.retries.forget(fname)
+            self.retries.start()
+            self.retries.schedule(fname, BACKOFF_MAX, error=str(exc))
+            logger.info(f"{exc}, повтор через {BACKOFF_MAX}s")
+            return
+        state = self.retries.get(fname)
+        attempt = state.attempts + 1 if state else 1
+        label = "CSV " if ext == ".csv" else ""
+        if isinstance(exc, PermissionError):
+            logger.warning(f"Permission denied for {fname} (попытка {attempt}/{MAX_RETRIES}): {exc}")
+        else:
+            logger.error(f"Ошибка при обработке {label}{fname} (попытка {attempt}/{MAX_RETRIES}): {exc}", exc_info=True)
+
+        timed_out = state is not None and time.time() - state.first_failed_at > DEADLINE_SECONDS
+        if timed_out or attempt >= MAX_RETRIES:
+            if timed_out:
+                logger.error(f"Дедлайн истёк для {fname} — прекращаю повторы")
+            self.retries.forget(fname)
+            reason = "deadline_exceeded" if timed_out else ("csv_import_error" if ext == ".csv" else "import_error")
+            self._move_to_quarantine(fname, reason)
+            kind = IngestLedger.KIND_USERS if ext == ".csv" else IngestLedger.KIND_EVENTS
+            WATCHER_FILES.inc(kind=kind, status="failed")
+            WATCHER_QUARANTINED.inc(reason=reason)
+            return
+
+        delay = min(BACKOFF_BASE * attempt, BACKOFF_MAX)
+        self.retries.start()
+        self.retries.schedule(fname, delay, error=f"{type(exc).__name__}: {exc}")
+        WATCHER_RETRIES.inc()
+        logger.info(f"Повтор {fname} запланирован через {delay}s")
+
     def _process_file(self, fname: str) -> None:
         """
         Обрабатывает один файл: импортирует данные и перемещает файл.
 
+        При ошибке поток не блокируется: повтор планируется через ``self.retries``.
+
         Args:
             fname: Полный путь к файлу для обработки
         """
         ext = os.path.splitext(fname)[1].lower()
-        # Импорт событий печати из JSON
+        if ext not in (".json", ".csv"):
+            return
+        if not os.path.exists(fname):
+            # Файл уже обработан по другому событию (например, при старте и on_created одновременно)
+            logger.info(f"Файл {fname} уже отсутствует, пропускаю")
+            self.retries.forget(fname)
+            return
         if ext == ".json":
             logger.info(f"Найден файл: {fname}")
-            started_at = datetime.utcnow()
-            processed = False
-            timed_out = False
-            for attempt in range(MAX_RETRIES):
-                try:
-                    # Чтение и импорт событий печати
-                    with open(fname, encoding="utf-8-sig") as f:
-                        events = json.load(f)
-                    result = import_print_events_from_json(events)
-                    logger.info(f"Загружено: {result}")
-                    # Перемещение файла в каталог обработанных
-                    dest = os.path.join(PROCESSED_DIR, os.path.basename(fname))
-                    shutil.move(fname, dest)
-                    logger.info(f"Файл перемещён в {dest}")
-                    processed = True
-                    break
-                except PermissionError as e:
-                    delay = min(BACKOFF_BASE * (attempt + 1), BACKOFF_MAX)
-                    logger.warning(
-                        f"Permission denied for {fname} (попытка {attempt+1}/{MAX_RETRIES}): {e}; sleep {delay}s"
-                    )
-                    time.sleep(delay)
-                except Exception as e:
-                    delay = min(BACKOFF_BASE * (attempt + 1), BACKOFF_MAX)
-                    logger.error(
-                        f"Ошибка при обработке {fname} (попытка {attempt+1}/{MAX_RETRIES}): {e}", exc_info=True
-                    )
-                    time.sleep(delay)
-                # дедлайн
-                if (datetime.utcnow() - started_at) > timedelta(seconds=DEADLINE_SECONDS):
-                    logger.error(f"Дедлайн истёк для {fname} — прекращаю повторы")
-                    timed_out = True
-                    break
-            if not processed:
-                reason = "deadline_exceeded" if timed_out else "import_error"
-                self._move_to_quarantine(fname, reason)
-        # Импорт пользователей AD из CSV
-        elif ext == ".csv":
+        else:
             logger.info(f"Найден CSV-файл пользователей: {fname}")
-            started_at = datetime.utcnow()
-            processed = False
-            timed_out = False
-            for attempt in range(MAX_RETRIES):
-                try:
-                    # Чтение и импорт пользователей
-                    with open(fname, "rb") as f:
-                        result = import_users_from_csv(f)
-                    logger.info(f"Импорт пользователей завершён: {result}")
-                    # Перемещение файла в каталог обработанных
-                    dest = os.path.join(PROCESSED_DIR, os.path.basename(fname))
-                    shutil.move(fname, dest)
-                    logger.info(f"CSV-файл перемещён в {dest}")
-                    processed = True
-                    break
-                except PermissionError as e:
-                    delay = min(BACKOFF_BASE * (attempt + 1), BACKOFF_MAX)
-                    logger.warning(
-                        f"Permission denied for {fname} (попытка {attempt+1}/{MAX_RETRIES}): {e}; sleep {delay}s"
-                    )
-                    time.sleep(delay)
-                except Exception as e:
-                    delay = min(BACKOFF_BASE * (attempt + 1), BACKOFF_MAX)
-                    logger.error(
-                        f"Ошибка при обработке CSV {fname} (попытка {attempt+1}/{MAX_RETRIES}): {e}", exc_info=True
-                    )
-                    time.sleep(delay)
-                if (datetime.utcnow() - started_at) > timedelta(seconds=DEADLINE_SECONDS):
-                    logger.error(f"Дедлайн истёк для {fname} — прекращаю повторы")
-                    timed_out = True
-                    break
-            if not processed:
-                reason = "deadline_exceeded" if timed_out else "csv_import_error"
-                self._move_to_quarantine(fname, reason)
+        try:
+            self._import_file(fname, ext)
+        except Exception as e:
+            self._schedule_retry(fname, ext, e)
+        else:
+            self.retries.forget(fname)
 
     def on_created(self, event):
         """
@@ -186,24 +273,77 @@ class PrintEventHandler(FileSystemEventHandler):
         # Игнорируем каталоги
         if event.is_directory:
             return
-        self._process_file(event.src_path)
+        self._dispatch(event.src_path)
+
+    def on_moved(self, event):
+        """
+        Обрабатывает переименование: ingest_mover.sh кладёт файл как ``.<name>.part`` и затем переименовывает.
+
+        Args:
+            event: Событие файловой системы от watchdog
+        """
+        if event.is_directory:
+            return
+        self._dispatch(event.dest_path)
+
+
+def maintain_partitions() -> None:
+    """Создаёт будущие помесячные секции таблицы событий; ошибки только логируются."""
+    try:
+        created = ensure_partitions()
+        if created:
+            logger.info(f"Созданы секции событий печати: {', '.join(created)}")
+    except Exception as e:
+        logger.error(f"Ошибка обслуживания секций событий печати: {e}", exc_info=True)
 
 
-def process_existing_files(watch_dir: str) -> None:
+def backlog_sizes(watch_dir: str, event_handler: PrintEventHandler) -> dict[tuple[str, ...], float]:
+    """
+    Очередь файлов для ``advisor_watcher_backlog_files``.
+
+    ``waiting`` — файлы .json/.csv в каталоге без отложенного повтора, ``processing`` — поставленные
+    в пул (ожидают потока или обрабатываются), ``retry`` — ждущие повтора.
+    """
+    try:
+        names = os.listdir(watch_dir)
+    except OSError:
+        names = []
+    waiting = sum(
+        1
+        for name in names
+        if os.path.splitext(name)[1].lower() in (".json", ".csv")
+        and os.path.join(watch_dir, name) not in event_handler.retries
+    )
+    processing = event_handler.pool.backlog if event_handler.pool is not None else 0
+    return {
+        ("waiting",): waiting,
+        ("processing",): processing,
+        ("retry",): len(event_handler.retries.snapshot()),
+    }
+
+
+def process_existing_files(watch_dir: str, event_handler: PrintEventHandler | None = None) -> None:
     """
     Обрабатывает все существующие файлы в каталоге watch при старте watcher.
 
     Эта функция гарантирует, что файлы, которые были скопированы до запуска watcher,
     также будут обработаны.
 
+    CSV-файлы пользователей обрабатываются раньше JSON-событий, чтобы события
+    находили уже импортированных пользователей. Файлы с восстановленным отложенным
+    повтором пропускаются — их вернёт в обработку планировщик.
+
     Args:
         watch_dir: Каталог для поиска файлов
+        event_handler: Обработчик демона (с пулом и планировщиком повторов); по умолчанию —
+            новый обработчик, файлы обрабатываются последовательно в текущем потоке
     """
     if not os.path.exists(watch_dir):
         logger.warning(f"Каталог {watch_dir} не существует")
         return
 
-    event_handler = PrintEventHandler()
+    if event_handler is None:
+        event_handler = PrintEventHandler()
     # Получаем список всех файлов с расширениями .json и .csv
     json_files = []
     csv_files = []
@@ -211,7 +351,7 @@ def process_existing_files(watch_dir: str) -> None:
     try:
         for entry in os.listdir(watch_dir):
             full_path = os.path.join(watch_dir, entry)
-            if os.path.isfile(full_path):
+            if os.path.isfile(full_path) and full_path not in event_handler.retries:
                 ext = os.path.splitext(entry)[1].lower()
                 if ext == ".json":
                     json_files.append(full_path)
@@ -224,9 +364,12 @@ def process_existing_files(watch_dir: str) -> None:
     total_files = len(json_files) + len(csv_files)
     if total_files > 0:
         logger.info(f"Найдено существующих файлов для обработки: {len(json_files)} JSON, {len(csv_files)} CSV")
-        for fname in json_files + csv_files:
-            logger.info(f"Обработка существующего файла: {fname}")
-            event_handler._process_file(fname)
+        for batch in (sorted(csv_files), sorted(json_files)):
+            for fname in batch:
+                logger.info(f"Обработка существующего файла: {fname}")
+                event_handler._dispatch(fname)
+            if event_handler.pool is not None:
+                event_handler.pool.wait()
     else:
         logger.info(f"Существующих файлов для обработки в {watch_dir} не найдено")
 
@@ -237,20 +380,40 @@ if __name__ == "__main__":
     os.makedirs(QUARANTINE_DIR, exist_ok=True)
     os.makedirs(WATCH_DIR, exist_ok=True)
 
+    event_handler = PrintEventHandler()
+    pool = OrderedWorkerPool(event_handler._process_file, workers=WORKERS)
+    retries = RetryScheduler(event_handler._dispatch, RETRY_STATE_FILE)
+    event_handler.pool = pool
+    event_handler.retries = retries
+    logger.info(f"Потоков обработки файлов: {pool.workers}")
+    retries.start()
+
+    observer = Observer()
+    if METRICS_PORT:
+        # Сервер поднимается до разбора накопившихся файлов: /healthz отвечает и во время долгого старта,
+        # а после запуска наблюдателя проверяет, что его поток жив
+        WATCHER_BACKLOG.set_function(lambda: backlog_sizes(WATCH_DIR, event_handler))
+        start_metrics_server(METRICS_PORT, METRICS_HOST, health=lambda: observer.ident is None or observer.is_alive())
+        logger.info(f"Метрики: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
     # Обрабатываем все существующие файлы при старте
     logger.info("Обработка существующих файлов при старте...")
-    process_existing_files(WATCH_DIR)
+    process_existing_files(WATCH_DIR, event_handler)
 
     # Запускаем слежение за новыми файлами
-    event_handler = PrintEventHandler()
-    observer = Observer()
     # Следим только за WATCH_DIR, без рекурсии
     observer.schedule(event_handler, WATCH_DIR, recursive=False)
     observer.start()
     logger.info(f"Слежение за новыми файлами в {WATCH_DIR}... (Ctrl+C для выхода)")
+    last_partition_check = None
     try:
         while True:
+            if last_partition_check is None or time.monotonic() - last_partition_check >= PARTITION_CHECK_INTERVAL:
+                maintain_partitions()
+                last_partition_check = time.monotonic()
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
+    retries.stop()
+    pool.shutdown(wait=True)
@@ -0,0 +1,263 @@
+"""
+Журнал медленных SQL-запросов по отпечаткам (включается SLOW_QUERY_LOG).
+
+Каждый запрос веб-запроса проходит через ``connection.execute_wrapper`` (``SlowQueryMiddleware``):
+текст приводится к отпечатку — литералы, параметры и списки значений заменяются на ``?`` —
+и по паре (отпечаток, представление) копятся число, суммарное и максимальное время и последние
+``SAMPLE_SIZE`` длительностей для p95. Запрос дольше SLOW_QUERY_THRESHOLD_MS пишется в лог
+с местом вызова в коде проекта::
+
+    Медленный запрос 812 мс [statistics] printing/services.py:760 in get_statistics_data: SELECT ...
+
+Сводка — страница ``/slow-queries/`` для staff. Как и метрики (см. printing.metrics), процессы
+gunicorn сохраняют снимки в ``<METRICS_MULTIPROCESS_DIR>/slow_queries/<pid>.json``, а страница
+складывает их.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import FLUSH_INTERVAL
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 200  # последних длительностей на отпечаток для p95
+MAX_SQL_LENGTH = 2000  # сколько символов примера запроса хранить и писать в лог
+REPORT_ORDERS = ("total", "p95", "max", "count")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_VALUES = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_REPEATED = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """
+    Отпечаток запроса: текст без литералов и значений параметров.
+
+    Example:
+        >>> fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21")
+        'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+    """
+    text = _STRING.sub("?", sql)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    # IN (?, ?, ...) и VALUES (?, ?), (?, ?) не зависят от числа значений
+    text = _VALUES.sub("(...)", text)
+    text = _REPEATED.sub("(...)", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def call_site() -> str:
+    """Ближайший к запросу кадр стека в коде проекта (не Django, не сторонние пакеты)."""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = frame.filename
+        if not filename.startswith(base_dir) or "site-packages" in filename or filename == __file__:
+            continue
+        return f"{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}"
+    return "?"
+
+
+@dataclass
+class QueryStat:
+    fingerprint: str
+    view: str
+    count: int = 0
+    total: float = 0.0  # сек
+    max: float = 0.0
+    slow: int = 0  # запросов дольше порога
+    sql: str = ""  # пример полного текста
+    site: str = ""  # место вызова последнего медленного запроса
+    samples: deque[float] = field(default_factory=lambda: deque(maxlen=SAMPLE_SIZE))
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def p95(self) -> float:
+        """95-й перцентиль последних ``SAMPLE_SIZE`` длительностей, сек."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[max(math.ceil(len(ordered) * 0.95) - 1, 0)]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "view": self.view,
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "slow": self.slow,
+            "sql": self.sql,
+            "site": self.site,
+            "samples": list(self.samples),
+        }
+
+    def merge(self, data: dict[str, Any]) -> None:
+        self.count += data["count"]
+        self.total += data["total"]
+        self.max = max(self.max, data["max"])
+        self.slow += data["slow"]
+        self.sql = self.sql or data["sql"]
+        self.site = self.site or data["site"]
+        self.samples.extend(data["samples"])
+
+
+class QueryLog:
+    def __init__(self) -> None:
+        self._stats: dict[tuple[str, str], QueryStat] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def record(self, view: str, sql: str, seconds: float, *, site: str | None = None) -> None:
+        """Учитывает запрос; ``site`` передаётся для медленных запросов."""
+        key = (fingerprint(sql), view)
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = QueryStat(*key, sql=sql[:MAX_SQL_LENGTH])
+            stat.count += 1
+            stat.total += seconds
+            stat.max = max(stat.max, seconds)
+            stat.samples.append(seconds)
+            if site is not None:
+                stat.slow += 1
+                stat.site = site
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [stat.as_dict() for stat in self._stats.values()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def flush(self, directory: str | None, *, force: bool = False) -> None:
+        """Сохраняет снимок процесса в ``directory`` не чаще раза в FLUSH_INTERVAL."""
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        path = Path(directory) / f"{os.getpid()}.json"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_suffix(".tmp")
+            partial.write_text(json.dumps(self.snapshot(), ensure_ascii=False), encoding="utf-8")
+            partial.replace(path)
+        except OSError:
+            logger.warning(f"Не удалось сохранить снимок журнала запросов в {path}", exc_info=True)
+
+    def collect(self, directory: str | None = None) -> list[QueryStat]:
+        """Статистика этого процесса плюс снимки остальных процессов из ``directory``."""
+        snapshots: list[Iterable[dict[str, Any]]] = [self.snapshot()]
+        if directory and Path(directory).is_dir():
+            own = f"{os.getpid()}.json"
+            for path in sorted(Path(directory).glob("*.json")):
+                if path.name == own:
+                    continue
+                try:
+                    snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+                except (OSError, ValueError):
+                    logger.warning(f"Пропущен повреждённый снимок журнала запросов {path}", exc_info=True)
+        merged: dict[tuple[str, str], QueryStat] = {}
+        for snapshot in snapshots:
+            for data in snapshot:
+                key = (data["fingerprint"], data["view"])
+                merged.setdefault(key, QueryStat(*key)).merge(data)
+        return list(merged.values())
+
+    def reset(self, directory: str | None = None) -> None:
+        """Очищает статистику процесса и снимки всех процессов."""
+        self.clear()
+        if directory and Path(directory).is_dir():
+            for path in Path(directory).glob("*.json"):
+                path.unlink(missing_ok=True)
+
+
+QUERY_LOG = QueryLog()
+
+
+def snapshot_dir() -> str:
+    """Каталог снимков журнала: подкаталог METRICS_MULTIPROCESS_DIR (пусто — без обмена между процессами)."""
+    base = getattr(settings, "METRICS_MULTIPROCESS_DIR", "")
+    return os.path.join(base, "slow_queries") if base else ""
+
+
+def top_queries(stats: Iterable[QueryStat], order: str = "total", limit: int = 50) -> list[QueryStat]:
+    """Первые ``limit`` отпечатков по ``order`` (total | p95 | max | count), по убыванию."""
+    if order not in REPORT_ORDERS:
+        raise ValueError(f"Неизвестная сортировка {order!r}, ожидается одна из {REPORT_ORDERS}")
+    return sorted(stats, key=lambda stat: getattr(stat, order), reverse=True)[:limit]
+
+
+class _QueryRecorder:
+    def __init__(self, view: str | Callable[[], str], threshold: float, query_log: QueryLog) -> None:
+        self._view = view
+        self.threshold = threshold
+        self.query_log = query_log
+
+    @property
+    def view(self) -> str:
+        return self._view() if callable(self._view) else self._view
+
+    def __call__(self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - started
+            view = self.view
+            site = None
+            if seconds >= self.threshold:
+                site = call_site()
+                logger.warning(
+                    f"Медленный запрос {seconds * 1000:.0f} мс [{view}] {site}: {sql[:MAX_SQL_LENGTH]}",
+                    extra={"sql_fingerprint": fingerprint(sql), "sql_view": view, "sql_seconds": seconds},
+                )
+            self.query_log.record(view, sql, seconds, site=site)
+
+
+@contextmanager
+def log_queries(
+    view: str | Callable[[], str], threshold_ms: float | None = None, query_log: QueryLog = QUERY_LOG
+) -> Iterator[None]:
+    """
+    Учитывает SQL-запросы блока в журнале под меткой ``view``.
+
+    Args:
+        view: Метка представления (или задачи) либо функция, возвращающая её в момент запроса
+        threshold_ms: Порог медленного запроса; по умолчанию SLOW_QUERY_THRESHOLD_MS
+        query_log: Журнал (для тестов)
+    """
+    if threshold_ms is None:
+        threshold_ms = settings.SLOW_QUERY_THRESHOLD_MS
+    with connection.execute_wrapper(_QueryRecorder(view, threshold_ms / 1000, query_log)):
+        yield
@@ -0,0 +1,282 @@
+"""
+Разрешение справочников (здания, отделы, модели, принтеры, пользователи, компьютеры, порты)
+в первичные ключи при импорте событий печати.
+
+``DimensionResolver`` запоминает соответствие нормализованный ключ → pk на время импорта,
+поэтому к БД уходит примерно один запрос на каждый новый ключ. Экземпляр, полученный через
+``get_shared_resolver()``, может оставаться «тёплым» между файлами watcher'а; он ограничен
+по размеру (LRU) и сбрасывается, когда справочники меняются (см. ``invalidate_dimension_cache``).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+from typing import TYPE_CHECKING, Any
+
+from django.core.cache import cache
+from django.db import DatabaseError, models, transaction
+from django.db.models import Q
+
+from accounts.models import User
+
+from .models import Building, Computer, Department, Port, Printer, PrinterModel
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+DIMENSION_CACHE_VERSION_KEY = "dimension_cache_version"
+LOOKUP_CHUNK_SIZE = 500  # длина IN/OR-списков в запросах (лимит параметров SQLite)
+CREATE_BATCH_SIZE = 1000
+DEFAULT_MAX_ENTRIES = 50_000  # ключей на один справочник
+
+PrinterKey = tuple[int, str, int]  # (building_id, room_number.lower(), printer_index)
+
+
+def chunked(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+# -------------------- Пакетные запросы к справочникам --------------------
+
+
+def _fetch_ci_pks(model: type[models.Model], field: str, values: Iterable[str]) -> dict[str, int]:
+    """
+    Возвращает {значение.lower(): pk} для записей, совпадающих с values без учёта регистра.
+
+    Сначала точное совпадение через IN (использует индекс), затем iexact для оставшихся.
+    """
+    pending = {value.lower(): value for value in values}
+    found: dict[str, int] = {}
+    for chunk in chunked(sorted(pending.values()), LOOKUP_CHUNK_SIZE):
+        rows = model.objects.filter(**{f"{field}__in": chunk}).order_by("pk").values_list("pk", field)
+        for pk, value in rows:
+            found.setdefault(value.lower(), pk)
+    missing = [value for key, value in pending.items() if key not in found]
+    for chunk in chunked(missing, LOOKUP_CHUNK_SIZE):
+        condition = reduce(or_, (Q(**{f"{field}__iexact": value}) for value in chunk))
+        for pk, value in model.objects.filter(condition).order_by("pk").values_list("pk", field):
+            found.setdefault(value.lower(), pk)
+    return found
+
+
+def _bulk_create_ignoring_conflicts(model: type[models.Model], objs: list[models.Model]) -> None:
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(objs, batch_size=CREATE_BATCH_SIZE, ignore_conflicts=True)
+    except DatabaseError:
+        logger.warning("Пакетное создание %s не удалось, создаю записи по одной", model.__name__, exc_info=True)
+        for obj in objs:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([obj], ignore_conflicts=True)
+            except DatabaseError:
+                logger.error("Не удалось создать %s: %s", model.__name__, obj, exc_info=True)
+
+
+def _ensure_ci_pks(
+    model: type[models.Model], field: str, values: Iterable[str], factory: Callable[[str], models.Model]
+) -> dict[str, int]:
+    """Как `_fetch_ci_pks`, но недостающие записи создаются одним bulk_create."""
+    pending = {value.lower(): value for value in values}
+    pks = _fetch_ci_pks(model, field, pending.values())
+    missing = [value for key, value in pending.items() if key not in pks]
+    if missing:
+        _bulk_create_ignoring_conflicts(model, [factory(value) for value in missing])
+        pks.update(_fetch_ci_pks(model, field, missing))
+    return pks
+
+
+def _new_printer_model(code: str) -> PrinterModel:
+    # Парсим код модели: ожидается формат "Manufacturer Model" или просто код
+    parts = code.split(maxsplit=1)
+    manufacturer = parts[0] if parts else code
+    model = parts[1] if len(parts) > 1 else ""
+    return PrinterModel(code=code, manufacturer=manufacturer, model=model)
+
+
+def _ensure_users(usernames: Iterable[str], errors: list[str]) -> dict[str, int]:
+    usernames = set(usernames)
+    pks = _fetch_ci_pks(User, "username", usernames)
+    missing = sorted(username for username in usernames if username not in pks)
+    if missing:
+        # Создаем пользователей автоматически для избежания потери данных
+        for username in missing:
+            logger.warning(f"User '{username}' not found during import, creating automatically")
+            errors.append(f"User '{username}' was automatically created (missing FIO and department)")
+        _bulk_create_ignoring_conflicts(User, [User(username=u, fio=u, is_active=True) for u in missing])
+        pks.update(_fetch_ci_pks(User, "username", missing))
+    return pks
+
+
+def _fetch_printer_pks(keys: set[PrinterKey]) -> dict[PrinterKey, int]:
+    pks: dict[PrinterKey, int] = {}
+    for chunk in chunked(sorted({key[0] for key in keys}), LOOKUP_CHUNK_SIZE):
+        rows = (
+            Printer.objects.filter(building_id__in=chunk)
+            .order_by("pk")
+            .values_list("pk", "building_id", "room_number", "printer_index")
+        )
+        for pk, building_id, room_number, printer_index in rows:
+            key = (building_id, room_number.lower(), printer_index)
+            if key in keys:
+                pks.setdefault(key, pk)
+    return pks
+
+
+def _ensure_printers(candidates: dict[PrinterKey, Printer]) -> dict[PrinterKey, int]:
+    """Разрешает принтеры по (здание, помещение без учёта регистра, индекс), создавая недостающие."""
+    pks = _fetch_printer_pks(set(candidates))
+    missing = [key for key in candidates if key not in pks]
+    if missing:
+        _bulk_create_ignoring_conflicts(Printer, [candidates[key] for key in missing])
+        pks.update(_fetch_printer_pks(set(missing)))
+    return pks
+
+
+# -------------------- Кэширующий резолвер --------------------
+
+
+def get_dimension_cache_version() -> int:
+    version = cache.get(DIMENSION_CACHE_VERSION_KEY)
+    return version if isinstance(version, int) else 0
+
+
+def invalidate_dimension_cache() -> None:
+    """Помечает кэши всех резолверов устаревшими (вызывается при правке справочников)."""
+    try:
+        cache.incr(DIMENSION_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(DIMENSION_CACHE_VERSION_KEY, 1, None)
+    if _shared_resolver is not None:
+        _shared_resolver.clear()
+
+
+class DimensionResolver:
+    """
+    Кэш соответствий нормализованный ключ → pk для справочников импорта.
+
+    Ключи зданий, отделов, моделей, пользователей, компьютеров и портов — значения в нижнем
+    регистре (сравнение без учёта регистра, как в прежних ``_get_or_create_ci_*``), ключ
+    принтера — ``PrinterKey``. Отсутствующие в кэше ключи разрешаются пакетно, недостающие
+    записи создаются. Каждый справочник хранит не более ``max_entries`` ключей (LRU).
+
+    Example:
+        >>> resolver = DimensionResolver()
+        >>> resolver.departments(["IT", "HR"])
+        {'it': 1, 'hr': 2}
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memo: dict[str, OrderedDict[Any, int]] = {}
+        self._lock = threading.Lock()
+        self._version = get_dimension_cache_version()
+
+    def refresh(self) -> None:
+        """Сбрасывает кэш, если справочники менялись после его заполнения."""
+        version = get_dimension_cache_version()
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+
+    def _lookup(
+        self, name: str, pending: dict[Any, Any], load: Callable[[list[Any]], dict[Any, int]]
+    ) -> dict[Any, int]:
+        """Возвращает pk для ключей ``pending`` ({ключ: исходное значение}), подгружая промахи через ``load``."""
+        found: dict[Any, int] = {}
+        with self._lock:
+            memo = self._memo.setdefault(name, OrderedDict())
+            for key in pending:
+                pk = memo.get(key)
+                if pk is not None:
+                    memo.move_to_end(key)
+                    found[key] = pk
+        missing = [value for key, value in pending.items() if key not in found]
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            loaded = load(missing)
+            found.update(loaded)
+            with self._lock:
+                memo = self._memo.setdefault(name, OrderedDict())
+                memo.update(loaded)
+                while len(memo) > self.max_entries:
+                    memo.popitem(last=False)
+        return found
+
+    def _ci_lookup(
+        self, name: str, values: Iterable[str], load: Callable[[list[str]], dict[str, int]]
+    ) -> dict[str, int]:
+        return self._lookup(name, {value.lower(): value for value in values if value}, load)
+
+    def buildings(self, codes: Iterable[str]) -> dict[str, int]:
+        return self._ci_lookup(
+            "buildings",
+            codes,
+            lambda missing: _ensure_ci_pks(Building, "code", missing, lambda c: Building(code=c, name=c.upper())),
+        )
+
+    def departments(self, codes: Iterable[str]) -> dict[str, int]:
+        return self._ci_lookup(
+            "departments",
+            codes,
+            lambda missing: _ensure_ci_pks(Department, "code", missing, lambda c: Department(code=c, name=c.upper())),
+        )
+
+    def printer_models(self, codes: Iterable[str]) -> dict[str, int]:
+        return self._ci_lookup(
+            "printer_models", codes, lambda missing: _ensure_ci_pks(PrinterModel, "code", missing, _new_printer_model)
+        )
+
+    def computers(self, names: Iterable[str]) -> dict[str, int]:
+        return self._ci_lookup(
+            "computers", names, lambda missing: _ensure_ci_pks(Computer, "name", missing, lambda n: Computer(name=n))
+        )
+
+    def ports(self, names: Iterable[str]) -> dict[str, int]:
+        return self._ci_lookup(
+            "ports", names, lambda missing: _ensure_ci_pks(Port, "name", missing, lambda n: Port(name=n))
+        )
+
+    def users(self, usernames: Iterable[str], errors: list[str]) -> dict[str, int]:
+        """Разрешает пользователей; отсутствующие создаются с сообщением в ``errors``."""
+        return self._ci_lookup("users", usernames, lambda missing: _ensure_users(missing, errors))
+
+    def printers(self, candidates: dict[PrinterKey, Printer]) -> dict[PrinterKey, int]:
+        """
+        Разрешает принтеры по ``PrinterKey``.
+
+        Args:
+            candidates: Несохранённые экземпляры Printer, создаваемые для отсутствующих ключей
+        """
+
+        def load(missing: list[PrinterKey]) -> dict[PrinterKey, int]:
+            return _ensure_printers({key: candidates[key] for key in missing})
+
+        return self._lookup("printers", {key: key for key in candidates}, load)
+
+
+_shared_resolver: DimensionResolver | None = None
+_shared_resolver_lock = threading.Lock()
+
+
+def get_shared_resolver() -> DimensionResolver:
+    """Резолвер процесса, сохраняющий кэш между импортами (используется watcher'ом)."""
+    global _shared_resolver
+    with _shared_resolver_lock:
+        if _shared_resolver is None:
+            _shared_resolver = DimensionResolver()
+        return _shared_resolver
@@ -0,0 +1,177 @@
+"""
+Суточные итоги печати (PrintDailyRollup).
+
+Статистика за месяц/год читает итоги вместо сырых PrintEvent. Итоги поддерживаются
+инкрементально: после импорта пересчитываются только затронутые сутки и пользователи
+(``refresh_daily_rollups``), полностью таблица перестраивается командой
+``python manage.py rebuild_print_rollups`` (``rebuild_daily_rollups``).
+
+Сутки определяются в текущем часовом поясе Django (как ``TruncDate`` в прежних запросах).
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import PrintDailyRollup, PrintEvent
+from .resolvers import LOOKUP_CHUNK_SIZE, chunked
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from django.db import models
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_BATCH_SIZE = 1000
+
+RollupKey = tuple[date, int, int]  # (date, user_id, printer_id)
+
+
+def local_date(value: date | datetime) -> date:
+    """Календарная дата значения в текущем часовом поясе."""
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def rollup_key(event: PrintEvent) -> RollupKey:
+    return (local_date(event.timestamp), event.user_id, event.printer_id)
+
+
+def _day_start(day: date) -> datetime:
+    start = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(start) if timezone.is_naive(start) else start
+
+
+def _aggregate(events: models.QuerySet[Any]) -> Iterator[dict[str, Any]]:
+    rows: Iterator[dict[str, Any]] = (
+        events.annotate(day=TruncDate("timestamp"))
+        .values("day", "user_id", "printer_id", "user__department_id")
+        .annotate(total_pages=Sum("pages"), total_documents=Count("id"), total_bytes=Sum("byte_size"))
+        .order_by()
+        .iterator(chunk_size=ROLLUP_BATCH_SIZE)
+    )
+    return rows
+
+
+def _to_rollup(model: type[models.Model], row: dict[str, Any]) -> models.Model:
+    return model(
+        date=row["day"],
+        user_id=row["user_id"],
+        printer_id=row["printer_id"],
+        department_id=row["user__department_id"],
+        pages=row["total_pages"] or 0,
+        documents=row["total_documents"],
+        byte_size=row["total_bytes"] or 0,
+    )
+
+
+def refresh_daily_rollups(keys: Iterable[RollupKey]) -> int:
+    """
+    Пересчитывает итоги затронутых суток по сырым событиям и сохраняет их (upsert).
+
+    Пересчёт идёт по паре (сутки, пользователь) — итоги всех его принтеров за эти сутки;
+    итоги, для которых событий больше нет, удаляются. Повторный вызов безопасен.
+
+    Args:
+        keys: Ключи (дата, user_id, printer_id) добавленных или удалённых событий
+
+    Returns:
+        int: Число сохранённых строк итогов
+    """
+    users_by_day: dict[date, set[int]] = defaultdict(set)
+    for day, user_id, _printer_id in keys:
+        users_by_day[day].add(user_id)
+
+    saved = 0
+    for day, user_ids in sorted(users_by_day.items()):
+        start = _day_start(day)
+        end = _day_start(day + timedelta(days=1))
+        for chunk in chunked(sorted(user_ids), LOOKUP_CHUNK_SIZE):
+            events = PrintEvent.objects.filter(timestamp__gte=start, timestamp__lt=end, user_id__in=chunk)
+            rows = [_to_rollup(PrintDailyRollup, row) for row in _aggregate(events)]
+            present = {(row.user_id, row.printer_id) for row in rows}
+            with transaction.atomic():
+                stale = [
+                    pk
+                    for pk, user_id, printer_id in PrintDailyRollup.objects.filter(
+                        date=day, user_id__in=chunk
+                    ).values_list("pk", "user_id", "printer_id")
+                    if (user_id, printer_id) not in present
+                ]
+                if stale:
+                    PrintDailyRollup.objects.filter(pk__in=stale).delete()
+                PrintDailyRollup.objects.bulk_create(
+                    rows,
+                    batch_size=ROLLUP_BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=["date", "user", "printer"],
+                    update_fields=["department", "pages", "documents", "byte_size"],
+                )
+            saved += len(rows)
+    return saved
+
+
+def rebuild_daily_rollups(
+    start: date | None = None,
+    end: date | None = None,
+) -> int:
+    """
+    Перестраивает итоги за период [start, end] (по умолчанию — за всё время) помесячно.
+
+    Args:
+        start: Первая дата (включительно)
+        end: Последняя дата (включительно)
+
+    Returns:
+        int: Число созданных строк итогов
+
+    Example:
+        >>> rebuild_daily_rollups(date(2025, 1, 1), date(2025, 12, 31))
+    """
+    if start is None or end is None:
+        bounds = PrintEvent.objects.aggregate(first=Min("timestamp"), last=Max("timestamp"))
+        if bounds["first"] is None:
+            return 0
+        start = start or local_date(bounds["first"])
+        end = end or local_date(bounds["last"])
+
+    created = 0
+    month_start = start
+    while month_start <= end:
+        next_month = (month_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        month_end = min(next_month - timedelta(days=1), end)
+        events = PrintEvent.objects.filter(
+            timestamp__gte=_day_start(month_start), timestamp__lt=_day_start(month_end + timedelta(days=1))
+        )
+        with transaction.atomic():
+            PrintDailyRollup.objects.filter(date__gte=month_start, date__lte=month_end).delete()
+            batch: list[models.Model] = []
+            for row in _aggregate(events):
+                batch.append(_to_rollup(PrintDailyRollup, row))
+                if len(batch) >= ROLLUP_BATCH_SIZE:
+                    PrintDailyRollup.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            PrintDailyRollup.objects.bulk_create(batch)
+            created += len(batch)
+        logger.info(f"Итоги печати за {month_start:%Y-%m} перестроены")
+        month_start = next_month
+    return created
+
+
+def sync_rollup_departments(user_id: int, department_id: int | None) -> int:
+    """Переносит итоги пользователя в его текущий отдел (после смены отдела)."""
+    rollups = PrintDailyRollup.objects.filter(user_id=user_id)
+    if department_id is None:
+        return int(rollups.exclude(department__isnull=True).update(department=None))
+    return int(rollups.exclude(department_id=department_id).update(department_id=department_id))
@@ -1,43 +1,121 @@
 from __future__ import annotations
 
+import codecs
 import csv
 import hashlib
 import logging
+import time
 from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
 from typing import TYPE_CHECKING, Any
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Iterable, Iterator, Sequence
 
+from django.conf import settings
 from django.core.cache import cache
-from django.db import IntegrityError, transaction
-from django.db.models import Count, Max, Q, Sum
-from django.db.models.functions import TruncDate
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Sum
+from django.dispatch import Signal
 from django.utils import timezone
 
 from accounts.models import User
 
-from .models import (
-    Building,
-    Computer,
-    Department,
-    Port,
-    Printer,
-    PrinterModel,
-    PrintEvent,
-)
+from .caching import get_or_compute
+from .instrumentation import IngestStats, format_ingest_metrics
+from .loaders import copy_loader_available, copy_print_events
+from .metrics import INGEST_EVENTS, INGEST_STAGE_SECONDS
+from .models import Department, Printer, PrintEvent
+from .resolvers import LOOKUP_CHUNK_SIZE, DimensionResolver, PrinterKey, chunked
+from .rollups import RollupKey, local_date, refresh_daily_rollups, rollup_key, sync_rollup_departments
+from .tree import NODE_LIMIT, assemble_print_tree, fetch_tree_rows, tree_node_children
 
 logger = logging.getLogger(__name__)
 
 STATS_CACHE_VERSION_KEY = "stats_cache_version"
 
+# Отправляется один раз на вызов import_print_events, если что-то было вставлено:
+# dates — затронутые даты, department_ids — отделы пользователей, keys — RollupKey новых событий
+print_events_imported = Signal()
+
+PRINT_EVENTS_CHUNK_SIZE = 5000  # событий, разбираемых и разрешаемых за один проход
+PRINT_EVENTS_BATCH_SIZE = 1000  # строк PrintEvent в одном bulk_create
+
+
+def _new_cache_version() -> int:
+    # Версия, которой гарантированно не было раньше: если ключ версии вытеснен из кэша
+    # (LRU/MAX_ENTRIES), статистика, закэшированная под прежними версиями, не подхватится
+    return time.time_ns() // 1000
+
 
 def _get_stats_cache_version() -> int:
     version = cache.get(STATS_CACHE_VERSION_KEY)
     if isinstance(version, int) and version > 0:
         return version
-    cache.set(STATS_CACHE_VERSION_KEY, 1, None)
-    return 1
+    # add: параллельные процессы (воркеры gunicorn, watcher) сходятся на одном значении
+    cache.add(STATS_CACHE_VERSION_KEY, _new_cache_version(), None)
+    return cache.get(STATS_CACHE_VERSION_KEY) or 1
+
+
+def _month_version_key(day: date) -> str:
+    return f"{STATS_CACHE_VERSION_KEY}_{day:%Y-%m}"
+
+
+def _months(start_day: date, end_day: date) -> list[date]:
+    months = []
+    month = start_day.replace(day=1)
+    while month <= end_day:
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _bump_version(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_cache_version(), None)
+
+
+def get_stats_cache_token(start: date | datetime, end: date | datetime) -> str:
+    """
+    Версия кэша статистики за период.
+
+    Складывается из глобальной версии и версий месяцев периода, поэтому импорт событий
+    за март не сбрасывает закэшированную статистику за закрытый январь.
+
+    Example:
+        >>> cache_key = f"department_stats_top_{get_stats_cache_token(start, end)}_{start:%Y-%m-%d}_{end:%Y-%m-%d}"
+    """
+    keys = [_month_version_key(month) for month in _months(local_date(start), local_date(end))]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_cache_version(), None)
+        versions.update(cache.get_many(missing))
+    months_version = ".".join(str(versions.get(key, 0)) for key in keys)
+    digest = hashlib.md5(months_version.encode(), usedforsecurity=False).hexdigest()[:12]
+    return f"v{_get_stats_cache_version()}_{digest}"
+
+
+def invalidate_statistics_cache(department_ids: Iterable[int | None] = (), dates: Iterable[date] | None = None) -> None:
+    """
+    Сбрасывает кэш статистики после появления новых событий печати.
+
+    Args:
+        department_ids: Отделы пользователей, чьи события были добавлены
+        dates: Даты добавленных событий: сбрасываются только периоды, включающие их месяцы.
+            None — сбросить статистику за все периоды.
+    """
+    keys = [f"print_stats_{dept_id}" for dept_id in set(department_ids) if dept_id is not None]
+    cache.delete_many([*keys, "total_print_stats", "department_stats_top", "user_stats_top10"])
+    if dates is None:
+        _bump_version(STATS_CACHE_VERSION_KEY)
+        return
+    for month in sorted({day.replace(day=1) for day in dates}):
+        _bump_version(_month_version_key(month))
 
 
 def _get_or_create_ci_department(code: str) -> Department:
@@ -50,104 +128,200 @@ def _get_or_create_ci_department(code: str) -> Department:
     return Department.objects.create(code=normalized, name=normalized.upper())
 
 
-def _get_or_create_ci_building(code: str) -> Building:
-    normalized = (code or "").strip().lower()
-    if not normalized:
-        raise ValueError("Building code is empty")
-    existing = Building.objects.filter(code__iexact=normalized).first()
-    if existing:
-        return existing
-    return Building.objects.create(code=normalized, name=normalized.upper())
+@dataclass
+class ImportUsersResult:
+    created: int
+    errors: list[str]
 
 
-def _get_or_create_ci_printer_model(model_code: str) -> PrinterModel:
-    normalized = (model_code or "").strip()
-    if not normalized:
-        raise ValueError("Printer model code is empty")
-    existing = PrinterModel.objects.filter(code__iexact=normalized).first()
-    if existing:
-        return existing
-    # Парсим код модели: ожидается формат "Manufacturer Model" или просто код
-    parts = normalized.split(maxsplit=1)
-    manufacturer = parts[0] if parts else normalized
-    model = parts[1] if len(parts) > 1 else ""
-    return PrinterModel.objects.create(code=normalized, manufacturer=manufacturer, model=model)
-
-
-def _get_or_create_ci_printer(
-    building: Building,
-    room_number: str,
-    printer_index: int,
-    printer_model: PrinterModel,
-    department: Department,
-    full_name: str,
-) -> Printer:
-    existing = (
-        Printer.objects.filter(
-            building=building,
-            room_number__iexact=(room_number or "").strip(),
-            printer_index=printer_index,
-        )
-        .select_related("building", "model", "department")
-        .first()
-    )
-    if existing:
-        return existing
-    return Printer.objects.create(
-        name=full_name,
-        model=printer_model,
-        department=department,
-        building=building,
-        room_number=(room_number or "").strip(),
-        printer_index=printer_index,
-        is_active=True,
-    )
+USERS_IMPORT_CHUNK_SIZE = 1000  # строк CSV пользователей в одной пачке синхронизации
 
 
 @dataclass
-class ImportUsersResult:
-    created: int
-    errors: list[str]
+class _ParsedUserRow:
+    """Строка CSV пользователей AD."""
+
+    line_num: int
+    username: str
+    fio: str
+    department_code: str
+
+
+def _iter_user_rows(file_bytes, skipped: set[str] | None = None) -> Iterator[_ParsedUserRow]:
+    """
+    Потоково читает CSV (SamAccountName, DisplayName, OU); строки без логина или OU пропускаются.
+
+    Логины пропущенных строк без OU добавляются в ``skipped``: пользователь есть в выгрузке.
+    """
+    reader = csv.DictReader(codecs.getreader("utf-8-sig")(file_bytes))
+    for row in reader:
+        username = (row.get("SamAccountName") or "").strip().lower()
+        dept_code = (row.get("OU") or "").strip()
+        if not username or not dept_code:
+            if username and skipped is not None:
+                skipped.add(username)
+            continue
+        yield _ParsedUserRow(reader.line_num, username, (row.get("DisplayName") or "").strip(), dept_code)
+
+
+def _record_user_row_error(errors: list[str], line_num: int, exc: Exception) -> None:
+    if isinstance(exc, ValueError | TypeError | KeyError):
+        # Обрабатываем ожидаемые ошибки валидации отдельно
+        msg = f"Row validation error (line {line_num}): {exc}"
+        logger.warning(msg, exc_info=exc)
+    elif isinstance(exc, IntegrityError):
+        msg = f"Row integrity error (line {line_num}): {exc}"
+        logger.warning(msg, exc_info=exc)
+    else:
+        msg = f"Row processing error (line {line_num}): {exc}"
+        logger.error(msg, exc_info=exc)
+    errors.append(msg)
+
+
+def _upsert_user_row(row: _ParsedUserRow) -> tuple[User, bool]:
+    with transaction.atomic():
+        department = _get_or_create_ci_department(row.department_code)
+        return User.objects.update_or_create(
+            username=row.username,
+            defaults={"fio": row.fio or row.username, "department": department, "is_active": True},
+        )
 
 
-def import_users_from_csv_stream(file_bytes) -> dict[str, Any]:
-    created = 0
+class _UserDiffSync:
+    """
+    Дифференциальная синхронизация пользователей с выгрузкой AD.
+
+    Текущее состояние пользователей (логин → pk, ФИО, отдел, активность) читается один раз;
+    для каждой пачки строк CSV в памяти вычисляются новые, изменённые и неизменные записи,
+    и в БД пишется только разница: ``bulk_create`` новых и ``bulk_update`` изменённых.
+    """
+
+    def __init__(self, resolver: DimensionResolver) -> None:
+        self.resolver = resolver
+        self.state: dict[str, tuple[int, str, int | None, bool]] = {
+            username: (pk, fio, department_id, is_active)
+            for pk, username, fio, department_id, is_active in User.objects.values_list(
+                "pk", "username", "fio", "department_id", "is_active"
+            ).iterator(chunk_size=USERS_IMPORT_CHUNK_SIZE)
+        }
+        self.seen: set[str] = set()
+        self.moved: dict[int, int | None] = {}  # pk → новый department_id
+        self.counts = {"created": 0, "updated": 0, "unchanged": 0, "deactivated": 0}
+
+    def apply(self, rows: list[_ParsedUserRow]) -> None:
+        """Записывает разницу для пачки строк; при ошибке БД пачка откатывается целиком."""
+        # Повтор логина внутри пачки: как и при построчном импорте, побеждает последняя строка
+        latest = {row.username: row for row in rows}
+        dept_pks = self.resolver.departments(row.department_code.upper() for row in latest.values())
+        to_create: list[User] = []
+        to_update: list[User] = []
+        moved: dict[int, int | None] = {}
+        unchanged = 0
+        for username, row in latest.items():
+            fio = row.fio or username
+            department_id = dept_pks[row.department_code.lower()]
+            current = self.state.get(username)
+            if current is None:
+                to_create.append(User(username=username, fio=fio, department_id=department_id, is_active=True))
+            elif current[1:] == (fio, department_id, True):
+                unchanged += 1
+            else:
+                to_update.append(
+                    User(pk=current[0], username=username, fio=fio, department_id=department_id, is_active=True)
+                )
+                if current[2] != department_id:
+                    moved[current[0]] = department_id
+        with transaction.atomic():
+            User.objects.bulk_create(to_create, batch_size=USERS_IMPORT_CHUNK_SIZE)
+            User.objects.bulk_update(to_update, ["fio", "department", "is_active"], batch_size=USERS_IMPORT_CHUNK_SIZE)
+        if any(user.pk is None for user in to_create):
+            self.reload([user.username for user in to_create])
+        else:
+            for user in to_create:
+                self.state[user.username] = (user.pk, user.fio, user.department_id, True)
+        for user in to_update:
+            self.state[user.username] = (user.pk, user.fio, user.department_id, True)
+        self.seen.update(latest)
+        self.moved.update(moved)
+        self.counts["created"] += len(to_create)
+        self.counts["updated"] += len(to_update)
+        self.counts["unchanged"] += unchanged
+
+    def reload(self, usernames: Iterable[str]) -> None:
+        """Перечитывает состояние пользователей (после построчного импорта пачки)."""
+        usernames = set(usernames)
+        for chunk in chunked(sorted(usernames), LOOKUP_CHUNK_SIZE):
+            for pk, username, fio, department_id, is_active in User.objects.filter(username__in=chunk).values_list(
+                "pk", "username", "fio", "department_id", "is_active"
+            ):
+                self.state[username] = (pk, fio, department_id, is_active)
+        self.seen.update(usernames)
+
+    def deactivate_missing(self) -> None:
+        """Деактивирует активных пользователей, отсутствующих в выгрузке (кроме staff и суперпользователей)."""
+        missing = [
+            pk for username, (pk, *_rest, is_active) in self.state.items() if is_active and username not in self.seen
+        ]
+        for chunk in chunked(missing, LOOKUP_CHUNK_SIZE):
+            self.counts["deactivated"] += User.objects.filter(
+                pk__in=chunk, is_active=True, is_staff=False, is_superuser=False
+            ).update(is_active=False)
+
+
+def import_users_from_csv_stream(
+    file_bytes, bulk: bool | None = None, deactivate_missing: bool | None = None
+) -> dict[str, Any]:
+    """
+    Импортирует пользователей AD из CSV (SamAccountName, DisplayName, OU).
+
+    Файл читается потоково. В пакетном режиме (по умолчанию, настройка USERS_IMPORT_BULK)
+    выполняется дифференциальная синхронизация (``_UserDiffSync``): пачками по
+    ``USERS_IMPORT_CHUNK_SIZE`` строк создаются только новые пользователи и обновляются только
+    изменившиеся. Если пачка не сохраняется, её строки повторяются по одной, и ошибка попадает
+    в ``errors`` с номером строки.
+
+    Args:
+        file_bytes: Бинарный файлоподобный объект
+        bulk: Пакетный режим; None — значение настройки USERS_IMPORT_BULK
+        deactivate_missing: Файл — полная выгрузка AD: деактивировать активных пользователей,
+            которых в нём нет (staff и суперпользователи не трогаются). Выполняется только в
+            пакетном режиме и только если файл импортирован без ошибок (в том числе в строках).
+            None — значение настройки USERS_SYNC_DEACTIVATE_MISSING
+
+    Returns:
+        dict: {"created", "updated", "unchanged", "deactivated": счётчики, "errors": список ошибок}
+    """
+    if bulk is None:
+        bulk = getattr(settings, "USERS_IMPORT_BULK", True)
+    if deactivate_missing is None:
+        deactivate_missing = getattr(settings, "USERS_SYNC_DEACTIVATE_MISSING", False)
     errors: list[str] = []
-    try:
-        decoded = file_bytes.read().decode("utf-8-sig")
-        reader = csv.DictReader(decoded.splitlines())
-        for row in reader:
+    sync = _UserDiffSync(DimensionResolver()) if bulk else None
+    counts = sync.counts if sync else {"created": 0, "updated": 0, "unchanged": 0, "deactivated": 0}
+    skipped: set[str] = set()
+
+    def import_rows(rows: list[_ParsedUserRow]) -> None:
+        if sync is not None:
             try:
-                username = (row.get("SamAccountName") or "").strip().lower()
-                fio = (row.get("DisplayName") or "").strip()
-                dept_code = (row.get("OU") or "").strip()
-                if not username or not dept_code:
-                    continue
-                with transaction.atomic():
-                    department = _get_or_create_ci_department(dept_code)
-                    user, was_created = User.objects.update_or_create(
-                        username=username,
-                        defaults={
-                            "fio": fio or username,
-                            "department": department,
-                            "is_active": True,
-                        },
-                    )
-                if was_created:
-                    created += 1
-            except (ValueError, TypeError, KeyError) as e:
-                # Обрабатываем ожидаемые ошибки валидации отдельно
-                msg = f"Row validation error (line {reader.line_num}): {e}"
-                logger.warning(msg, exc_info=True)
-                errors.append(msg)
-            except IntegrityError as e:
-                msg = f"Row integrity error (line {reader.line_num}): {e}"
-                logger.warning(msg, exc_info=True)
-                errors.append(msg)
+                sync.apply(rows)
+            except Exception:  # noqa: BLE001 - повторяем пачку построчно, чтобы указать строку с ошибкой
+                logger.warning("Пакетный импорт пользователей не удался, импортирую строки по одной", exc_info=True)
+            else:
+                return
+        for row in rows:
+            try:
+                _user, was_created = _upsert_user_row(row)
             except Exception as e:  # noqa: BLE001 - логируем и продолжаем пакет
-                msg = f"Row processing error (line {reader.line_num}): {e}"
-                logger.error(msg, exc_info=True)
-                errors.append(msg)
+                _record_user_row_error(errors, row.line_num, e)
+            else:
+                counts["created" if was_created else "updated"] += 1
+        if sync is not None:
+            sync.reload(row.username for row in rows)
+
+    try:
+        rows = _iter_user_rows(file_bytes, skipped)
+        while chunk := list(islice(rows, USERS_IMPORT_CHUNK_SIZE)):
+            import_rows(chunk)
     except (UnicodeDecodeError, csv.Error) as e:
         # Обрабатываем ошибки чтения файла отдельно
         msg = f"File reading error: {e}"
@@ -157,176 +331,400 @@ def import_users_from_csv_stream(file_bytes) -> dict[str, Any]:
         msg = f"Users import failed: {e}"
         logger.error(msg, exc_info=True)
         errors.append(msg)
-    return {"created": created, "errors": errors}
 
+    if sync is not None:
+        # Любая ошибка (чтение файла или отдельная строка) — выгрузка неполна, деактивировать нельзя
+        if deactivate_missing and not errors and sync.seen:
+            sync.seen.update(skipped)
+            sync.deactivate_missing()
+        # bulk_update не отправляет post_save: переносим итоги сменивших отдел пользователей явно
+        if sum(sync_rollup_departments(user_id, dept_id) for user_id, dept_id in sync.moved.items()):
+            invalidate_statistics_cache()
+    logger.info(
+        f"Синхронизация пользователей: создано {counts['created']}, обновлено {counts['updated']}, "
+        f"без изменений {counts['unchanged']}, деактивировано {counts['deactivated']}"
+    )
+    return {**counts, "errors": errors}
+
+
+class _EventRejected(ValueError):
+    """Событие отклонено; сообщение попадает в список ошибок без префикса."""
 
-def import_print_events(events: Iterable[dict[str, Any]]) -> dict[str, Any]:
-    created = 0
-    errors: list[str] = []
-    BATCH_SIZE = 100  # Обрабатываем события батчами для оптимизации транзакций
 
-    events_list = list(events) if not isinstance(events, list) else events
-    total_events = len(events_list)
+@dataclass
+class _ParsedPrintEvent:
+    """Нормализованное событие печати до разрешения внешних ключей."""
+
+    job_id: str
+    username: str
+    document_id: int
+    document_name: str
+    byte_size: int
+    pages: int
+    timestamp: datetime
+    printer_name: str
+    computer_name: str
+    port_name: str
+    model_code: str = ""
+    building_code: str = ""
+    department_code: str = ""
+    room_number: str = ""
+    printer_index: int = 0
+
+
+def _record_event_error(errors: list[str], exc: Exception) -> None:
+    if isinstance(exc, _EventRejected):
+        errors.append(str(exc))
+    elif isinstance(exc, ValueError | TypeError | KeyError):
+        msg = f"Event validation error: {exc}"
+        logger.warning(msg, exc_info=exc)
+        errors.append(msg)
+    elif isinstance(exc, IntegrityError):
+        msg = f"Event integrity error: {exc}"
+        logger.warning(msg, exc_info=exc)
+        errors.append(msg)
+    else:
+        msg = f"Event import error: {exc}"
+        logger.error(msg, exc_info=exc)
+        errors.append(msg)
+
 
-    # Получаем все существующие job_id одним запросом для дедупликации
-    existing_job_ids = set(
-        PrintEvent.objects.filter(
-            job_id__in=[(e.get("JobID") or "").strip()[:64] for e in events_list if e.get("JobID")]
-        ).values_list("job_id", flat=True)
+def _build_job_id(event: dict[str, Any], username: str, document_id: int, timestamp_ms: int) -> str:
+    raw_job_id = (event.get("JobID") or "").strip()
+    if raw_job_id:
+        return raw_job_id[:64]
+    surrogate_payload = "|".join(
+        [
+            username,
+            str(document_id),
+            str(event.get("Param2") or ""),
+            str(event.get("Param4") or ""),
+            str(event.get("Param5") or ""),
+            str(event.get("Param6") or ""),
+            str(timestamp_ms),
+        ]
+    )
+    return f"AUTO-{hashlib.sha256(surrogate_payload.encode('utf-8')).hexdigest()[:59]}"
+
+
+def _parse_print_event(event: dict[str, Any]) -> _ParsedPrintEvent:
+    username = (event.get("Param3") or "").strip().lower()
+    if not username:
+        raise _EventRejected("Missing username (Param3)")
+    document_id = int(event.get("Param1") or 0)
+    timestamp_ms = int(str(event.get("TimeCreated", "0")).replace("/Date(", "").replace(")/", ""))
+    ts = timezone.datetime.fromtimestamp(timestamp_ms / 1000)
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts, timezone.get_default_timezone())
+    return _ParsedPrintEvent(
+        job_id=_build_job_id(event, username, document_id, timestamp_ms),
+        username=username,
+        document_id=document_id,
+        document_name=event.get("Param2", ""),
+        byte_size=int(event.get("Param7") or 0),
+        pages=int(event.get("Param8") or 0),
+        timestamp=ts,
+        printer_name=(event.get("Param5") or "").strip().lower(),
+        computer_name=(event.get("Param4") or "").strip().lower(),
+        port_name=(event.get("Param6") or "").strip().lower(),
     )
 
-    # Обрабатываем события батчами
-    for batch_start in range(0, total_events, BATCH_SIZE):
-        batch_end = min(batch_start + BATCH_SIZE, total_events)
-        batch_events = events_list[batch_start:batch_end]
 
-        batch_created = 0
-        for event in batch_events:
+def _parse_printer_name(item: _ParsedPrintEvent) -> None:
+    """Разбирает имя принтера формата model-bld-dept-room-idx в поля события."""
+    parts = item.printer_name.split("-")
+    if len(parts) != 5:
+        raise _EventRejected(f"Invalid printer format: {item.printer_name}")
+    model_code, bld_code, dept_code, room_number, printer_index_str = parts
+    try:
+        item.printer_index = int(printer_index_str)
+    except ValueError:
+        raise _EventRejected(f"Invalid printer index: {printer_index_str}") from None
+    item.building_code = bld_code.strip().lower()
+    item.department_code = dept_code.strip().upper()
+    item.model_code = model_code.strip()
+    item.room_number = room_number.strip()
+    if not item.building_code:
+        raise ValueError("Building code is empty")
+    if not item.department_code:
+        raise ValueError("Department code is empty")
+    if not item.model_code:
+        raise ValueError("Printer model code is empty")
+
+
+def _fetch_existing_job_ids(job_ids: Iterable[str]) -> set[str]:
+    existing: set[str] = set()
+    for chunk in chunked(sorted(set(job_ids)), LOOKUP_CHUNK_SIZE):
+        existing.update(PrintEvent.objects.filter(job_id__in=chunk).values_list("job_id", flat=True))
+    return existing
+
+
+def _select_new_events(parsed: list[_ParsedPrintEvent], errors: list[str]) -> tuple[list[_ParsedPrintEvent], int]:
+    """
+    Отбрасывает уже загруженные и повторяющиеся в пакете job_id, затем проверяет имя принтера.
+
+    Returns:
+        tuple: (события для загрузки, число пропущенных дубликатов)
+    """
+    seen_job_ids = _fetch_existing_job_ids(item.job_id for item in parsed)
+    selected: list[_ParsedPrintEvent] = []
+    duplicates = 0
+    for item in parsed:
+        if item.job_id in seen_job_ids:
+            duplicates += 1
+            continue
+        seen_job_ids.add(item.job_id)
+        try:
+            _parse_printer_name(item)
+        except Exception as e:  # noqa: BLE001 - ошибка одного события не прерывает пакет
+            _record_event_error(errors, e)
+            continue
+        selected.append(item)
+    return selected, duplicates
+
+
+def _resolve_print_events(
+    parsed: list[_ParsedPrintEvent], errors: list[str], resolver: DimensionResolver
+) -> list[PrintEvent]:
+    """Разрешает справочники через резолвер и строит несохранённые экземпляры PrintEvent."""
+    buildings = resolver.buildings(p.building_code for p in parsed)
+    departments = resolver.departments(p.department_code for p in parsed)
+    printer_models = resolver.printer_models(p.model_code for p in parsed)
+    candidates: dict[PrinterKey, Printer] = {}
+    for item in parsed:
+        building_id = buildings.get(item.building_code.lower())
+        department_id = departments.get(item.department_code.lower())
+        model_id = printer_models.get(item.model_code.lower())
+        if building_id is None or department_id is None or model_id is None:
+            continue
+        candidates.setdefault(
+            (building_id, item.room_number.lower(), item.printer_index),
+            Printer(
+                name=item.printer_name,
+                model_id=model_id,
+                department_id=department_id,
+                building_id=building_id,
+                room_number=item.room_number,
+                printer_index=item.printer_index,
+                is_active=True,
+            ),
+        )
+    printers = resolver.printers(candidates)
+    users = resolver.users((p.username for p in parsed), errors)
+    computers = resolver.computers(p.computer_name for p in parsed)
+    ports = resolver.ports(p.port_name for p in parsed)
+
+    rows: list[PrintEvent] = []
+    for item in parsed:
+        building_id = buildings.get(item.building_code.lower())
+        printer_id = printers.get((building_id, item.room_number.lower(), item.printer_index))
+        user_id = users.get(item.username)
+        if printer_id is None or user_id is None:
+            errors.append(f"Event import error: could not resolve printer or user for job {item.job_id}")
+            continue
+        rows.append(
+            PrintEvent(
+                document_id=item.document_id,
+                document_name=item.document_name,
+                user_id=user_id,
+                printer_id=printer_id,
+                job_id=item.job_id,
+                timestamp=item.timestamp,
+                byte_size=item.byte_size,
+                pages=item.pages,
+                computer_id=computers.get(item.computer_name) if item.computer_name else None,
+                port_id=ports.get(item.port_name) if item.port_name else None,
+            )
+        )
+    return rows
+
+
+def _insert_print_events_orm(rows: Sequence[PrintEvent], errors: list[str]) -> list[PrintEvent]:
+    """Вставляет события пачками; при ошибке пачки повторяет её по одному событию."""
+    inserted: list[PrintEvent] = []
+    for chunk in chunked(rows, PRINT_EVENTS_BATCH_SIZE):
+        try:
+            with transaction.atomic():
+                PrintEvent.objects.bulk_create(chunk)
+            inserted.extend(chunk)
+            continue
+        except DatabaseError:
+            logger.warning("Пакетная вставка событий не удалась, повтор по одному событию", exc_info=True)
+        for row in chunk:
+            row.pk = None
             try:
                 with transaction.atomic():
-                    username = (event.get("Param3") or "").strip().lower()
-                    if not username:
-                        errors.append("Missing username (Param3)")
-                        continue
-                    document_name = event.get("Param2", "")
-                    document_id = int(event.get("Param1") or 0)
-                    byte_size = int(event.get("Param7") or 0)
-                    pages = int(event.get("Param8") or 0)
-                    timestamp_ms = int(str(event.get("TimeCreated", "0")).replace("/Date(", "").replace(")/", ""))
-                    ts = timezone.datetime.fromtimestamp(timestamp_ms / 1000)
-                    if timezone.is_naive(ts):
-                        ts = timezone.make_aware(ts, timezone.get_default_timezone())
-                    raw_job_id = (event.get("JobID") or "").strip()
-                    if raw_job_id:
-                        job_id = raw_job_id[:64]
-                    else:
-                        surrogate_payload = "|".join(
-                            [
-                                username,
-                                str(document_id),
-                                str(event.get("Param2") or ""),
-                                str(event.get("Param4") or ""),
-                                str(event.get("Param5") or ""),
-                                str(event.get("Param6") or ""),
-                                str(timestamp_ms),
-                            ]
-                        )
-                        job_id = f"AUTO-{hashlib.sha256(surrogate_payload.encode('utf-8')).hexdigest()[:59]}"
-
-                    # Проверка на дубликаты через предзагруженный set
-                    if job_id in existing_job_ids:
-                        continue
-                    existing_job_ids.add(job_id)  # Добавляем в set для проверки в рамках батча
-
-                    printer_name_raw = (event.get("Param5") or "").strip().lower()
-                    parts = printer_name_raw.split("-")
-                    if len(parts) != 5:
-                        errors.append(f"Invalid printer format: {printer_name_raw}")
-                        continue
-                    model_code, bld_code, dept_code, room_number, printer_index_str = parts
-                    try:
-                        printer_index = int(printer_index_str)
-                    except ValueError:
-                        errors.append(f"Invalid printer index: {printer_index_str}")
-                        continue
-
-                    building = _get_or_create_ci_building(bld_code)
-                    department = _get_or_create_ci_department(dept_code)
-                    printer_model = _get_or_create_ci_printer_model(model_code)
-                    printer = _get_or_create_ci_printer(
-                        building=building,
-                        room_number=room_number,
-                        printer_index=printer_index,
-                        printer_model=printer_model,
-                        department=department,
-                        full_name=printer_name_raw,
-                    )
-
-                    # Получаем или создаем пользователя автоматически для избежания потери данных
-                    user = User.objects.filter(username__iexact=username).first()
-                    if not user:
-                        logger.warning(f"User '{username}' not found during import, creating automatically")
-                        # Создаем пользователя с минимальными данными
-                        user = User.objects.create(
-                            username=username,
-                            fio=username,  # Временное значение, можно обновить позже
-                            is_active=True,
-                        )
-                        errors.append(f"User '{username}' was automatically created (missing FIO and department)")
-
-                    computer: Computer | None = None
-                    computer_name = (event.get("Param4") or "").strip().lower()
-                    if computer_name:
-                        computer = Computer.objects.filter(name__iexact=computer_name).first()
-                        if not computer:
-                            computer = Computer.objects.create(name=computer_name)
-
-                    port: Port | None = None
-                    port_name = (event.get("Param6") or "").strip().lower()
-                    if port_name:
-                        port = Port.objects.filter(name__iexact=port_name).first()
-                        if not port:
-                            port = Port.objects.create(name=port_name)
-
-                    PrintEvent.objects.create(
-                        document_id=document_id,
-                        document_name=document_name,
-                        user=user,
-                        printer=printer,
-                        job_id=job_id,
-                        timestamp=ts,
-                        byte_size=byte_size,
-                        pages=pages,
-                        computer=computer,
-                        port=port,
-                    )
-                batch_created += 1
-            except (ValueError, TypeError, KeyError) as e:
-                # Обрабатываем ожидаемые ошибки валидации отдельно
-                msg = f"Event validation error: {e}"
-                logger.warning(msg, exc_info=True)
-                errors.append(msg)
-            except IntegrityError as e:
-                msg = f"Event integrity error: {e}"
-                logger.warning(msg, exc_info=True)
-                errors.append(msg)
+                    PrintEvent.objects.bulk_create([row])
+                inserted.append(row)
             except Exception as e:  # noqa: BLE001
-                # Неожиданные ошибки логируются с полным traceback
-                msg = f"Event import error: {e}"
-                logger.error(msg, exc_info=True)
-                errors.append(msg)
-        created += batch_created
-
-    return {"created": created, "errors": errors}
+                _record_event_error(errors, e)
+    return inserted
+
+
+def _insert_print_events(rows: list[PrintEvent], errors: list[str]) -> tuple[list[PrintEvent], int]:
+    """
+    Вставляет события: через COPY на PostgreSQL (если включено), иначе через bulk_create.
+
+    Returns:
+        tuple: (вставленные строки, число строк, пропущенных БД как дубликаты)
+    """
+    if copy_loader_available():
+        try:
+            inserted = copy_print_events(rows)
+            return inserted, len(rows) - len(inserted)
+        except DatabaseError:
+            logger.warning("COPY-загрузка событий не удалась, повтор через ORM", exc_info=True)
+    return _insert_print_events_orm(rows, errors), 0
+
+
+def _import_print_events_chunk(
+    events: list[dict[str, Any]], errors: list[str], resolver: DimensionResolver, stats: IngestStats
+) -> tuple[list[PrintEvent], int]:
+    parsed: list[_ParsedPrintEvent] = []
+    with stats.stage("parse"):
+        for event in events:
+            try:
+                parsed.append(_parse_print_event(event))
+            except Exception as e:  # noqa: BLE001 - ошибка одного события не прерывает пакет
+                _record_event_error(errors, e)
+
+    with stats.stage("dedup"):
+        selected, duplicates = _select_new_events(parsed, errors)
+    if not selected:
+        return [], duplicates
+    with stats.stage("resolve"):
+        rows = _resolve_print_events(selected, errors, resolver)
+    with stats.stage("insert"):
+        inserted, conflicts = _insert_print_events(rows, errors)
+    return inserted, duplicates + conflicts
+
+
+def import_print_events(
+    events: Iterable[dict[str, Any]], *, resolver: DimensionResolver | None = None
+) -> dict[str, Any]:
+    """
+    Импортирует события печати пакетно (set-based).
+
+    События читаются из итератора частями по ``PRINT_EVENTS_CHUNK_SIZE``, поэтому потоковый
+    источник (см. ``printing.parsers.iter_json_array``) не материализуется целиком. Каждая
+    часть сначала разбирается, затем справочники (здания, отделы, модели, принтеры,
+    пользователи, компьютеры, порты) разрешаются через ``DimensionResolver`` несколькими
+    массовыми запросами (уже известные ключи берутся из его кэша), недостающие создаются
+    через ``bulk_create(ignore_conflicts=True)``, а события
+    вставляются через COPY на PostgreSQL (``PRINT_EVENTS_COPY_LOADER``, см. ``printing.loaders``)
+    либо ``bulk_create`` пачками по ``PRINT_EVENTS_BATCH_SIZE``. Дубликаты ``job_id`` (уже в БД
+    или повторяющиеся в части) пропускаются и учитываются в ``duplicates``. После импорта
+    пересчитываются суточные итоги затронутых дней (``printing.rollups``) и один раз
+    отправляется сигнал ``print_events_imported`` (по нему сбрасывается кэш статистики
+    только за затронутые месяцы и отделы).
+
+    Время и число SQL-запросов каждого этапа (``printing.instrumentation.INGEST_STAGES``) и
+    пропускная способность возвращаются в ``metrics`` и пишутся в лог одной строкой ``key=value``.
+
+    Args:
+        events: Итерируемое событий в формате выгрузки Windows Event Log (Param1..Param8)
+        resolver: Резолвер справочников; по умолчанию новый на время вызова. Watcher может
+            передать ``get_shared_resolver()``, чтобы кэш сохранялся между файлами.
+
+    Returns:
+        dict: ``{"created": int, "duplicates": int, "errors": list[str], "metrics": dict}``
+
+    Example:
+        >>> result = import_print_events([{"JobID": "1", "Param3": "ivanov", "Param5": "hp-1-it-101-1", ...}])
+        >>> result["created"], result["metrics"]["stages"]["insert"]
+        (1, {'seconds': 0.0021, 'queries': 1})
+    """
+    if resolver is None:
+        resolver = DimensionResolver()
+    else:
+        resolver.refresh()
+    errors: list[str] = []
+    created = 0
+    duplicates = 0
+    rollup_keys: set[RollupKey] = set()
+    stats = IngestStats()
+    iterator = iter(events)
+    with stats.track_queries():
+        while True:
+            # Чтение из потокового источника (разбор JSON-файла) — отдельный этап
+            with stats.stage("read"):
+                chunk = list(islice(iterator, PRINT_EVENTS_CHUNK_SIZE))
+            if not chunk:
+                break
+            stats.rows += len(chunk)
+            inserted, skipped = _import_print_events_chunk(chunk, errors, resolver, stats)
+            created += len(inserted)
+            duplicates += skipped
+            rollup_keys.update(rollup_key(row) for row in inserted)
+        if rollup_keys:
+            with stats.stage("rollups"):
+                try:
+                    refresh_daily_rollups(rollup_keys)
+                except Exception as e:  # noqa: BLE001 - события уже сохранены, итоги восстановит rebuild_print_rollups
+                    msg = f"Rollup refresh error: {e}"
+                    logger.error(msg, exc_info=True)
+                    errors.append(msg)
+            with stats.stage("signals"):
+                user_ids = {user_id for _day, user_id, _printer_id in rollup_keys}
+                department_ids: set[int | None] = set()
+                for user_chunk in chunked(sorted(user_ids), LOOKUP_CHUNK_SIZE):
+                    department_ids.update(
+                        User.objects.filter(pk__in=user_chunk).values_list("department_id", flat=True)
+                    )
+                print_events_imported.send(
+                    sender=PrintEvent,
+                    dates={day for day, _user_id, _printer_id in rollup_keys},
+                    department_ids=department_ids,
+                    keys=rollup_keys,
+                )
+    metrics = stats.as_dict()
+    INGEST_EVENTS.inc(created, result="created")
+    INGEST_EVENTS.inc(duplicates, result="duplicate")
+    # Отклонённые строки: не создано и не дубликат (ошибки разбора, неизвестный принтер и т.п.)
+    INGEST_EVENTS.inc(max(stats.rows - created - duplicates, 0), result="error")
+    for name, stage in metrics["stages"].items():
+        INGEST_STAGE_SECONDS.inc(stage["seconds"], stage=name)
+    logger.info(
+        f"Импорт событий: created={created} duplicates={duplicates} errors={len(errors)} "
+        f"{format_ingest_metrics(metrics)}",
+        extra={"ingest_metrics": metrics},
+    )
+    return {"created": created, "duplicates": duplicates, "errors": errors, "metrics": metrics}
 
 
 # -------------------- Query/Stats services --------------------
 
 
 def get_dashboard_stats(days: int = 30) -> dict[str, Any]:
-    from .models import PrintEvent  # local import to avoid cycles at load time
-
-    since = timezone.now() - timezone.timedelta(days=days)
-    qs = PrintEvent.objects.select_related("user", "printer").filter(timestamp__gte=since)
-    total_pages = qs.aggregate(Sum("pages"))["pages__sum"] or 0
-    total_documents = qs.count()
-    daily_stats = (
-        qs.annotate(date=TruncDate("timestamp"))
-        .values("date")
-        .annotate(pages=Sum("pages"), documents=Count("id"))
-        .order_by("date")
+    from .models import PrintDailyRollup  # local import to avoid cycles at load time
+
+    # Итоги хранятся по суткам: период — с даты «days дней назад» включительно
+    since = local_date(timezone.now() - timezone.timedelta(days=days))
+    today = timezone.localdate()
+
+    def compute() -> dict[str, Any]:
+        qs = PrintDailyRollup.objects.filter(date__gte=since)
+        totals = qs.aggregate(pages=Sum("pages"), documents=Sum("documents"))
+        daily_stats = qs.values("date").annotate(pages=Sum("pages"), documents=Sum("documents")).order_by("date")
+        return {
+            "total_pages": totals["pages"] or 0,
+            "total_documents": totals["documents"] or 0,
+            "daily_stats": list(daily_stats),
+        }
+
+    return get_or_compute(
+        f"dashboard_stats_{get_stats_cache_token(since, today)}_{since}_{today}",
+        compute,
+        300,
+        stale_key=f"dashboard_stats_{days}",
+        metric="dashboard_stats",
     )
-    return {
-        "total_pages": total_pages,
-        "total_documents": total_documents,
-        "daily_stats": daily_stats,
-    }
 
 
 def get_statistics_data(start_date: Any | None, end_date: Any | None) -> dict[str, Any]:
     from accounts.models import User  # local import
 
-    from .models import Department, PrintEvent  # local import
+    from .models import Department  # local import
 
     # ОБЯЗАТЕЛЬНАЯ фильтрация по датам для производительности
     # Если даты не указаны, используем текущий месяц по умолчанию
@@ -336,112 +734,122 @@ def get_statistics_data(start_date: Any | None, end_date: Any | None) -> dict[st
     if end_date is None:
         end_date = now
 
-    # Departments (cached aggregate)
-    # Фильтруем только отделы с ненулевыми значениями
-    # Кэш учитывает период дат
-    cache_version = _get_stats_cache_version()
+    # Departments и top users кэшируются с защитой от одновременного пересчёта (get_or_compute):
+    # после импорта, пока один запрос пересчитывает период, остальные получают прежние значения
+    start_day, end_day = local_date(start_date), local_date(end_date)
+    cache_token = get_stats_cache_token(start_day, end_day)
     date_suffix = f"_{start_date.date()}_{end_date.date()}"
-    department_cache_key = f"department_stats_top_v{cache_version}{date_suffix}"
-    department_stats = cache.get(department_cache_key)
-    if department_stats is None:
-        # Фильтруем события по датам через related events
-        # Используем фильтрацию в annotate для правильного подсчета
-        department_stats = (
-            Department.objects.annotate(
-                total_pages=Sum(
-                    "users__print_events__pages",
-                    filter=Q(
-                        users__print_events__timestamp__gte=start_date, users__print_events__timestamp__lte=end_date
-                    ),
-                ),
-                total_documents=Count(
-                    "users__print_events",
-                    filter=Q(
-                        users__print_events__timestamp__gte=start_date, users__print_events__timestamp__lte=end_date
-                    ),
-                    distinct=True,
-                ),
-                total_size=Sum(
-                    "users__print_events__byte_size",
-                    filter=Q(
-                        users__print_events__timestamp__gte=start_date, users__print_events__timestamp__lte=end_date
-                    ),
-                ),
+    cache_timeout = _stats_cache_timeout(end_day)
+
+    def compute_department_stats() -> list[Department]:
+        # Суточные итоги (PrintDailyRollup): фильтр до annotate ограничивает суммы периодом.
+        # Только отделы с ненулевыми значениями
+        return list(
+            Department.objects.filter(print_rollups__date__gte=start_day, print_rollups__date__lte=end_day)
+            .annotate(
+                total_pages=Sum("print_rollups__pages"),
+                total_documents=Sum("print_rollups__documents"),
+                total_size=Sum("print_rollups__byte_size"),
             )
             .filter(total_pages__gt=0)
             .order_by("-total_pages")
-            .all()
         )
-        cache_timeout = 300  # 5 минут по умолчанию
-        if end_date.date() < timezone.now().date():
-            cache_timeout = 3600 * 24  # 24 часа для прошлых периодов
-        cache.set(department_cache_key, department_stats, cache_timeout)
-
-    # Top users
-    # Фильтруем только пользователей с ненулевыми значениями
-    # Кэш учитывает период дат
-    date_suffix = f"_{start_date.date()}_{end_date.date()}"
-    user_cache_key = f"user_stats_top10_v{cache_version}{date_suffix}"
-    user_stats = cache.get(user_cache_key)
-    if user_stats is None:
-        user_stats = (
+
+    def compute_user_stats() -> list[User]:
+        return list(
             User.objects.select_related("department")
+            .filter(print_rollups__date__gte=start_day, print_rollups__date__lte=end_day)
             .annotate(
-                total_pages=Sum(
-                    "print_events__pages",
-                    filter=Q(print_events__timestamp__gte=start_date, print_events__timestamp__lte=end_date),
-                ),
-                total_documents=Count(
-                    "print_events",
-                    filter=Q(print_events__timestamp__gte=start_date, print_events__timestamp__lte=end_date),
-                    distinct=True,
-                ),
-                total_size=Sum(
-                    "print_events__byte_size",
-                    filter=Q(print_events__timestamp__gte=start_date, print_events__timestamp__lte=end_date),
-                ),
+                total_pages=Sum("print_rollups__pages"),
+                total_documents=Sum("print_rollups__documents"),
+                total_size=Sum("print_rollups__byte_size"),
             )
             .filter(total_pages__gt=0)
             .order_by("-total_pages")[:10]
         )
-        cache_timeout = 300  # 5 минут по умолчанию
-        if end_date.date() < timezone.now().date():
-            cache_timeout = 3600 * 24  # 24 часа для прошлых периодов
-        cache.set(user_cache_key, list(user_stats), cache_timeout)
-
-    # Print tree
-    query = PrintEvent.objects.select_related(
-        "printer__department",
-        "printer__model",
-        "user",
-    )
 
-    # ОБЯЗАТЕЛЬНАЯ фильтрация по датам для производительности
-    # Если даты не указаны, используем текущий месяц по умолчанию
-    now = timezone.now()
-    if start_date is None:
-        start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    if end_date is None:
-        end_date = now
-
-    query = query.filter(timestamp__gte=start_date, timestamp__lte=end_date)
-
-    results = (
-        query.values(
-            "printer__department__code",
-            "printer__department__name",
-            "printer__model__code",
-            "printer__room_number",
-            "printer__printer_index",
-            "user__fio",
-            "document_name",
-        )
-        .annotate(page_sum=Sum("pages"), last_time=Max("timestamp"))
-        .order_by("-page_sum")
+    department_stats = get_or_compute(
+        f"department_stats_top_{cache_token}{date_suffix}",
+        compute_department_stats,
+        cache_timeout,
+        stale_key=f"department_stats_top{date_suffix}",
+        metric="department_stats",
+    )
+    user_stats = get_or_compute(
+        f"user_stats_top10_{cache_token}{date_suffix}",
+        compute_user_stats,
+        cache_timeout,
+        stale_key=f"user_stats_top10{date_suffix}",
+        metric="user_stats",
     )
 
+    # Дерево печати строится отдельно и ограничено top-K на уровень: get_print_tree
     return {
         "department_stats": department_stats,
         "user_stats": user_stats,
-        "tree_results": results,
     }
+
+
+def _stats_cache_timeout(end_day: date) -> int:
+    # Прошедшие периоды уже не меняются (кроме дозагрузки, которая сбрасывает версию) — кэшируем дольше
+    return 3600 * 24 if end_day < timezone.localdate() else 300
+
+
+def period_bounds(start_day: date, end_day: date) -> tuple[datetime, datetime]:
+    """Границы периода в текущем часовом поясе: [start_day 00:00:00, end_day 23:59:59] (как в views)."""
+    start = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(end_day, datetime.max.time().replace(microsecond=0)))
+    return start, end
+
+
+def get_print_tree_top_k() -> int:
+    """Сколько крупнейших детей показывать у узла дерева печати (PRINT_TREE_TOP_K); 0 — всех."""
+    return max(0, int(getattr(settings, "PRINT_TREE_TOP_K", 0)))
+
+
+def build_print_tree(start_dt: datetime, end_dt: datetime, top_k: int | None = None) -> dict[str, Any]:
+    """
+    Строит дерево отдел → принтер → пользователь → документ с суммами и процентами (итоги считает БД).
+
+    Args:
+        start_dt: Начало периода
+        end_dt: Конец периода
+        top_k: Крупнейших детей на узел, остальные — в «прочие»; None — настройка PRINT_TREE_TOP_K
+    """
+    if top_k is None:
+        top_k = get_print_tree_top_k()
+    return assemble_print_tree(fetch_tree_rows(start_dt, end_dt, top_k))
+
+
+def get_print_tree(start_dt: datetime, end_dt: datetime) -> dict[str, Any]:
+    """Дерево печати за период (``build_print_tree``) из кэша; пересчёт — один на ключ (``get_or_compute``)."""
+    top_k = get_print_tree_top_k()
+    period = f"{local_date(start_dt):%Y-%m-%d}_{local_date(end_dt):%Y-%m-%d}_top{top_k}"
+    return get_or_compute(
+        f"print_tree_{get_stats_cache_token(start_dt, end_dt)}_{period}",
+        lambda: build_print_tree(start_dt, end_dt, top_k),
+        _stats_cache_timeout(local_date(end_dt)),
+        stale_key=f"print_tree_{period}",
+        metric="print_tree",
+    )
+
+
+def get_print_tree_node(
+    start_dt: datetime,
+    end_dt: datetime,
+    *,
+    department: int | None = None,
+    printer: int | None = None,
+    user: int | None = None,
+    limit: int = NODE_LIMIT,
+) -> dict[str, Any]:
+    """Дочерние узлы дерева печати (``tree_node_children``) из кэша — свой ключ на каждый узел."""
+    period = f"{local_date(start_dt):%Y-%m-%d}_{local_date(end_dt):%Y-%m-%d}"
+    node = f"{department}_{printer}_{user}_{limit}"
+    return get_or_compute(
+        f"print_tree_node_{get_stats_cache_token(start_dt, end_dt)}_{period}_{node}",
+        lambda: tree_node_children(start_dt, end_dt, department=department, printer=printer, user=user, limit=limit),
+        _stats_cache_timeout(local_date(end_dt)),
+        stale_key=f"print_tree_node_{period}_{node}",
+        metric="print_tree_node",
+    )
@@ -1,17 +1,49 @@
+from datetime import date
 from typing import Any
 
-from django.core.cache import cache
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import PrintEvent
-from .services import STATS_CACHE_VERSION_KEY
+from accounts.models import User
+
+from .models import Building, Computer, Department, Port, Printer, PrinterModel, PrintEvent
+from .resolvers import invalidate_dimension_cache
+from .rollups import local_date, refresh_daily_rollups, rollup_key, sync_rollup_departments
+from .services import invalidate_statistics_cache, print_events_imported
+from .warming import schedule_statistics_warming
+
+# Поля, по которым DimensionResolver ищет записи справочников
+DIMENSION_KEY_FIELDS: dict[type, frozenset[str]] = {
+    Building: frozenset({"code"}),
+    Department: frozenset({"code"}),
+    PrinterModel: frozenset({"code"}),
+    Printer: frozenset({"building", "room_number", "printer_index"}),
+    Computer: frozenset({"name"}),
+    Port: frozenset({"name"}),
+    User: frozenset({"username"}),
+}
+
+
+@receiver(pre_save, sender=PrintEvent)  # type: ignore[misc]
+def remember_rollup_key(sender: type[PrintEvent], instance: PrintEvent, **kwargs: Any) -> None:
+    """Запоминает ключ итогов редактируемого события до сохранения (день, пользователь, принтер)."""
+    instance._rollup_key_before = None
+    if instance.pk is None:
+        return
+    before = PrintEvent.objects.filter(pk=instance.pk).values_list("timestamp", "user_id", "printer_id").first()
+    if before is not None:
+        timestamp, user_id, printer_id = before
+        instance._rollup_key_before = (local_date(timestamp), user_id, printer_id)
 
 
 @receiver(post_save, sender=PrintEvent)  # type: ignore[misc]
 def update_statistics(sender: type[PrintEvent], instance: PrintEvent, created: bool, **kwargs: Any) -> None:
     """
-    Обновляет статистику после создания события печати.
+    Обновляет статистику после создания или изменения события печати.
+
+    При изменении (админка, import-export) пересчитываются итоги и прежнего ключа события:
+    страницы, время, пользователь или принтер могли измениться.
 
     Args:
         sender (Model): Модель, отправившая сигнал
@@ -23,15 +55,60 @@ def update_statistics(sender: type[PrintEvent], instance: PrintEvent, created: b
         >>> event = PrintEvent.objects.create(...)
         # Сигнал автоматически вызовется после сохранения
     """
+    # Пересчитываем суточные итоги и очищаем кэш статистики за месяц события
+    # (пакетный импорт делает то же самое один раз на импорт, см. invalidate_imported_statistics)
+    keys = {rollup_key(instance)}
+    before = getattr(instance, "_rollup_key_before", None)
+    if not created and before is not None:
+        keys.add(before)
+    refresh_daily_rollups(keys)
+    department_ids = set(
+        User.objects.filter(pk__in={user_id for _day, user_id, _printer_id in keys}).values_list(
+            "department_id", flat=True
+        )
+    )
+    invalidate_statistics_cache(department_ids, dates={day for day, _user_id, _printer_id in keys})
+
+
+@receiver(print_events_imported)  # type: ignore[misc]
+def invalidate_imported_statistics(
+    sender: type[PrintEvent], dates: set[date], department_ids: set[int | None], **kwargs: Any
+) -> None:
+    """
+    Сбрасывает кэш статистики один раз на импорт — только за затронутые месяцы и отделы —
+    и после фиксации транзакции планирует его прогрев.
+    """
+    invalidate_statistics_cache(department_ids, dates=dates)
+    transaction.on_commit(lambda: schedule_statistics_warming(dates))
+
+
+@receiver(post_save, sender=User)  # type: ignore[misc]
+def move_rollups_to_user_department(sender: type[User], instance: User, created: bool, **kwargs: Any) -> None:
+    """Переносит суточные итоги пользователя в его новый отдел (статистика по отделам)."""
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields is not None and "department" not in update_fields):
+        return
+    if sync_rollup_departments(instance.pk, instance.department_id):
+        invalidate_statistics_cache()
+
+
+def invalidate_dimension_resolvers(sender: type, created: bool = False, **kwargs: Any) -> None:
+    """
+    Сбрасывает кэши DimensionResolver при изменении или удалении записей справочников.
+
+    Новые записи кэш не портят (промах просто уйдёт в БД), а сохранения, не затрагивающие
+    ключевые поля (например, ``last_login`` при входе пользователя), игнорируются.
+    """
     if created:
-        # Очищаем кэш статистики
-        if instance.user.department_id is not None:
-            cache.delete(f"print_stats_{instance.user.department_id}")
-        cache.delete("total_print_stats")
-        cache.delete("department_stats_top")
-        cache.delete("user_stats_top10")
-        # Глобальная инвалидация всех date-specific ключей статистики.
-        try:
-            cache.incr(STATS_CACHE_VERSION_KEY)
-        except ValueError:
-            cache.set(STATS_CACHE_VERSION_KEY, 1, None)
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not DIMENSION_KEY_FIELDS[sender] & set(update_fields):
+        return
+    invalidate_dimension_cache()
+
+
+for _model in DIMENSION_KEY_FIELDS:
+    post_save.connect(invalidate_dimension_resolvers, sender=_model, dispatch_uid=f"resolver_save_{_model.__name__}")
+    post_delete.connect(
+        invalidate_dimension_resolvers, sender=_model, dispatch_uid=f"resolver_delete_{_model.__name__}"
+    )
@@ -0,0 +1,379 @@
+"""
+Синтетический набор данных печати для нагрузочного тестирования.
+
+Справочники (отделы, здания, модели, принтеры, пользователи, компьютеры, порты) и события
+генерируются детерминированно по ``seed`` с правдоподобными распределениями: активность
+пользователей и принтеров убывает по Ципфу, пользователь обычно печатает на принтерах своего
+отдела, печать приходится на рабочие часы будних дней, у имён документов длинный хвост,
+число страниц распределено логнормально. События пишутся пачками через COPY на PostgreSQL
+(``loaders.copy_print_events``) или ``bulk_create`` на остальных СУБД.
+
+Те же данные выгружаются в файлы для сквозных тестов загрузки: JSON-массивы событий в формате
+print-сервера (их подхватывает watcher) и CSV пользователей AD.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import random
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from typing import IO, TYPE_CHECKING, Any, NamedTuple
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import User
+
+from .loaders import copy_print_events
+from .models import Building, Computer, Department, Port, Printer, PrinterModel, PrintEvent
+from .resolvers import LOOKUP_CHUNK_SIZE, chunked
+from .rollups import rebuild_daily_rollups
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from pathlib import Path
+
+DEFAULT_PREFIX = "syn"
+BATCH_SIZE = 10_000
+LOCAL_PRINTER_SHARE = 0.9  # доля заданий на принтеры своего отдела
+WEEKEND_WEIGHT = 0.08  # активность выходного дня относительно будня
+# Относительная активность по часам суток (местное время)
+HOUR_WEIGHTS = (0, 0, 0, 0, 0, 0, 0.2, 1, 4, 9, 10, 9, 6, 8, 10, 9, 7, 4, 1.5, 0.7, 0.3, 0.1, 0, 0)
+MANUFACTURERS = (("HP", "LaserJet"), ("Kyocera", "ECOSYS"), ("Canon", "imageRUNNER"), ("Xerox", "VersaLink"))
+DOCUMENT_KINDS = (
+    ("Договор", "docx"),
+    ("Счёт", "pdf"),
+    ("Отчёт", "xlsx"),
+    ("Служебная записка", "docx"),
+    ("Презентация", "pptx"),
+    ("Скан", "pdf"),
+    ("Письмо", "docx"),
+)
+LAST_NAMES = (
+    "Иванов",
+    "Смирнов",
+    "Кузнецов",
+    "Попов",
+    "Васильев",
+    "Петров",
+    "Соколов",
+    "Михайлов",
+    "Новиков",
+    "Волков",
+)
+INITIALS = "АБВГДЕИКЛМНОПРСТ"
+
+
+class SyntheticDataError(ValueError):
+    """Некорректные параметры генерации или пересечение с уже созданными данными."""
+
+
+def _zipf(count: int) -> list[float]:
+    """Накопленные веса Ципфа для ``random.choices``: первые элементы активнее остальных."""
+    return list(accumulate(1 / (n + 1) for n in range(count)))
+
+
+@dataclass
+class SyntheticDimensions:
+    prefix: str
+    departments: list[Department]
+    buildings: list[Building]
+    printer_models: list[PrinterModel]
+    printers: list[Printer]
+    users: list[User]
+    computers: list[Computer]  # компьютер пользователя с тем же индексом
+    ports: list[Port]  # порт принтера с тем же индексом
+    user_weights: list[float] = field(init=False)
+    printer_weights: list[float] = field(init=False)
+    printers_by_department: dict[str, tuple[list[int], list[float]]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.user_weights = _zipf(len(self.users))
+        self.printer_weights = _zipf(len(self.printers))
+        by_department: dict[str, list[int]] = {}
+        for index, printer in enumerate(self.printers):
+            by_department.setdefault(printer.department.code, []).append(index)
+        self.printers_by_department = {code: (indexes, _zipf(len(indexes))) for code, indexes in by_department.items()}
+
+
+def generate_dimensions(
+    *,
+    departments: int = 20,
+    buildings: int = 5,
+    printers: int = 100,
+    users: int = 1000,
+    seed: int = 0,
+    prefix: str = DEFAULT_PREFIX,
+    save: bool = True,
+) -> SyntheticDimensions:
+    """
+    Создаёт справочники синтетического набора.
+
+    Коды и имена начинаются с ``prefix`` и совпадают с тем, что импорт получает при разборе
+    имени принтера ``model-bld-dept-room-idx``. С ``save=False`` объекты не сохраняются —
+    этого достаточно для выгрузки файлов, которые затем загружает обычный импорт.
+
+    Raises:
+        SyntheticDataError: Некорректные параметры или справочники с таким префиксом уже есть
+    """
+    if not prefix.isalnum() or not prefix.isascii() or len(prefix) > 6:
+        raise SyntheticDataError("Префикс — до 6 латинских букв и цифр")
+    if min(departments, buildings, printers, users) < 1:
+        raise SyntheticDataError("Нужно хотя бы по одному отделу, зданию, принтеру и пользователю")
+    prefix = prefix.lower()
+    if save and Department.objects.filter(code__istartswith=prefix).exists():
+        raise SyntheticDataError(f"Справочники с префиксом {prefix!r} уже созданы — укажите другой префикс")
+
+    rng = random.Random(seed)
+    department_objs = [
+        Department(code=f"{prefix.upper()}{n:03d}", name=f"Синтетический отдел {n}") for n in range(1, departments + 1)
+    ]
+    building_objs = [Building(code=f"{prefix}{n:02d}", name=f"Корпус {n}") for n in range(1, buildings + 1)]
+    model_objs = [
+        PrinterModel(
+            code=f"{prefix}m{n:02d}",
+            manufacturer=manufacturer,
+            model=f"{series} {n:02d}",
+            is_color=n % 3 == 0,
+            is_duplex=n % 2 == 0,
+        )
+        for n, (manufacturer, series) in enumerate(MANUFACTURERS * 2, start=1)
+    ]
+    printer_objs = []
+    for n in range(printers):
+        model, building = rng.choice(model_objs), rng.choice(building_objs)
+        department = department_objs[n % departments] if n < departments else rng.choice(department_objs)
+        # (room, idx) уникальны во всём наборе, поэтому уникальны и в пределах здания
+        room, index = str(101 + n // 3), n % 3 + 1
+        printer_objs.append(
+            Printer(
+                name=f"{model.code}-{building.code}-{department.code}-{room}-{index}".lower(),
+                model=model,
+                building=building,
+                department=department,
+                room_number=room,
+                printer_index=index,
+                is_active=True,
+            )
+        )
+    password = make_password(None)
+    user_objs = [
+        User(
+            username=f"{prefix}.user{n:05d}",
+            fio=f"{rng.choice(LAST_NAMES)} {rng.choice(INITIALS)}. {rng.choice(INITIALS)}.",
+            department=rng.choice(department_objs),
+            password=password,
+            is_active=True,
+        )
+        for n in range(users)
+    ]
+    computer_objs = [Computer(name=f"{prefix}-pc{n:05d}") for n in range(users)]
+    port_objs = [Port(name=f"ip_10.{n // 250 % 256}.{n % 250 + 1}.10") for n in range(printers)]
+
+    if save:
+        for objs in (department_objs, building_objs, model_objs, printer_objs, user_objs, computer_objs, port_objs):
+            type(objs[0]).objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    return SyntheticDimensions(
+        prefix, department_objs, building_objs, model_objs, printer_objs, user_objs, computer_objs, port_objs
+    )
+
+
+class SyntheticEvent(NamedTuple):
+    number: int  # порядковый номер события (от start_index)
+    user: int  # индекс в SyntheticDimensions.users (и computers)
+    printer: int  # индекс в SyntheticDimensions.printers (и ports)
+    timestamp: datetime
+    document_name: str
+    pages: int
+    byte_size: int
+
+
+def iter_synthetic_events(
+    dims: SyntheticDimensions,
+    count: int,
+    *,
+    start_index: int = 0,
+    end: datetime | None = None,
+    days: int = 90,
+    seed: int = 0,
+) -> Iterator[SyntheticEvent]:
+    """
+    События за ``days`` дней до ``end`` (по умолчанию — сейчас).
+
+    ``number`` продолжает ``start_index``: из него строятся ``job_id`` и ``document_id``, так что
+    повторный запуск с тем же ``start_index`` даёт те же задания, а со сдвигом — новые.
+    """
+    if days < 1:
+        raise SyntheticDataError("Период генерации — хотя бы один день")
+    rng = random.Random(seed * 1_000_003 + start_index)
+    end = end or timezone.now()
+    last_day = timezone.localtime(end).date()
+    day_list = [last_day - timedelta(days=offset) for offset in range(days)]
+    midnights = [timezone.make_aware(datetime.combine(day, time.min)) for day in day_list]
+    day_weights = list(accumulate(WEEKEND_WEIGHT if day.weekday() >= 5 else 1.0 for day in day_list))
+    hour_weights = list(accumulate(HOUR_WEIGHTS))
+    user_departments = [user.department.code for user in dims.users]
+
+    for number in range(start_index, start_index + count):
+        user = bisect_left(dims.user_weights, rng.random() * dims.user_weights[-1])
+        local = dims.printers_by_department.get(user_departments[user])
+        if local and rng.random() < LOCAL_PRINTER_SHARE:
+            indexes, weights = local
+            printer = indexes[bisect_left(weights, rng.random() * weights[-1])]
+        else:
+            printer = bisect_left(dims.printer_weights, rng.random() * dims.printer_weights[-1])
+        day = bisect_left(day_weights, rng.random() * day_weights[-1])
+        hour = bisect_left(hour_weights, rng.random() * hour_weights[-1])
+        timestamp = min(midnights[day] + timedelta(seconds=hour * 3600 + rng.randrange(3600)), end)
+        kind, extension = DOCUMENT_KINDS[int(rng.paretovariate(1.0)) % len(DOCUMENT_KINDS)]
+        pages = min(max(int(rng.lognormvariate(0.8, 1.0)), 1), 500)
+        yield SyntheticEvent(
+            number=number,
+            user=user,
+            printer=printer,
+            timestamp=timestamp,
+            document_name=f"{kind} №{int(rng.paretovariate(0.8)) % 10_000}.{extension}",
+            pages=pages,
+            byte_size=pages * rng.randrange(20_000, 150_000),
+        )
+
+
+def _job_id(dims: SyntheticDimensions, event: SyntheticEvent) -> str:
+    return f"{dims.prefix}-{event.number:012d}"
+
+
+def load_print_events(
+    dims: SyntheticDimensions,
+    count: int,
+    *,
+    start_index: int = 0,
+    end: datetime | None = None,
+    days: int = 90,
+    seed: int = 0,
+    batch_size: int = BATCH_SIZE,
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Записывает ``count`` событий в БД пачками по ``batch_size`` и перестраивает суточные итоги.
+
+    На PostgreSQL пачки идут через COPY, на остальных СУБД — через ``bulk_create``.
+    Задания с уже загруженным ``job_id`` пропускаются.
+
+    Returns:
+        int: Число вставленных событий
+    """
+    use_copy = connection.vendor == "postgresql"
+    created = 0
+    first_day: date | None = None
+    last_day: date | None = None
+    batch: list[PrintEvent] = []
+    now = timezone.now()
+
+    def flush() -> None:
+        nonlocal created
+        if use_copy:
+            created += len(copy_print_events(batch))
+        else:
+            # Уже загруженные задания ищутся по job_id пачки (индекс), а не пересчётом всей таблицы
+            existing: set[str] = set()
+            for job_ids in chunked([event.job_id for event in batch], LOOKUP_CHUNK_SIZE):
+                existing.update(PrintEvent.objects.filter(job_id__in=job_ids).values_list("job_id", flat=True))
+            new = [event for event in batch if event.job_id not in existing]
+            PrintEvent.objects.bulk_create(new, batch_size=batch_size, ignore_conflicts=True)
+            created += len(new)
+        batch.clear()
+        if progress:
+            progress(created)
+
+    for event in iter_synthetic_events(dims, count, start_index=start_index, end=end, days=days, seed=seed):
+        day = timezone.localtime(event.timestamp).date()
+        first_day = min(first_day or day, day)
+        last_day = max(last_day or day, day)
+        batch.append(
+            PrintEvent(
+                document_id=event.number % 2**31,
+                document_name=event.document_name,
+                user_id=dims.users[event.user].pk,
+                printer_id=dims.printers[event.printer].pk,
+                job_id=_job_id(dims, event),
+                timestamp=event.timestamp,
+                byte_size=event.byte_size,
+                pages=event.pages,
+                created_at=now,
+                computer_id=dims.computers[event.user].pk,
+                port_id=dims.ports[event.printer].pk,
+            )
+        )
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if first_day is not None:
+        rebuild_daily_rollups(first_day, last_day)
+    return created
+
+
+def event_payloads(dims: SyntheticDimensions, events: Iterator[SyntheticEvent]) -> Iterator[dict[str, Any]]:
+    """События в формате выгрузки print-сервера для ``import_print_events``."""
+    for event in events:
+        yield {
+            "JobID": _job_id(dims, event),
+            "Param1": event.number % 2**31,
+            "Param2": event.document_name,
+            "Param3": dims.users[event.user].username,
+            "Param4": dims.computers[event.user].name,
+            "Param5": dims.printers[event.printer].name,
+            "Param6": dims.ports[event.printer].name,
+            "Param7": event.byte_size,
+            "Param8": event.pages,
+            "TimeCreated": f"/Date({int(event.timestamp.timestamp() * 1000)})/",
+        }
+
+
+def write_event_files(
+    dims: SyntheticDimensions,
+    directory: Path,
+    count: int,
+    *,
+    per_file: int = 5000,
+    start_index: int = 0,
+    end: datetime | None = None,
+    days: int = 90,
+    seed: int = 0,
+) -> list[Path]:
+    """
+    Выгружает ``count`` событий в JSON-файлы по ``per_file`` штук (имена ``<prefix>_events_NNNNN.json``).
+
+    Файлы пишутся под временным именем и переименовываются, чтобы watcher не взял недописанный файл.
+    """
+    if per_file < 1:
+        raise SyntheticDataError("В файле должно быть хотя бы одно событие")
+    directory.mkdir(parents=True, exist_ok=True)
+    events = iter_synthetic_events(dims, count, start_index=start_index, end=end, days=days, seed=seed)
+    payloads = event_payloads(dims, events)
+    paths = []
+    for number, offset in enumerate(range(0, count, per_file), start=1):
+        path = directory / f"{dims.prefix}_events_{start_index // per_file + number:05d}.json"
+        partial = path.with_suffix(".json.part")
+        with partial.open("w", encoding="utf-8") as f:
+            f.write("[")
+            for n in range(min(per_file, count - offset)):
+                f.write(",\n" if n else "\n")
+                json.dump(next(payloads), f, ensure_ascii=False)
+            f.write("\n]\n")
+        partial.replace(path)
+        paths.append(path)
+    return paths
+
+
+def write_users_csv(dims: SyntheticDimensions, stream: IO[str]) -> None:
+    """Пишет пользователей набора в формате выгрузки AD (SamAccountName, DisplayName, OU)."""
+    writer = csv.writer(stream)
+    writer.writerow(["SamAccountName", "DisplayName", "OU"])
+    for user in dims.users:
+        writer.writerow([user.username, user.fio, user.department.code])
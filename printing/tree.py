@@ -0,0 +1,369 @@
+"""
+Дерево печати «отдел → принтер → пользователь → документ» с итогами на каждом уровне.
+
+Суммы всех уровней считает БД: на PostgreSQL — один запрос ``GROUP BY ROLLUP``, на остальных
+СУБД — по запросу на уровень. Строки приходят отсортированными по уровню и убыванию страниц,
+поэтому Python только раскладывает их по узлам (порядок вставки = порядок сортировки) и считает
+проценты — без повторной сортировки и суммирования отдельных документов.
+
+Длинные хвосты (тысячи одностраничных документов) ограничиваются ``top_k``: на каждом уровне
+БД оконными функциями оставляет K крупнейших детей узла и число всех его детей, а остаток
+показывается одной строкой «прочие».
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from django.db import connection
+from django.db.models import Count, F, Max, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from accounts.models import User
+
+from .models import Department, Printer, PrinterModel, PrintEvent
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import datetime
+
+DOC_NAME_MAX_LENGTH = 80
+
+# Поля группировки уровней (1 — отдел, 2 — принтер, 3 — пользователь, 4 — документ)
+LEVEL_FIELDS = (
+    ("printer__department__name",),
+    ("printer__model__code", "printer__room_number", "printer__printer_index"),
+    ("user__fio",),
+    ("document_name",),
+)
+# GROUPING(d.name, m.code, p.room_number, p.printer_index, u.fio, e.document_name) → уровень
+_GROUPING_LEVELS = {0b111111: 0, 0b011111: 1, 0b000011: 2, 0b000001: 3, 0b000000: 4}
+
+
+class TreeRow(NamedTuple):
+    level: int  # 0 — общий итог
+    department: str | None
+    model: str | None
+    room: str | None
+    printer_index: int | None
+    fio: str | None
+    document: str | None
+    pages: int | None
+    last_time: datetime | None
+    siblings: int | None = None  # детей у родителя строки (с учётом не попавших в top_k)
+
+
+def _rollup_rows(start_dt: datetime, end_dt: datetime, top_k: int | None = None) -> list[TreeRow]:
+    qn = connection.ops.quote_name
+    totals = f"""
+        SELECT GROUPING(d.{qn("name")}, m.{qn("code")}, p.{qn("room_number")}, p.{qn("printer_index")},
+                        u.{qn("fio")}, e.{qn("document_name")}) AS g,
+               d.{qn("name")} AS department, m.{qn("code")} AS model, p.{qn("room_number")} AS room,
+               p.{qn("printer_index")} AS idx, u.{qn("fio")} AS fio, e.{qn("document_name")} AS document,
+               SUM(e.{qn("pages")}) AS pages, MAX(e.{qn("timestamp")}) AS last_time
+        FROM {qn(PrintEvent._meta.db_table)} e
+        LEFT JOIN {qn(Printer._meta.db_table)} p ON p.{qn("id")} = e.{qn("printer_id")}
+        LEFT JOIN {qn(Department._meta.db_table)} d ON d.{qn("id")} = p.{qn("department_id")}
+        LEFT JOIN {qn(PrinterModel._meta.db_table)} m ON m.{qn("id")} = p.{qn("model_id")}
+        LEFT JOIN {qn(User._meta.db_table)} u ON u.{qn("id")} = e.{qn("user_id")}
+        WHERE e.{qn("timestamp")} >= %s AND e.{qn("timestamp")} <= %s
+        GROUP BY ROLLUP ((d.{qn("name")}), (m.{qn("code")}, p.{qn("room_number")}, p.{qn("printer_index")}),
+                         (u.{qn("fio")}), (e.{qn("document_name")}))
+    """
+    columns = "g, department, model, room, idx, fio, document, pages, last_time"
+    if not top_k:
+        sql = f"SELECT {columns}, NULL FROM ({totals}) t ORDER BY g DESC, pages DESC"
+        params: list[Any] = [start_dt, end_dt]
+    else:
+        # Родитель строки — её столбцы группировки без последнего уровня (g: 31 — отдел, 3 — принтер,
+        # 1 — пользователь, 0 — документ). Строка остаётся, если она и все её предки входят в top_k;
+        # ранги предков разносятся по потомкам окнами (PARTITION BY сравнивает NULL как равные),
+        # а не коррелированными EXISTS — те с IS NOT DISTINCT FROM выполняются вложенными циклами
+        sql = f"""
+            WITH totals AS ({totals}),
+            ranked AS (
+                SELECT {columns}, ROW_NUMBER() OVER (parent ORDER BY pages DESC, department, model, room, idx,
+                                                            fio, document) AS rn,
+                       COUNT(*) OVER parent AS siblings
+                FROM totals
+                WINDOW parent AS (
+                    PARTITION BY g, CASE WHEN g <= 3 THEN department END, CASE WHEN g <= 1 THEN model END,
+                                 CASE WHEN g <= 1 THEN room END, CASE WHEN g <= 1 THEN idx END,
+                                 CASE WHEN g = 0 THEN fio END
+                )
+            ),
+            ancestors AS (
+                SELECT {columns}, siblings, rn,
+                       MAX(CASE WHEN g = 31 THEN rn END) OVER (PARTITION BY department) AS department_rn,
+                       MAX(CASE WHEN g = 3 THEN rn END) OVER (PARTITION BY department, model, room, idx)
+                           AS printer_rn,
+                       MAX(CASE WHEN g = 1 THEN rn END) OVER (PARTITION BY department, model, room, idx, fio)
+                           AS user_rn
+                FROM ranked
+            )
+            SELECT {columns}, siblings FROM ancestors
+            WHERE rn <= %s
+              AND (g >= 31 OR department_rn <= %s)
+              AND (g >= 3 OR printer_rn <= %s)
+              AND (g >= 1 OR user_rn <= %s)
+            ORDER BY g DESC, pages DESC, rn
+        """
+        params = [start_dt, end_dt, top_k, top_k, top_k, top_k]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            TreeRow(
+                level=_GROUPING_LEVELS[g],
+                department=department,
+                model=model,
+                room=room,
+                printer_index=idx,
+                fio=fio,
+                document=document,
+                pages=pages,
+                last_time=last_time,
+                siblings=siblings,
+            )
+            for g, department, model, room, idx, fio, document, pages, last_time, siblings in cursor.fetchall()
+        ]
+
+
+def _level_rows(start_dt: datetime, end_dt: datetime, top_k: int | None = None) -> list[TreeRow]:
+    events = PrintEvent.objects.filter(timestamp__gte=start_dt, timestamp__lte=end_dt)
+    totals = events.aggregate(page_sum=Sum("pages"), last_time=Max("timestamp"))
+    rows = [
+        TreeRow(
+            level=0,
+            department=None,
+            model=None,
+            room=None,
+            printer_index=None,
+            fio=None,
+            document=None,
+            pages=totals["page_sum"],
+            last_time=totals["last_time"],
+        )
+    ]
+    fields: tuple[str, ...] = ()
+    kept_parents: set[tuple[Any, ...]] = {()}
+    for level, level_fields in enumerate(LEVEL_FIELDS, start=1):
+        parent_fields, fields = fields, fields + level_fields
+        groups = events.values_list(*fields).annotate(page_sum=Sum("pages"), last_time=Max("timestamp"))
+        if top_k:
+            partition = [F(field) for field in parent_fields] or None
+            groups = groups.annotate(
+                rn=Window(RowNumber(), partition_by=partition, order_by=[F("page_sum").desc(), *fields]),
+                siblings=Window(Count("*"), partition_by=partition),
+            ).filter(rn__lte=top_k)
+        kept: set[tuple[Any, ...]] = set()
+        for values in groups.order_by("-page_sum", *fields):
+            key = values[: len(fields)]
+            # Предок не вошёл в top_k своего уровня — строка уходит в его «прочие»
+            if key[: len(parent_fields)] not in kept_parents:
+                continue
+            kept.add(key)
+            department, model, room, printer_index, fio, document = key + (None,) * (6 - len(fields))
+            rows.append(
+                TreeRow(
+                    level=level,
+                    department=department,
+                    model=model,
+                    room=room,
+                    printer_index=printer_index,
+                    fio=fio,
+                    document=document,
+                    pages=values[len(fields)],
+                    last_time=values[len(fields) + 1],
+                    siblings=values[len(fields) + 3] if top_k else None,
+                )
+            )
+        kept_parents = kept
+    return rows
+
+
+def fetch_tree_rows(start_dt: datetime, end_dt: datetime, top_k: int | None = None) -> list[TreeRow]:
+    """
+    Итоги всех уровней дерева за период, отсортированные по уровню и убыванию страниц.
+
+    Args:
+        start_dt: Начало периода
+        end_dt: Конец периода
+        top_k: Сколько крупнейших детей оставлять у каждого узла; None или 0 — всех
+    """
+    if connection.vendor == "postgresql":
+        return _rollup_rows(start_dt, end_dt, top_k)
+    return _level_rows(start_dt, end_dt, top_k)
+
+
+def _percent(part: int, whole: int) -> float:
+    return round(part * 100 / whole, 1) if whole else 0
+
+
+def _other(node: dict[str, Any], siblings: int, shown: int, shown_pages: int) -> dict[str, Any] | None:
+    """Строка «прочие» узла: дети, не вошедшие в top_k."""
+    if siblings <= shown:
+        return None
+    total = node["total"] - shown_pages
+    return {"count": siblings - shown, "total": total, "percent": _percent(total, node["total"])}
+
+
+def assemble_print_tree(rows: Iterable[TreeRow]) -> dict[str, Any]:
+    """
+    Раскладывает итоги уровней в дерево для шаблона ``print_tree.html``.
+
+    Returns:
+        dict: {"tree": {отдел: {"total", "percent", "other", "printers": {принтер: {..., "users": {
+        пользователь: {..., "docs": {документ: [{"pages", "timestamp"}]}}}}}}}, "total_pages": int,
+        "other": ...}; "other" — {"count", "total", "percent"} детей, не вошедших в top_k, или None
+    """
+    root: dict[str, Any] = {"total": 0}
+    tree: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    # id(узла) → (узел, детей всего, показано, страниц показано)
+    children: dict[int, list[Any]] = {}
+
+    def add_child(parent: dict[str, Any], row: TreeRow, pages: int) -> None:
+        entry = children.setdefault(id(parent), [parent, 0, 0, 0])
+        entry[1] = row.siblings or 0
+        entry[2] += 1
+        entry[3] += pages
+
+    for row in rows:
+        pages = row.pages or 0
+        if row.level == 0:
+            root["total"] = pages
+            continue
+        dept = tree.setdefault(row.department or "Без отдела", {"total": 0, "printers": OrderedDict()})
+        if row.level == 1:
+            dept["total"] += pages
+            add_child(root, row, pages)
+            continue
+        printer_name = f"{row.model or 'N/A'}-{row.room or 'N/A'}-{row.printer_index or 'N/A'}"
+        printer = dept["printers"].setdefault(printer_name, {"total": 0, "users": OrderedDict()})
+        if row.level == 2:
+            printer["total"] += pages
+            add_child(dept, row, pages)
+            continue
+        user = printer["users"].setdefault(row.fio or "Неизвестный", {"total": 0, "docs": OrderedDict()})
+        if row.level == 3:
+            user["total"] += pages
+            add_child(printer, row, pages)
+            continue
+        doc_name = row.document or "Без названия"
+        if len(doc_name) > DOC_NAME_MAX_LENGTH:
+            doc_name = f"{doc_name[: DOC_NAME_MAX_LENGTH - 1]}…"
+        user["docs"].setdefault(doc_name, []).append({"pages": pages, "timestamp": row.last_time})
+        add_child(user, row, pages)
+
+    others = {key: _other(*entry) for key, entry in children.items()}
+    total_pages = root["total"]
+    for dept in tree.values():
+        dept["percent"] = _percent(dept["total"], total_pages)
+        dept["other"] = others.get(id(dept))
+        for printer in dept["printers"].values():
+            printer["percent"] = _percent(printer["total"], dept["total"])
+            printer["other"] = others.get(id(printer))
+            for user in printer["users"].values():
+                user["percent"] = _percent(user["total"], printer["total"])
+                user["other"] = others.get(id(user))
+    return {"tree": tree, "total_pages": total_pages, "other": others.get(id(root))}
+
+
+# -------------------- Ленивое дерево (по уровням) --------------------
+
+TREE_LEVELS = ("departments", "printers", "users", "documents")
+NODE_LIMIT = 50  # узлов в ответе; остальные сворачиваются в «прочие»
+
+
+def _format_time(value: datetime | None) -> str:
+    return timezone.localtime(value).strftime("%d.%m.%Y %H:%M") if value else ""
+
+
+def tree_node_children(
+    start_dt: datetime,
+    end_dt: datetime,
+    *,
+    department: int | None = None,
+    printer: int | None = None,
+    user: int | None = None,
+    limit: int = NODE_LIMIT,
+) -> dict[str, Any]:
+    """
+    Дочерние узлы одного узла дерева печати (для раскрытия по запросу).
+
+    Уровень определяется переданными идентификаторами: без них — отделы; ``department`` —
+    принтеры отдела; ``printer`` — пользователи принтера; ``printer`` и ``user`` — документы.
+
+    Args:
+        start_dt: Начало периода
+        end_dt: Конец периода
+        department: ID отдела
+        printer: ID принтера
+        user: ID пользователя
+        limit: Сколько крупнейших узлов вернуть
+
+    Returns:
+        dict: {"level", "total": страниц в узле-родителе, "nodes": [{"name", "total", "percent",
+        "last_time", "params": параметры запроса детей или None, если раскрывать нечего}], "other":
+        {"count", "total"} или None}
+    """
+    events = PrintEvent.objects.filter(timestamp__gte=start_dt, timestamp__lte=end_dt)
+    if user is not None and printer is not None:
+        level = "documents"
+        events = events.filter(printer_id=printer, user_id=user)
+        fields: tuple[str, ...] = ("document_name",)
+    elif printer is not None:
+        level = "users"
+        events = events.filter(printer_id=printer)
+        fields = ("user_id", "user__fio", "user__username")
+    elif department is not None:
+        level = "printers"
+        events = events.filter(printer__department_id=department)
+        fields = ("printer_id", "printer__model__code", "printer__room_number", "printer__printer_index")
+    else:
+        level = "departments"
+        fields = ("printer__department_id", "printer__department__name")
+
+    parent = events.aggregate(total=Sum("pages"))
+    parent_total = parent["total"] or 0
+    groups = events.values(*fields).annotate(total=Sum("pages"), last_time=Max("timestamp"))
+    rows = list(groups.order_by("-total", *fields)[:limit])
+
+    nodes: list[dict[str, Any]] = []
+    for row in rows:
+        if level == "departments":
+            name = row["printer__department__name"] or "Без отдела"
+            department_id = row["printer__department_id"]
+            params = {"department": department_id} if department_id is not None else None
+        elif level == "printers":
+            name = (
+                f"{row['printer__model__code'] or 'N/A'}-{row['printer__room_number'] or 'N/A'}-"
+                f"{row['printer__printer_index'] or 'N/A'}"
+            )
+            params = {"department": department, "printer": row["printer_id"]}
+        elif level == "users":
+            name = row["user__fio"] or row["user__username"] or "Неизвестный"
+            params = {"printer": printer, "user": row["user_id"]} if row["user_id"] is not None else None
+        else:
+            name = row["document_name"] or "Без названия"
+            if len(name) > DOC_NAME_MAX_LENGTH:
+                name = f"{name[: DOC_NAME_MAX_LENGTH - 1]}…"
+            params = None
+        nodes.append(
+            {
+                "name": name,
+                "total": row["total"] or 0,
+                "percent": _percent(row["total"] or 0, parent_total),
+                "last_time": _format_time(row["last_time"]),
+                "params": params,
+            }
+        )
+
+    other = None
+    if len(rows) == limit:
+        remaining = groups.count() - len(rows)
+        if remaining > 0:
+            other_total = parent_total - sum(node["total"] for node in nodes)
+            other = {"count": remaining, "total": other_total, "percent": _percent(other_total, parent_total)}
+    return {"level": level, "total": parent_total, "nodes": nodes, "other": other}
@@ -7,10 +7,14 @@ app_name = "printing"
 urlpatterns = [
     path("", views.DashboardView.as_view(), name="dashboard"),
     path("events/", views.PrintEventsView.as_view(), name="print_events"),
+    path("events/export/", views.PrintEventsExportView.as_view(), name="print_events_export"),
     path("statistics/", views.StatisticsView.as_view(), name="statistics"),
     path("tree/", views.PrintTreeView.as_view(), name="print_tree"),
+    path("tree/nodes/", views.PrintTreeNodeView.as_view(), name="print_tree_nodes"),
     path("import/users/", views.ImportUsersView.as_view(), name="import_users"),
     path("import/print-events/", views.ImportPrintEventsView.as_view(), name="import_print_events"),
     path("user-info/", views.UserInfoView.as_view(), name="user_info"),
+    path("slow-queries/", views.SlowQueryReportView.as_view(), name="slow_queries"),
     path("health/", health.health_check, name="health_check"),
+    path("metrics", health.metrics_view, name="metrics"),
 ]
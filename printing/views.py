@@ -1,14 +1,13 @@
 import hmac
 import json
-from collections import OrderedDict
+import tempfile
 from datetime import date, datetime, time
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.cache import cache
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db.models import Count, Sum
-from django.http import HttpResponseForbidden, QueryDict
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, QueryDict, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.utils.decorators import method_decorator
@@ -19,10 +18,16 @@ from django_filters.views import FilterView
 from django_tables2 import SingleTableMixin
 
 from . import services as svc
+from .exports import EXPORT_CONTENT_TYPES, EXPORT_WRITERS, iter_export_rows
 from .filters import PrintEventFilter
-from .models import Department, PrintEvent
+from .ledger import claim_ingest, hash_stream, record_ingest_failure, record_ingest_result
+from .models import Department, IngestLedger, PrintEvent
+from .pagination import EstimatedCountPaginator, InvalidCursor, KeysetPage, estimate_count, keyset_paginate
+from .parsers import JSONArrayExpectedError, iter_json_array
+from .querylog import QUERY_LOG, REPORT_ORDERS, snapshot_dir, top_queries
 from .services import import_print_events, import_users_from_csv_stream
 from .tables import PrintEventTable
+from .tree import NODE_LIMIT
 
 
 def _has_valid_import_token(request) -> bool:
@@ -39,6 +44,61 @@ def _has_valid_import_token(request) -> bool:
     return bool(provided_token) and hmac.compare_digest(provided_token, expected_token)
 
 
+def _period_from_request(request) -> tuple[str, str, datetime, datetime]:
+    """
+    Период из параметров ``start_date`` / ``end_date`` (YYYY-MM-DD).
+
+    Returns:
+        tuple: (start_date_str, end_date_str, start_dt, end_dt); по умолчанию — с первого числа
+        текущего месяца по сегодня
+    """
+    start_date_str = request.GET.get("start_date", "").strip()
+    end_date_str = request.GET.get("end_date", "").strip()
+
+    # Если даты не указаны, устанавливаем по умолчанию:
+    # с первого числа текущего месяца до сегодня
+    if not start_date_str or not end_date_str:
+        today = date.today()
+        default_start = date(today.year, today.month, 1)
+        default_end = today
+
+        if not start_date_str:
+            start_date_str = default_start.strftime("%Y-%m-%d")
+        if not end_date_str:
+            end_date_str = default_end.strftime("%Y-%m-%d")
+
+    # Парсим даты из запроса
+    start_dt = None
+    end_dt = None
+    if start_date_str:
+        try:
+            start_dt = datetime.strptime(start_date_str, "%Y-%m-%d")
+            if settings.USE_TZ and timezone.is_naive(start_dt):
+                start_dt = timezone.make_aware(start_dt, timezone.get_default_timezone())
+        except ValueError:
+            pass
+    if end_date_str:
+        try:
+            end_dt = datetime.strptime(end_date_str, "%Y-%m-%d")
+            end_dt = end_dt.replace(hour=23, minute=59, second=59)
+            if settings.USE_TZ and timezone.is_naive(end_dt):
+                end_dt = timezone.make_aware(end_dt, timezone.get_default_timezone())
+        except ValueError:
+            pass
+
+    # Если после парсинга даты все еще None (ошибка парсинга),
+    # используем значения по умолчанию
+    if start_dt is None or end_dt is None:
+        today = timezone.now().date()
+        default_start = date(today.year, today.month, 1)
+        default_end = today
+        start_dt = timezone.make_aware(datetime.combine(default_start, time.min))
+        end_dt = timezone.make_aware(datetime.combine(default_end, time.max))
+        start_date_str = default_start.strftime("%Y-%m-%d")
+        end_date_str = default_end.strftime("%Y-%m-%d")
+    return start_date_str, end_date_str, start_dt, end_dt
+
+
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = "printing/dashboard.html"
 
@@ -50,103 +110,159 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         return context
 
 
-class PrintEventsView(LoginRequiredMixin, SingleTableMixin, FilterView):
+class PrintEventPaginationMixin:
+    """
+    Режимы пагинации списков событий (настройки PRINT_EVENTS_PAGINATION и PRINT_EVENTS_COUNT).
+
+    - ``offset`` — обычные номера страниц; ``keyset`` — курсор ``?after=`` / ``?before=`` по
+      (timestamp, id), без OFFSET. Keyset работает только для сортировки по убыванию времени;
+      при сортировке таблицы по другой колонке используется OFFSET.
+    - ``exact`` — точный COUNT(*); ``estimate`` — оценка по плану запроса (PostgreSQL).
+    """
+
+    paginate_by = 50
+
+    def use_keyset(self) -> bool:
+        return getattr(settings, "PRINT_EVENTS_PAGINATION", "offset") == "keyset" and self.request.GET.get(
+            "sort", "-timestamp"
+        ) in ("", "-timestamp")
+
+    def use_estimated_count(self) -> bool:
+        return getattr(settings, "PRINT_EVENTS_COUNT", "exact") == "estimate"
+
+    def _page_url(self, **cursor: str) -> str:
+        query = self.request.GET.copy()
+        for key in ("after", "before", "page"):
+            query.pop(key, None)
+        query.update(cursor)
+        return f"{self.request.path}?{query.urlencode()}"
+
+    def get_keyset_page(self, queryset) -> KeysetPage:
+        try:
+            page = keyset_paginate(
+                queryset,
+                self.paginate_by,
+                after=self.request.GET.get("after") or None,
+                before=self.request.GET.get("before") or None,
+            )
+        except InvalidCursor:
+            page = keyset_paginate(queryset, self.paginate_by)
+        page.next_url = self._page_url(after=page.next_cursor) if page.has_next else None
+        page.previous_url = self._page_url(before=page.previous_cursor) if page.has_previous else None
+        page.first_url = self._page_url()
+        if self.use_estimated_count():
+            page.count = estimate_count(queryset)
+        return page
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.use_keyset():
+            page = self.get_keyset_page(queryset)
+            return None, page, page.object_list, page.has_other_pages
+        if self.use_estimated_count():
+            self.paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, page_size)
+
+
+def _with_default_event_dates(params: QueryDict) -> QueryDict | None:
+    """
+    Параметры фильтра событий с датами по умолчанию (с 1-го числа месяца по сегодня).
+
+    Returns:
+        Копия ``params`` с добавленными датами или None, если обе даты уже заданы
+    """
+    # DateFromToRangeFilter использует timestamp_min и timestamp_max
+    timestamp_min = params.get("timestamp_min", "").strip()
+    timestamp_max = params.get("timestamp_max", "").strip()
+    if timestamp_min and timestamp_max:
+        return None
+    q = QueryDict(mutable=True)
+    q.update(params)
+    today = date.today()
+    if not timestamp_min:
+        q["timestamp_min"] = date(today.year, today.month, 1).strftime("%Y-%m-%d")
+    if not timestamp_max:
+        q["timestamp_max"] = today.strftime("%Y-%m-%d")
+    return q
+
+
+class PrintEventsView(PrintEventPaginationMixin, LoginRequiredMixin, SingleTableMixin, FilterView):
     model = PrintEvent
     table_class = PrintEventTable
     template_name = "printing/print_events.html"
     filterset_class = PrintEventFilter
-    paginate_by = 50
 
     def get(self, request, *args, **kwargs):
         """Перехватываем GET-запрос для установки дат по умолчанию."""
-        # Проверяем наличие параметров дат (DateFromToRangeFilter использует timestamp_min и timestamp_max)
-        timestamp_min = request.GET.get("timestamp_min", "").strip()
-        timestamp_max = request.GET.get("timestamp_max", "").strip()
-
-        # Если оба параметра отсутствуют, делаем редирект с датами по умолчанию
-        if not timestamp_min and not timestamp_max:
-            today = date.today()
-            default_start = date(today.year, today.month, 1)
-            default_end = today
-
-            q = QueryDict(mutable=True)
-            q.update(request.GET)
-            q["timestamp_min"] = default_start.strftime("%Y-%m-%d")
-            q["timestamp_max"] = default_end.strftime("%Y-%m-%d")
-            return redirect(f"{request.path}?{q.urlencode()}")
-
-        # Если указан только один параметр, добавляем второй
-        if not timestamp_min or not timestamp_max:
-            q = QueryDict(mutable=True)
-            q.update(request.GET)
-            today = date.today()
-            if not timestamp_min:
-                default_start = date(today.year, today.month, 1)
-                q["timestamp_min"] = default_start.strftime("%Y-%m-%d")
-            if not timestamp_max:
-                q["timestamp_max"] = today.strftime("%Y-%m-%d")
+        q = _with_default_event_dates(request.GET)
+        if q is not None:
             return redirect(f"{request.path}?{q.urlencode()}")
 
         return super().get(request, *args, **kwargs)
 
+    def get_table_data(self):
+        if self.use_keyset():
+            return self.keyset_page.object_list
+        return super().get_table_data()
+
+    def get_table_pagination(self, table):
+        if self.use_keyset():
+            return False
+        pagination = super().get_table_pagination(table)
+        if self.use_estimated_count():
+            pagination["paginator_class"] = EstimatedCountPaginator
+        return pagination
+
+    def paginate_queryset(self, queryset, page_size):
+        # Страницу таблицы строит django-tables2 (или keyset) — отдельная пагинация
+        # object_list с лишним COUNT(*) не нужна
+        return None, None, queryset, False
+
     def get_context_data(self, **kwargs):
+        if self.use_keyset():
+            self.keyset_page = self.get_keyset_page(self.object_list)
         context = super().get_context_data(**kwargs)
+        context["keyset_page"] = getattr(self, "keyset_page", None)
+        # Параметры фильтра для ссылок экспорта (без курсора и страницы таблицы)
+        export_query = self.request.GET.copy()
+        for key in ("after", "before", "page", "sort", "export"):
+            export_query.pop(key, None)
+        context["export_query"] = export_query.urlencode()
         # Сумма страниц по отфильтрованным событиям
         total_pages = self.object_list.aggregate(total=Sum("pages"))["total"] or 0
         context["total_pages"] = total_pages
         return context
 
 
+class PrintEventsExportView(LoginRequiredMixin, View):
+    """
+    Потоковая выгрузка событий печати по фильтрам страницы событий (``PrintEventFilter``).
+
+    Формат — параметр ``export``: ``csv`` (по умолчанию) или ``xlsx``. Без дат выгружается текущий месяц.
+    """
+
+    def get(self, request):
+        export_format = request.GET.get("export", "csv")
+        if export_format not in EXPORT_WRITERS:
+            return HttpResponseBadRequest("Неизвестный формат экспорта")
+        params = _with_default_event_dates(request.GET) or request.GET
+        filterset = PrintEventFilter(params, queryset=PrintEvent.objects.all())
+        if not filterset.is_valid():
+            return HttpResponseBadRequest("Некорректные параметры фильтра")
+        response = StreamingHttpResponse(
+            EXPORT_WRITERS[export_format](iter_export_rows(filterset.qs)),
+            content_type=EXPORT_CONTENT_TYPES[export_format],
+        )
+        filename = f"print_events_{params['timestamp_min']}_{params['timestamp_max']}.{export_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class StatisticsView(LoginRequiredMixin, TemplateView):
     template_name = "printing/statistics.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        start_date_str = self.request.GET.get("start_date", "").strip()
-        end_date_str = self.request.GET.get("end_date", "").strip()
-
-        # Если даты не указаны, устанавливаем по умолчанию:
-        # с первого числа текущего месяца до сегодня
-        if not start_date_str or not end_date_str:
-            today = date.today()
-            default_start = date(today.year, today.month, 1)
-            default_end = today
-
-            if not start_date_str:
-                start_date_str = default_start.strftime("%Y-%m-%d")
-            if not end_date_str:
-                end_date_str = default_end.strftime("%Y-%m-%d")
-
-        # Парсим даты из запроса
-        start_dt = None
-        end_dt = None
-        if start_date_str:
-            try:
-                start_dt = datetime.strptime(start_date_str, "%Y-%m-%d")
-                if settings.USE_TZ and timezone.is_naive(start_dt):
-                    start_dt = timezone.make_aware(start_dt, timezone.get_default_timezone())
-            except ValueError:
-                pass
-        if end_date_str:
-            try:
-                end_dt = datetime.strptime(end_date_str, "%Y-%m-%d")
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)
-                if settings.USE_TZ and timezone.is_naive(end_dt):
-                    end_dt = timezone.make_aware(end_dt, timezone.get_default_timezone())
-            except ValueError:
-                pass
-
-        # Если после парсинга даты все еще None (ошибка парсинга),
-        # используем значения по умолчанию
-        if start_dt is None or end_dt is None:
-            today = timezone.now().date()
-            default_start = date(today.year, today.month, 1)
-            default_end = today
-            start_dt = timezone.make_aware(datetime.combine(default_start, time.min))
-            end_dt = timezone.make_aware(datetime.combine(default_end, time.max))
-            start_date_str = default_start.strftime("%Y-%m-%d")
-            end_date_str = default_end.strftime("%Y-%m-%d")
-
+        start_date_str, end_date_str, start_dt, end_dt = _period_from_request(self.request)
         data = svc.get_statistics_data(start_date=start_dt, end_date=end_dt)
         context.update(
             {
@@ -165,122 +281,95 @@ class PrintTreeView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        start_date_str = self.request.GET.get("start_date", "").strip()
-        end_date_str = self.request.GET.get("end_date", "").strip()
-
-        # Если даты не указаны, устанавливаем по умолчанию:
-        # с первого числа текущего месяца до сегодня
-        if not start_date_str or not end_date_str:
-            today = date.today()
-            default_start = date(today.year, today.month, 1)
-            default_end = today
-
-            if not start_date_str:
-                start_date_str = default_start.strftime("%Y-%m-%d")
-            if not end_date_str:
-                end_date_str = default_end.strftime("%Y-%m-%d")
-
-        # Парсим даты из запроса
-        start_dt = None
-        end_dt = None
-        if start_date_str:
-            try:
-                start_dt = datetime.strptime(start_date_str, "%Y-%m-%d")
-                if settings.USE_TZ and timezone.is_naive(start_dt):
-                    start_dt = timezone.make_aware(start_dt, timezone.get_default_timezone())
-            except ValueError:
-                pass
-        if end_date_str:
-            try:
-                end_dt = datetime.strptime(end_date_str, "%Y-%m-%d")
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)
-                if settings.USE_TZ and timezone.is_naive(end_dt):
-                    end_dt = timezone.make_aware(end_dt, timezone.get_default_timezone())
-            except ValueError:
-                pass
-
-        # Если после парсинга даты все еще None (ошибка парсинга),
-        # используем значения по умолчанию
-        if start_dt is None or end_dt is None:
-            today = timezone.now().date()
-            default_start = date(today.year, today.month, 1)
-            default_end = today
-            start_dt = timezone.make_aware(datetime.combine(default_start, time.min))
-            end_dt = timezone.make_aware(datetime.combine(default_end, time.max))
-            start_date_str = default_start.strftime("%Y-%m-%d")
-            end_date_str = default_end.strftime("%Y-%m-%d")
-
-        cache_key = f"print_tree_{start_date_str}_{end_date_str}"
-        tree_data = cache.get(cache_key)
-        if tree_data is None:
-            # Передаем реальные даты в сервис для фильтрации
-            results = svc.get_statistics_data(start_date=start_dt, end_date=end_dt)["tree_results"]
-            tree = {}
-            total_pages = 0
-            for row in results:
-                # Обработка None значений для безопасности
-                dept_name_val = row.get("printer__department__name") or "Без отдела"
-                dept_name = dept_name_val
-
-                model_code = row.get("printer__model__code") or "N/A"
-                room = row.get("printer__room_number") or "N/A"
-                index = row.get("printer__printer_index") or "N/A"
-                printer_name = f"{model_code}-{room}-{index}"
-
-                user_name = row.get("user__fio") or "Неизвестный"
-                doc_name = row.get("document_name") or "Без названия"
-                pages = row.get("page_sum") or 0
-                total_pages += pages
-                dept = tree.setdefault(dept_name, {"total": 0, "printers": OrderedDict()})
-                dept["total"] += pages
-                printer = dept["printers"].setdefault(printer_name, {"total": 0, "users": OrderedDict()})
-                printer["total"] += pages
-                user = printer["users"].setdefault(user_name, {"total": 0, "docs": OrderedDict()})
-                user["total"] += pages
-                doc_entry = user["docs"].setdefault(doc_name, [])
-                doc_entry.append({"pages": pages, "timestamp": row.get("last_time")})
-            # Сортировка и проценты
-            sorted_tree = OrderedDict()
-            for dept_name, dept_data in sorted(tree.items(), key=lambda x: x[1]["total"], reverse=True):
-                dept_percent = (dept_data["total"] * 100 / total_pages) if total_pages else 0
-                sorted_printers = OrderedDict()
-                for printer_name, printer_data in sorted(
-                    dept_data["printers"].items(), key=lambda x: x[1]["total"], reverse=True
-                ):
-                    printer_percent = (printer_data["total"] * 100 / dept_data["total"]) if dept_data["total"] else 0
-                    sorted_users = OrderedDict()
-                    for user_name, user_data in sorted(
-                        printer_data["users"].items(), key=lambda x: x[1]["total"], reverse=True
-                    ):
-                        user_percent = (
-                            (user_data["total"] * 100 / printer_data["total"]) if printer_data["total"] else 0
-                        )
-                        sorted_docs = OrderedDict()
-                        for doc_name, doc_entries in sorted(
-                            user_data["docs"].items(), key=lambda x: sum(entry["pages"] for entry in x[1]), reverse=True
-                        ):
-                            if len(doc_name) > 80:
-                                doc_name = f"{doc_name[:79]}…"
-                            sorted_docs[doc_name] = doc_entries
-                        user_data["docs"] = sorted_docs
-                        user_data["percent"] = round(user_percent, 1)
-                        sorted_users[user_name] = user_data
-                    printer_data["users"] = sorted_users
-                    printer_data["percent"] = round(printer_percent, 1)
-                    sorted_printers[printer_name] = printer_data
-                dept_data["printers"] = sorted_printers
-                dept_data["percent"] = round(dept_percent, 1)
-                sorted_tree[dept_name] = dept_data
-            tree_data = {"tree": sorted_tree, "total_pages": total_pages}
-            # Для периодов, которые уже закончились, кэшируем дольше
-            cache_timeout = 300  # 5 минут по умолчанию
-            if end_dt and end_dt.date() < date.today():
-                cache_timeout = 3600 * 24  # 24 часа для прошлых периодов
-            cache.set(cache_key, tree_data, cache_timeout)
-        context.update(tree_data)
+        start_date_str, end_date_str, start_dt, end_dt = _period_from_request(self.request)
         context.update({"start_date": start_date_str, "end_date": end_date_str})
+        if self.is_lazy():
+            # Только итоги отделов; принтеры, пользователи и документы подгружаются PrintTreeNodeView
+            departments = svc.get_print_tree_node(start_dt, end_dt)
+            context.update({"lazy": True, "departments": departments, "total_pages": departments["total"]})
+        else:
+            context.update(svc.get_print_tree(start_dt, end_dt))
         return context
 
+    def is_lazy(self) -> bool:
+        """Режим дерева: PRINT_TREE_MODE (full | lazy), переопределяется параметром ``?mode=``."""
+        mode = self.request.GET.get("mode") or getattr(settings, "PRINT_TREE_MODE", "full")
+        return mode == "lazy"
+
+
+class PrintTreeNodeView(LoginRequiredMixin, View):
+    """
+    JSON с дочерними узлами дерева печати (ленивый режим ``/tree/``).
+
+    Параметры: ``start_date``, ``end_date``, ``department``, ``printer``, ``user`` (ID) и ``limit``
+    (не больше MAX_LIMIT). Уровень определяется переданными ID, см. ``printing.tree.tree_node_children``.
+    """
+
+    MAX_LIMIT = 500
+
+    def get(self, request):
+        _start, _end, start_dt, end_dt = _period_from_request(request)
+        try:
+            ids = {key: int(request.GET[key]) for key in ("department", "printer", "user") if request.GET.get(key)}
+            limit = int(request.GET.get("limit") or NODE_LIMIT)
+        except ValueError:
+            return JsonResponse({"error": "Некорректный идентификатор узла или limit"}, status=400)
+        if "user" in ids and "printer" not in ids:
+            return JsonResponse({"error": "Для документов пользователя нужен printer"}, status=400)
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        return JsonResponse(svc.get_print_tree_node(start_dt, end_dt, limit=limit, **ids))
+
+
+class SlowQueryReportView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Сводка SQL-запросов по отпечаткам и представлениям (журнал SLOW_QUERY_LOG), только для staff.
+
+    Параметры: ``order`` (total | p95 | max | count), ``view`` (метка представления) и ``limit``.
+    POST очищает журнал всех воркеров.
+    """
+
+    template_name = "printing/slow_queries.html"
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        order = self.request.GET.get("order")
+        if order not in REPORT_ORDERS:
+            order = "total"
+        try:
+            limit = max(1, min(int(self.request.GET.get("limit") or self.DEFAULT_LIMIT), self.MAX_LIMIT))
+        except ValueError:
+            limit = self.DEFAULT_LIMIT
+        selected_view = self.request.GET.get("view", "")
+        stats = QUERY_LOG.collect(snapshot_dir())
+        views = sorted({stat.view for stat in stats})
+        if selected_view:
+            stats = [stat for stat in stats if stat.view == selected_view]
+        context.update(
+            {
+                "enabled": settings.SLOW_QUERY_LOG,
+                "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+                "shared": bool(snapshot_dir()),
+                "rows": top_queries(stats, order, limit),
+                "total_count": sum(stat.count for stat in stats),
+                "total_seconds": sum(stat.total for stat in stats),
+                "order": order,
+                "orders": REPORT_ORDERS,
+                "limit": limit,
+                "views": views,
+                "selected_view": selected_view,
+            }
+        )
+        return context
+
+    def post(self, request):
+        QUERY_LOG.reset(snapshot_dir())
+        return redirect("printing:slow_queries")
+
 
 class ImportUsersView(LoginRequiredMixin, View):
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 МБ максимальный размер файла
@@ -317,7 +406,10 @@ class ImportUsersView(LoginRequiredMixin, View):
 
 
 class ImportPrintEventsView(LoginRequiredMixin, View):
-    MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 МБ максимальный размер файла для JSON событий
+    # JSON разбирается потоково (см. printing.parsers), поэтому лимит ограничивает
+    # только размер загрузки, а не потребление памяти
+    MAX_FILE_SIZE = 500 * 1024 * 1024  # 500 МБ максимальный размер файла для JSON событий
+    SPOOL_MAX_MEMORY = 10 * 1024 * 1024  # тело запроса больше 10 МБ копируется на диск
 
     def get(self, request):
         return render(request, "printing/import_print_events_result.html", {"result": None})
@@ -326,50 +418,66 @@ class ImportPrintEventsView(LoginRequiredMixin, View):
         if not _has_valid_import_token(request):
             return HttpResponseForbidden("Invalid or missing import token")
 
-        events = None
-        error = None
-        # Если multipart/form-data — файл
+        # Если multipart/form-data — файл, иначе JSON в теле запроса
         if "file" in request.FILES:
+            upload = request.FILES["file"]
+            size = upload.size
+            label = "JSON-файла"
+            file_name = upload.name
+        else:
+            upload = None
+            size = int(request.META.get("CONTENT_LENGTH") or 0)
+            label = "JSON"
+            file_name = ""
+        if size > self.MAX_FILE_SIZE:
+            error = f"Размер данных превышает допустимый лимит ({self.MAX_FILE_SIZE / 1024 / 1024:.1f} МБ)"
+            return render(request, "printing/import_print_events_result.html", {"result": {"error": error}})
+
+        with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_MEMORY) as spool:
+            # Сначала только хэш: повторно загруженное содержимое не разбирается (журнал IngestLedger).
+            # Тело запроса нельзя перечитать, поэтому оно копируется во временный файл.
+            if upload is not None:
+                content_hash, size = hash_stream(upload)
+                upload.seek(0)
+                source = upload
+            else:
+                content_hash, size = hash_stream(request, copy_to=spool)
+                spool.seek(0)
+                source = spool
+            entry, claimed = claim_ingest(
+                content_hash,
+                size,
+                kind=IngestLedger.KIND_EVENTS,
+                source=IngestLedger.SOURCE_UPLOAD,
+                file_name=file_name,
+            )
+            if not claimed and entry.status == IngestLedger.STATUS_PROCESSING:
+                result = {"error": "Этот файл сейчас импортируется, повторите загрузку позже"}
+                return render(request, "printing/import_print_events_result.html", {"result": result})
+            if not claimed:
+                result = {"already_imported": True, "ledger": entry}
+                return render(request, "printing/import_print_events_result.html", {"result": result})
+
             try:
-                file = request.FILES["file"]
-                # Проверка размера файла
-                if file.size > self.MAX_FILE_SIZE:
-                    error = f"Размер файла превышает допустимый лимит ({self.MAX_FILE_SIZE / 1024 / 1024:.1f} МБ)"
-                else:
-                    events = json.load(file)
+                result = import_print_events(iter_json_array(source))
+            except JSONArrayExpectedError as e:
+                record_ingest_failure(entry, e)
+                result = {"error": "Неверный формат. Ожидается список событий"}
             except json.JSONDecodeError as e:
-                error = f"Ошибка парсинга JSON-файла: {str(e)}"
-            except (ValueError, TypeError) as e:
-                error = f"Ошибка обработки файла: {str(e)}"
+                record_ingest_failure(entry, e)
+                result = {"error": f"Ошибка парсинга {label}: {str(e)}"}
+            except (UnicodeDecodeError, ValueError, TypeError) as e:
+                record_ingest_failure(entry, e)
+                result = {"error": f"Ошибка обработки данных: {str(e)}"}
             except Exception as e:
-                error = f"Неожиданная ошибка при обработке файла: {str(e)}"
-        else:
-            # Проверка размера тела запроса
-            body_size = len(request.body)
-            if body_size > self.MAX_FILE_SIZE:
-                error = f"Размер данных превышает допустимый лимит ({self.MAX_FILE_SIZE / 1024 / 1024:.1f} МБ)"
+                record_ingest_failure(entry, e)
+                result = {"error": f"Неожиданная ошибка при обработке данных: {str(e)}"}
             else:
-                try:
-                    events = json.loads(request.body.decode("utf-8"))
-                except json.JSONDecodeError as e:
-                    error = f"Ошибка парсинга JSON: {str(e)}"
-                except (UnicodeDecodeError, ValueError, TypeError) as e:
-                    error = f"Ошибка декодирования данных: {str(e)}"
-                except Exception as e:
-                    error = f"Неожиданная ошибка при обработке данных: {str(e)}"
-        if error:
-            return render(request, "printing/import_print_events_result.html", {"result": {"error": error}})
-        if not isinstance(events, list):
-            return render(
-                request,
-                "printing/import_print_events_result.html",
-                {"result": {"error": "Неверный формат. Ожидается список событий"}},
-            )
-        result = import_print_events(events)
+                record_ingest_result(entry, result)
         return render(request, "printing/import_print_events_result.html", {"result": result})
 
 
-class PrintEventListView(LoginRequiredMixin, ListView):
+class PrintEventListView(PrintEventPaginationMixin, LoginRequiredMixin, ListView):
     """
     Представление для отображения списка событий печати.
 
@@ -0,0 +1,164 @@
+"""
+Прогрев кэша статистики после импорта.
+
+Импорт сбрасывает версии кэша за затронутые месяцы (``invalidate_statistics_cache``), и без
+прогрева полную агрегацию оплатил бы первый пользователь, открывший ``/statistics/`` или
+``/tree/``. После импорта (сигнал ``print_events_imported``) затронутые периоды пересчитываются
+заранее: в фоновом потоке процесса, выполнившего импорт (watcher или web), вне пути запроса.
+Импорты, пришедшие во время прогрева или задержки ``STATS_WARM_DELAY``, объединяются.
+
+Периоды задаются настройкой STATS_WARM_PERIODS (через запятую):
+
+- ``current_month`` — с первого числа текущего месяца по сегодня (период страниц по умолчанию);
+- ``touched_months`` — прошедшие календарные месяцы, в которые попали импортированные события;
+- ``dashboard`` — ряды dashboard за 30 дней.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import services as svc
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import date
+
+logger = logging.getLogger(__name__)
+
+WARM_PERIODS = ("current_month", "touched_months", "dashboard")
+DASHBOARD_DAYS = 30
+
+
+def get_warm_periods() -> list[str]:
+    configured = getattr(settings, "STATS_WARM_PERIODS", ",".join(WARM_PERIODS))
+    periods = [period.strip() for period in configured.split(",") if period.strip()]
+    unknown = set(periods) - set(WARM_PERIODS)
+    if unknown:
+        logger.warning(f"Неизвестные периоды прогрева STATS_WARM_PERIODS: {', '.join(sorted(unknown))}")
+    return [period for period in periods if period in WARM_PERIODS]
+
+
+def periods_to_warm(
+    dates: Iterable[date], periods: Iterable[str], today: date | None = None
+) -> list[tuple[date, date]]:
+    """
+    Периоды (первый день, последний день) статистики и дерева печати, которые нужно прогреть.
+
+    Args:
+        dates: Даты импортированных событий (None в ``warm_statistics_cache`` — только текущий месяц)
+        periods: Включённые виды периодов (см. модуль)
+        today: Текущая дата (для тестов)
+    """
+    today = today or timezone.localdate()
+    current_month = today.replace(day=1)
+    result: list[tuple[date, date]] = []
+    if "current_month" in periods:
+        result.append((current_month, today))
+    if "touched_months" in periods:
+        for month in sorted({day.replace(day=1) for day in dates if day < current_month}):
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            result.append((month, next_month - timedelta(days=1)))
+    return result
+
+
+def warm_statistics_cache(dates: Iterable[date] | None = None, periods: Iterable[str] | None = None) -> int:
+    """
+    Пересчитывает в кэш статистику отделов и пользователей, дерево печати и dashboard.
+
+    Уже закэшированные значения не пересчитываются (``get_or_compute``).
+
+    Args:
+        dates: Даты импортированных событий; None — только текущий месяц и dashboard
+        periods: Виды периодов; None — настройка STATS_WARM_PERIODS
+
+    Returns:
+        int: Число прогретых периодов (включая dashboard)
+    """
+    periods = list(get_warm_periods() if periods is None else periods)
+    warmed = 0
+    for start_day, end_day in periods_to_warm(dates or (), periods):
+        start_dt, end_dt = svc.period_bounds(start_day, end_day)
+        svc.get_statistics_data(start_date=start_dt, end_date=end_dt)
+        svc.get_print_tree(start_dt, end_dt)
+        warmed += 1
+    if "dashboard" in periods:
+        svc.get_dashboard_stats(days=DASHBOARD_DAYS)
+        warmed += 1
+    return warmed
+
+
+class StatsCacheWarmer:
+    """
+    Фоновый поток прогрева: ``schedule`` только запоминает даты, прогрев выполняет поток.
+
+    Args:
+        delay: Пауза перед прогревом, сек — за неё успевают прийти соседние файлы пачки
+    """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self._pending: set[date] = set()
+        self._scheduled = False
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def schedule(self, dates: Iterable[date]) -> None:
+        with self._cond:
+            self._pending.update(dates)
+            self._scheduled = True
+            self._cond.notify_all()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stats-warmer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._scheduled:
+                    self._thread = None
+                    return
+            time.sleep(self.delay)
+            with self._cond:
+                dates, self._pending = self._pending, set()
+                self._scheduled = False
+            close_old_connections()
+            try:
+                started = time.monotonic()
+                warmed = warm_statistics_cache(dates)
+                logger.info(f"Кэш статистики прогрет: {warmed} периодов за {time.monotonic() - started:.1f} с")
+            except Exception:
+                logger.error("Ошибка прогрева кэша статистики", exc_info=True)
+            finally:
+                close_old_connections()
+
+
+_warmer: StatsCacheWarmer | None = None
+_warmer_lock = threading.Lock()
+
+
+def schedule_statistics_warming(dates: Iterable[date]) -> None:
+    """
+    Планирует прогрев после импорта согласно STATS_WARM_MODE.
+
+    ``thread`` — в фоновом потоке (по умолчанию), ``sync`` — сразу в текущем потоке, ``off`` — не прогревать.
+    """
+    mode = getattr(settings, "STATS_WARM_MODE", "thread")
+    if mode == "off":
+        return
+    if mode == "sync":
+        warm_statistics_cache(dates)
+        return
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = StatsCacheWarmer(delay=getattr(settings, "STATS_WARM_DELAY", 2.0))
+    _warmer.schedule(dates)
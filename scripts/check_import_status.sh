@@ -18,6 +18,19 @@ echo "❌ Файлы в карантине (ошибки):"
 ls -lh data/quarantine/ 2>/dev/null | tail -n +2 | wc -l | xargs -I {} echo "   Файлов: {}"
 ls -lh data/quarantine/ 2>/dev/null | tail -n +2 | head -5
 
+echo ""
+echo "🔁 Отложенные повторы (data/watcher_retry_state.json):"
+if [ -s data/watcher_retry_state.json ]; then
+    python3 - << 'PYTHON'
+import json
+
+for entry in json.load(open("data/watcher_retry_state.json", encoding="utf-8")):
+    print(f"   {entry['path']}: попыток {entry['attempts']}, ошибка: {entry['last_error']}")
+PYTHON
+else
+    echo "   Нет"
+fi
+
 echo ""
 echo "📊 Статистика в базе данных:"
 docker compose exec -T web python manage.py shell << 'PYTHON'
@@ -0,0 +1,169 @@
+"""
+Замеры производительности импорта и статистики на объёмах 10k / 100k / 1M событий.
+
+Для каждого объёма БД дополняется до нужного числа событий (``seed``), затем с холодным
+кэшем замеряются импорт событий и пользователей, статистика, dashboard и рендер ``/tree/``:
+время (wall clock) и число SQL-запросов; с ``trace_memory`` — ещё пик памяти Python
+(``tracemalloc`` замедляет Python-код в разы, поэтому время такого прогона с обычным не сравнивают).
+Результаты сохраняются в JSON (``save_results``) и сравниваются между коммитами::
+
+    python -m tests.benchmarks.runner compare benchmark-results/old.json benchmark-results/new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+RESULTS_DIR = Path("benchmark-results")
+IMPORT_EVENTS = 5000  # событий в замере импорта
+IMPORT_NEW_USERS = 200  # новых пользователей в замере импорта CSV
+
+
+def measure(name: str, scale: int, func: Callable[[], Any], trace_memory: bool = False) -> dict[str, Any]:
+    """Выполняет ``func`` один раз и возвращает время, число запросов и (с ``trace_memory``) пик памяти."""
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    cache.clear()
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            seconds = time.perf_counter() - started
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return {
+        "name": name,
+        "scale": scale,
+        "seconds": round(seconds, 4),
+        "queries": len(queries),
+        "peak_memory_kb": peak,
+    }
+
+
+def run_scale(dims: Any, scale: int, client: Any, *, trace_memory: bool = False) -> list[dict[str, Any]]:
+    """Замеры на текущем наполнении БД (``scale`` — число событий в нём)."""
+    from django.utils import timezone
+
+    from printing import services as svc
+    from tests.benchmarks.seed import print_event_payloads, users_csv
+
+    now = timezone.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    tree_params = {"start_date": f"{(now - timedelta(days=30)):%Y-%m-%d}", "end_date": f"{now:%Y-%m-%d}"}
+    payloads = print_event_payloads(dims, IMPORT_EVENTS, start_index=scale)
+    csv_bytes = users_csv(dims, IMPORT_NEW_USERS, start_index=scale)
+
+    def render_tree() -> None:
+        response = client.get("/tree/", tree_params)
+        assert response.status_code == 200, response.status_code
+        response.content  # noqa: B018 — шаблон рендерится при обращении к content
+
+    steps: list[tuple[str, Callable[[], Any]]] = [
+        ("import_print_events", lambda: svc.import_print_events(payloads)),
+        ("import_users_from_csv_stream", lambda: svc.import_users_from_csv_stream(io.BytesIO(csv_bytes))),
+        ("get_statistics_data", lambda: svc.get_statistics_data(month_start, now)),
+        ("get_dashboard_stats", lambda: svc.get_dashboard_stats(days=30)),
+        ("print_tree_view", render_tree),
+    ]
+    return [measure(name, scale, func, trace_memory) for name, func in steps]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results: Iterable[dict[str, Any]], path: Path | None = None, *, trace_memory: bool = False) -> Path:
+    import django
+    from django.db import connection
+
+    commit = git_commit()
+    suffix = "-memory" if trace_memory else ""
+    path = path or RESULTS_DIR / f"{commit}-{connection.vendor}{suffix}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "trace_memory": trace_memory,
+        "results": list(results),
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def compare(old: dict[str, Any], new: dict[str, Any], threshold: float = 0.2) -> list[str]:
+    """
+    Таблица изменений между двумя файлами результатов.
+
+    Returns:
+        list[str]: Строки отчёта; замедление больше ``threshold`` (доля) помечено ``REGRESSION``
+    """
+    before = {(row["name"], row["scale"]): row for row in old["results"]}
+    lines = [f"{old['commit']} → {new['commit']} ({new['database']})"]
+    if old.get("trace_memory") != new.get("trace_memory"):
+        lines.append("Внимание: только один из прогонов с tracemalloc — время несопоставимо")
+    for row in new["results"]:
+        base = before.get((row["name"], row["scale"]))
+        if base is None:
+            lines.append(f"{row['name']:<30} {row['scale']:>9}  {row['seconds']:.3f}s (новый замер)")
+            continue
+        ratio = row["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        mark = "  REGRESSION" if ratio > 1 + threshold else ""
+        lines.append(
+            f"{row['name']:<30} {row['scale']:>9}  {base['seconds']:.3f}s → {row['seconds']:.3f}s ({ratio:.2f}x), "
+            f"запросов {base['queries']} → {row['queries']}, "
+            f"память {_kb(base['peak_memory_kb'])} → {_kb(row['peak_memory_kb'])} КБ{mark}"
+        )
+    return lines
+
+
+def _kb(value: int | None) -> str:
+    return "—" if value is None else str(value)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарков")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("old", type=Path)
+    compare_parser.add_argument("new", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Допустимое замедление, доля")
+    args = parser.parse_args(argv)
+
+    old = json.loads(args.old.read_text(encoding="utf-8"))
+    new = json.loads(args.new.read_text(encoding="utf-8"))
+    lines = compare(old, new, args.threshold)
+    print("\n".join(lines))
+    return 1 if any(line.endswith("REGRESSION") for line in lines) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
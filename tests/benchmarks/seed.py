@@ -0,0 +1,49 @@
+"""
+Данные для бенчмарков — синтетический набор ``printing.synthetic`` (тот же, что создаёт
+``manage.py generate_print_events``): справочники через ``bulk_create``, события через COPY
+на PostgreSQL и ``bulk_create`` на остальных СУБД.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any
+
+from printing.synthetic import (
+    SyntheticDimensions,
+    event_payloads,
+    generate_dimensions,
+    iter_synthetic_events,
+    load_print_events,
+)
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def seed_dimensions(departments: int = 20, users: int = 500, printers: int = 100) -> SyntheticDimensions:
+    return generate_dimensions(departments=departments, users=users, printers=printers, prefix="bench")
+
+
+def seed_print_events(dims: SyntheticDimensions, count: int, *, start_index: int = 0) -> None:
+    """Добавляет ``count`` событий (``job_id`` продолжают ``start_index``) и перестраивает суточные итоги."""
+    load_print_events(dims, count, start_index=start_index)
+
+
+def print_event_payloads(dims: SyntheticDimensions, count: int, *, start_index: int) -> list[dict[str, Any]]:
+    """События за последнюю неделю в формате выгрузки для ``import_print_events``."""
+    return list(event_payloads(dims, iter_synthetic_events(dims, count, start_index=start_index, days=7)))
+
+
+def users_csv(dims: SyntheticDimensions, new_users: int, *, start_index: int) -> bytes:
+    """CSV выгрузки AD: все существующие пользователи (каждый десятый сменил ФИО) и ``new_users`` новых."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["SamAccountName", "DisplayName", "OU"])
+    for n, user in enumerate(dims.users):
+        writer.writerow(
+            [user.username, f"{user.fio} ({start_index})" if n % 10 == 0 else user.fio, user.department.code]
+        )
+    for n in range(new_users):
+        writer.writerow([f"bench-new-{start_index + n}", f"Новый пользователь {n}", dims.users[0].department.code])
+    return buffer.getvalue().encode("utf-8")
@@ -0,0 +1,78 @@
+"""
+Бенчмарки импорта и статистики.
+
+Полный прогон выключен по умолчанию и включается переменной BENCHMARK_SCALES::
+
+    BENCHMARK_SCALES=10k,100k,1m DJANGO_SETTINGS_MODULE=config.settings.test_postgres \\
+        pytest tests/benchmarks -p no:cacheprovider --no-cov -s
+
+BENCHMARK_MEMORY=1 добавляет пик памяти Python (tracemalloc; время такого прогона завышено).
+Результаты пишутся в ``benchmark-results/<commit>-<СУБД>.json`` (или BENCHMARK_OUTPUT) и
+сравниваются командой ``python -m tests.benchmarks.runner compare old.json new.json``.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from accounts.models import User
+from printing.models import PrintEvent
+from tests.benchmarks.runner import compare, run_scale, save_results
+from tests.benchmarks.seed import SCALES, seed_dimensions, seed_print_events
+
+BENCHMARK_SCALES = [scale.strip().lower() for scale in os.getenv("BENCHMARK_SCALES", "").split(",") if scale.strip()]
+BENCHMARK_MEMORY = os.getenv("BENCHMARK_MEMORY", "").lower() in ("1", "true", "yes")
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="bench-admin", password="bench", is_staff=True)
+        self.client.force_login(user)
+
+    @skipUnless(BENCHMARK_SCALES, "Бенчмарки: задайте BENCHMARK_SCALES=10k,100k,1m")
+    def test_benchmarks(self):
+        unknown = set(BENCHMARK_SCALES) - set(SCALES)
+        self.assertFalse(unknown, f"Неизвестные объёмы, допустимы: {', '.join(SCALES)}")
+        dims = seed_dimensions()
+        results = []
+        for scale in sorted(SCALES[name] for name in BENCHMARK_SCALES):
+            existing = PrintEvent.objects.count()
+            seed_print_events(dims, scale - existing, start_index=existing)
+            for row in run_scale(dims, scale, self.client, trace_memory=BENCHMARK_MEMORY):
+                print(f"{row['name']:<30} {scale:>9}  {row['seconds']:.3f}s  {row['queries']} запросов")
+                results.append(row)
+        output = os.getenv("BENCHMARK_OUTPUT")
+        path = save_results(results, Path(output) if output else None, trace_memory=BENCHMARK_MEMORY)
+        print(f"Результаты: {path}")
+
+    def test_smoke(self):
+        """Сценарий бенчмарка на крошечном объёме — чтобы он не ломался незаметно."""
+        dims = seed_dimensions(departments=2, users=10, printers=3)
+        seed_print_events(dims, 200)
+        with patch("tests.benchmarks.runner.IMPORT_EVENTS", 20), patch("tests.benchmarks.runner.IMPORT_NEW_USERS", 5):
+            results = run_scale(dims, 200, self.client, trace_memory=True)
+
+        self.assertEqual(
+            [row["name"] for row in results],
+            [
+                "import_print_events",
+                "import_users_from_csv_stream",
+                "get_statistics_data",
+                "get_dashboard_stats",
+                "print_tree_view",
+            ],
+        )
+        self.assertTrue(all(row["queries"] > 0 and row["peak_memory_kb"] is not None for row in results))
+        self.assertEqual(PrintEvent.objects.count(), 220)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = save_results(results, Path(tmp) / "result.json")
+            saved = json.loads(path.read_text(encoding="utf-8"))
+        slower = {**saved, "results": [{**row, "seconds": row["seconds"] * 2 + 1} for row in saved["results"]]}
+        self.assertTrue(all(line.endswith("REGRESSION") for line in compare(saved, slower)[1:]))
+        self.assertFalse(any(line.endswith("REGRESSION") for line in compare(saved, saved)))
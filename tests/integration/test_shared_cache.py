@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from config.settings.base import _cache_from_env
+from printing.services import STATS_CACHE_VERSION_KEY, get_stats_cache_token
+
+# Отдельный процесс (как watcher) сбрасывает кэш статистики за март 2025
+INVALIDATE_SCRIPT = """
+import django
+django.setup()
+from datetime import date
+from printing.services import invalidate_statistics_cache
+invalidate_statistics_cache(dates=[date(2025, 3, 10)])
+"""
+
+
+class CacheSettingsTests(SimpleTestCase):
+    def test_backend_selected_from_env(self):
+        with patch.dict(os.environ, {"CACHE_BACKEND": "file", "CACHE_LOCATION": "/srv/cache"}):
+            config = _cache_from_env()
+        self.assertEqual(config["BACKEND"], "django.core.cache.backends.filebased.FileBasedCache")
+        self.assertEqual(config["LOCATION"], "/srv/cache")
+
+        with patch.dict(os.environ, {"CACHE_BACKEND": "redis", "CACHE_LOCATION": ""}):
+            config = _cache_from_env()
+        self.assertEqual(config["BACKEND"], "django.core.cache.backends.redis.RedisCache")
+        self.assertEqual(config["LOCATION"], "redis://127.0.0.1:6379/1")
+
+        with patch.dict(os.environ, {"CACHE_BACKEND": "memcached"}), self.assertRaises(ValueError):
+            _cache_from_env()
+
+
+class SharedCacheInvalidationTests(SimpleTestCase):
+    """Сброс версии статистики в одном процессе виден другим через общий файловый кэш."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        overrides = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": self.cache_dir,
+                    "KEY_PREFIX": "advisor",
+                }
+            }
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def tearDown(self):
+        import shutil
+
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_invalidation_from_another_process(self):
+        january = get_stats_cache_token(date(2025, 1, 1), date(2025, 1, 31))
+        march = get_stats_cache_token(date(2025, 3, 1), date(2025, 3, 31))
+
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "config.settings.base",
+            "CACHE_BACKEND": "file",
+            "CACHE_LOCATION": self.cache_dir,
+            "LOG_TO_FILE": "0",
+            "LOG_TO_CONSOLE": "0",
+        }
+        subprocess.run(
+            [sys.executable, "-c", INVALIDATE_SCRIPT], cwd=Path(settings.BASE_DIR), env=env, check=True, timeout=60
+        )
+
+        self.assertEqual(get_stats_cache_token(date(2025, 1, 1), date(2025, 1, 31)), january)
+        self.assertNotEqual(get_stats_cache_token(date(2025, 3, 1), date(2025, 3, 31)), march)
+
+    def test_evicted_version_key_does_not_revive_old_entries(self):
+        cache.set(STATS_CACHE_VERSION_KEY, 1, None)
+        before = get_stats_cache_token(date(2025, 1, 1), date(2025, 1, 31))
+
+        cache.delete(STATS_CACHE_VERSION_KEY)  # вытеснен из кэша
+
+        self.assertNotEqual(get_stats_cache_token(date(2025, 1, 1), date(2025, 1, 31)), before)
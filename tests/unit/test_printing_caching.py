@@ -0,0 +1,74 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from printing.caching import get_or_compute
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_computes_once_and_caches_none(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+
+        self.assertIsNone(get_or_compute("stats_key", compute, 60))
+        self.assertIsNone(get_or_compute("stats_key", compute, 60))
+        self.assertEqual(len(calls), 1)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        results = []
+        start = threading.Barrier(5)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        def worker():
+            start.wait()
+            results.append(get_or_compute("stats_key", compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [42] * 5)
+
+    def test_serves_stale_value_while_another_worker_recomputes(self):
+        cache.set("stats_key:lock", "other-worker", 60)
+        cache.set("stats_stale", "previous", 60)
+
+        value = get_or_compute("stats_key", lambda: self.fail("не должен пересчитывать"), 60, stale_key="stats_stale")
+
+        self.assertEqual(value, "previous")
+
+    def test_recompute_refreshes_stale_value(self):
+        get_or_compute("stats_v1", lambda: "first", 60, stale_key="stats_stale")
+        get_or_compute("stats_v2", lambda: "second", 60, stale_key="stats_stale")
+        self.assertEqual(cache.get("stats_stale"), "second")
+        self.assertIsNone(cache.get("stats_v2:lock"))
+
+    def test_computes_itself_when_lock_holder_disappears(self):
+        cache.set("stats_key:lock", "crashed-worker", 60)
+        threading.Timer(0.1, cache.delete, args=["stats_key:lock"]).start()
+
+        self.assertEqual(get_or_compute("stats_key", lambda: "fresh", 60, wait=2), "fresh")
+        self.assertEqual(cache.get("stats_key"), "fresh")
+
+    def test_lock_released_after_error(self):
+        def compute():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            get_or_compute("stats_key", compute, 60)
+        self.assertIsNone(cache.get("stats_key:lock"))
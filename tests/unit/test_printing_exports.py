@@ -0,0 +1,147 @@
+import csv
+import hashlib
+import io
+import zipfile
+from datetime import datetime
+from unittest.mock import patch
+from xml.etree import ElementTree
+
+from django.test import TestCase
+from django.utils import timezone
+
+from printing.exports import EXPORT_COLUMNS, iter_export_rows, stream_csv, stream_xlsx
+from printing.models import PrintEvent
+from tests.factories import DepartmentFactory, PrinterFactory, PrintEventFactory, UserFactory
+
+NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def read_xlsx_rows(content: bytes, sheet: int = 1) -> list[list[str]]:
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        root = ElementTree.fromstring(archive.read(f"xl/worksheets/sheet{sheet}.xml"))
+    return [
+        ["".join(cell.itertext()) for cell in row.findall("x:c", NS)] for row in root.findall("x:sheetData/x:row", NS)
+    ]
+
+
+class ExportWritersTests(TestCase):
+    def setUp(self):
+        self.department = DepartmentFactory(code="IT", name="ИТ")
+        self.user = UserFactory(username="alice", fio="Алиса", department=self.department)
+        self.printer = PrinterFactory(name="HP-101")
+        self.moment = timezone.make_aware(datetime(2025, 3, 10, 12, 30))
+        PrintEventFactory(
+            user=self.user, printer=self.printer, document_name="Отчёт <Q1>\x01", pages=3, timestamp=self.moment
+        )
+
+    def test_rows_are_flat_and_local_time(self):
+        rows = list(iter_export_rows(PrintEvent.objects.all()))
+        self.assertEqual(len(rows), 1)
+        row = dict(zip([field for _header, field in EXPORT_COLUMNS], rows[0], strict=True))
+        self.assertEqual(row["timestamp"], datetime(2025, 3, 10, 12, 30))
+        self.assertEqual(row["user__department__name"], "ИТ")
+        self.assertEqual(row["printer__name"], "HP-101")
+        self.assertEqual(row["pages"], 3)
+
+    def test_csv(self):
+        content = b"".join(stream_csv(iter_export_rows(PrintEvent.objects.all()))).decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], [header for header, _field in EXPORT_COLUMNS])
+        self.assertEqual(rows[1][0], "2025-03-10 12:30:00")
+        self.assertEqual(rows[1][5], "Алиса")
+
+    def test_csv_is_streamed_in_chunks(self):
+        rows = [(datetime(2025, 1, 1), "doc", 1, "job", "u", "fio", "dep", "p", "c", "port", 1, 10)] * 100
+        with patch("printing.exports.FLUSH_SIZE", 512):
+            chunks = list(stream_csv(rows))
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual(b"".join(chunks).decode("utf-8-sig").count("\n"), 101)
+
+    def test_xlsx(self):
+        content = b"".join(stream_xlsx(iter_export_rows(PrintEvent.objects.all())))
+        rows = read_xlsx_rows(content)
+        self.assertEqual(rows[0], [header for header, _field in EXPORT_COLUMNS])
+        self.assertEqual(rows[1][1], "Отчёт <Q1>")
+        self.assertEqual(rows[1][10], "3")
+        # Дата — число Excel (дни с 1899-12-30)
+        self.assertAlmostEqual(float(rows[1][0]), 45726 + 12.5 / 24, places=5)
+
+    def test_xlsx_is_streamed_in_chunks(self):
+        # Плохо сжимаемые названия, чтобы deflate отдавал данные по ходу записи листа
+        rows = [
+            (
+                datetime(2025, 1, 1),
+                hashlib.sha256(str(n).encode()).hexdigest(),
+                n,
+                "job",
+                "u",
+                "fio",
+                "dep",
+                "p",
+                None,
+                None,
+                1,
+                10,
+            )
+            for n in range(2000)
+        ]
+        with patch("printing.exports.FLUSH_SIZE", 4096):
+            chunks = list(stream_xlsx(rows))
+        self.assertGreater(len(chunks), 2)
+
+        # Склеенные части — целый ZIP, лист — корректный XML со всеми строками
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            root = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        sheet_rows = root.findall("x:sheetData/x:row", NS)
+        self.assertEqual(len(sheet_rows), 2001)
+        self.assertEqual("".join(sheet_rows[-1].findall("x:c", NS)[1].itertext()), rows[-1][1])
+
+    def test_xlsx_splits_sheets_at_row_limit(self):
+        rows = [
+            (datetime(2025, 1, 1), f"doc{n}", n, "job", "u", "fio", "dep", "p", None, None, 1, 10) for n in range(5)
+        ]
+        with patch("printing.exports.XLSX_MAX_ROWS", 3):
+            content = b"".join(stream_xlsx(rows))
+        sheets = [read_xlsx_rows(content, sheet) for sheet in (1, 2, 3)]
+        self.assertEqual([len(sheet) for sheet in sheets], [3, 3, 2])
+        self.assertEqual([row[1] for sheet in sheets for row in sheet[1:]], [f"doc{n}" for n in range(5)])
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIn('sheetId="3"', archive.read("xl/workbook.xml").decode("utf-8"))
+
+
+class ExportViewTests(TestCase):
+    def setUp(self):
+        department = DepartmentFactory(code="IT")
+        other = DepartmentFactory(code="HR")
+        self.user = UserFactory(username="testuser", department=department)
+        self.user.set_password("testpass")
+        self.user.save()
+        self.client.login(username="testuser", password="testpass")
+        now = timezone.now()
+        PrintEventFactory(user=self.user, document_name="mine.pdf", timestamp=now)
+        PrintEventFactory(user=UserFactory(department=other), document_name="theirs.pdf", timestamp=now)
+        self.department = department
+
+    def test_csv_respects_filters(self):
+        response = self.client.get("/events/export/", {"user__department": self.department.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode("utf-8-sig")
+        self.assertIn("mine.pdf", content)
+        self.assertNotIn("theirs.pdf", content)
+
+    def test_xlsx(self):
+        response = self.client.get("/events/export/", {"export": "xlsx"})
+        self.assertEqual(response.status_code, 200)
+        rows = read_xlsx_rows(b"".join(response.streaming_content))
+        self.assertEqual(len(rows), 3)
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get("/events/export/", {"export": "pdf"}).status_code, 400)
+        self.assertEqual(self.client.get("/events/export/", {"timestamp_min": "not-a-date"}).status_code, 400)
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get("/events/export/").status_code, 302)
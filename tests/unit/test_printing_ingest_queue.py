@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+
+from printing.ingest_queue import OrderedWorkerPool, RetryScheduler, source_key
+
+
+def test_source_key_uses_mover_prefix():
+    assert source_key("/data/watch/print1__events.json") == "print1"
+    assert source_key("/data/watch/dc__users.csv") == "dc"
+    assert source_key("/data/watch/events.json") == ""
+
+
+def test_pool_keeps_order_within_source_and_runs_sources_in_parallel():
+    processed = []
+    active = set()
+    overlaps = []
+    lock = threading.Lock()
+
+    def handler(path):
+        key = source_key(path)
+        with lock:
+            if key in active:
+                overlaps.append(path)
+            if active:
+                processed.append(("parallel", path))
+            active.add(key)
+        time.sleep(0.02)
+        with lock:
+            active.discard(key)
+            processed.append(("done", path))
+
+    pool = OrderedWorkerPool(handler, workers=3)
+    paths = [f"/w/{source}__{i}.json" for i in range(4) for source in ("dc", "print1", "print2")]
+    for path in paths:
+        assert pool.submit(path)
+    assert pool.wait(timeout=10)
+    pool.shutdown()
+
+    done = [path for state, path in processed if state == "done"]
+    assert sorted(done) == sorted(paths)
+    for source in ("dc", "print1", "print2"):
+        assert [p for p in done if source_key(p) == source] == [p for p in paths if source_key(p) == source]
+    assert not overlaps
+    assert any(state == "parallel" for state, _ in processed)
+
+
+def test_pool_skips_queued_duplicates_and_survives_handler_errors():
+    release = threading.Event()
+    calls = []
+
+    def handler(path):
+        calls.append(path)
+        if path.endswith("bad.json"):
+            raise RuntimeError("boom")
+        release.wait(5)
+
+    pool = OrderedWorkerPool(handler, workers=2)
+    assert pool.submit("/w/print1__bad.json")
+    assert pool.submit("/w/print1__a.json")
+    assert not pool.submit("/w/print1__a.json")
+    assert pool.backlog in (1, 2)
+    release.set()
+    assert pool.wait(timeout=10)
+    pool.shutdown()
+
+    assert calls == ["/w/print1__bad.json", "/w/print1__a.json"]
+    assert pool.backlog == 0
+
+
+def test_retry_scheduler_resubmits_due_files_without_blocking(tmp_path):
+    path = tmp_path / "print1__events.json"
+    path.write_text("[]")
+    submitted = threading.Event()
+    retries = RetryScheduler(lambda p: submitted.set(), str(tmp_path / "state.json"))
+    retries.start()
+    try:
+        started = time.monotonic()
+        state = retries.schedule(str(path), delay=0.05, error="PermissionError: denied")
+        assert time.monotonic() - started < 0.05
+        assert state.attempts == 1
+        assert submitted.wait(5)
+    finally:
+        retries.stop()
+
+
+def test_retry_scheduler_persists_state_across_restarts(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    kept = tmp_path / "dc__users.csv"
+    kept.write_text("SamAccountName\n")
+    gone = tmp_path / "print2__gone.json"
+    gone.write_text("[]")
+
+    retries = RetryScheduler(lambda p: None, state_file)
+    retries.schedule(str(kept), delay=60, error="OperationalError: db down")
+    retries.schedule(str(kept), delay=120, error="OperationalError: db down")
+    retries.schedule(str(gone), delay=60)
+    with open(state_file, encoding="utf-8") as f:
+        assert {entry["path"] for entry in json.load(f)} == {str(kept), str(gone)}
+    gone.unlink()
+
+    restored = RetryScheduler(lambda p: None, state_file)
+    assert [state.path for state in restored.snapshot()] == [str(kept)]
+    assert restored.get(str(kept)).attempts == 2
+    assert restored.get(str(kept)).last_error == "OperationalError: db down"
+
+    restored.forget(str(kept))
+    assert str(kept) not in restored
+    with open(state_file, encoding="utf-8") as f:
+        assert json.load(f) == []
@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.models import User
+from printing.instrumentation import INGEST_STAGES, IngestStats, format_ingest_metrics, summarize_ingest_metrics
+from printing.ledger import claim_ingest, record_ingest_result
+from printing.models import IngestLedger
+from printing.services import import_print_events
+from tests.factories import DepartmentFactory, UserFactory
+
+
+class IngestStatsTests(TestCase):
+    def test_stage_accumulates_time_and_queries(self):
+        stats = IngestStats()
+        with stats.track_queries():
+            User.objects.count()  # вне этапа — не учитывается
+            with stats.stage("dedup"):
+                User.objects.count()
+                User.objects.count()
+            with stats.stage("dedup"):
+                User.objects.exists()
+        stats.rows = 10
+
+        metrics = stats.as_dict()
+
+        self.assertEqual(list(metrics["stages"]), list(INGEST_STAGES))
+        self.assertEqual(metrics["stages"]["dedup"]["queries"], 3)
+        self.assertEqual(metrics["queries"], 3)
+        self.assertGreater(metrics["stages"]["dedup"]["seconds"], 0)
+        self.assertGreater(metrics["events_per_second"], 0)
+        self.assertIn("dedup=", format_ingest_metrics(metrics))
+        self.assertIn("rows=10", format_ingest_metrics(metrics))
+
+
+class ImportMetricsTests(TestCase):
+    def setUp(self):
+        UserFactory(username="alice", department=DepartmentFactory(code="IT"))
+
+    def _event(self, job_id):
+        return {
+            "JobID": job_id,
+            "Param1": 1,
+            "Param2": f"{job_id}.pdf",
+            "Param3": "alice",
+            "Param4": "pc1",
+            "Param5": "hp-bld1-it-101-1",
+            "Param6": "usb001",
+            "Param7": 1024,
+            "Param8": 3,
+            "TimeCreated": "/Date(1741600800000)/",
+        }
+
+    def test_import_reports_stage_metrics(self):
+        with self.assertLogs("printing.services", "INFO") as logs:
+            result = import_print_events(self._event(f"job-{n}") for n in range(3))
+
+        metrics = result["metrics"]
+        self.assertEqual(result["created"], 3)
+        self.assertEqual(metrics["rows"], 3)
+        stages = metrics["stages"]
+        self.assertEqual(stages["read"]["queries"], 0)
+        for stage in ("dedup", "resolve", "insert", "rollups", "signals"):
+            self.assertGreater(stages[stage]["queries"], 0, stage)
+        self.assertEqual(metrics["queries"], sum(stage["queries"] for stage in stages.values()))
+        self.assertTrue(any("rows=3" in line and "insert=" in line for line in logs.output))
+
+    def test_duplicates_skip_write_stages(self):
+        import_print_events([self._event("job-1")])
+
+        metrics = import_print_events([self._event("job-1")])["metrics"]
+
+        self.assertEqual(metrics["stages"]["insert"]["queries"], 0)
+        self.assertEqual(metrics["stages"]["rollups"]["queries"], 0)
+
+
+class IngestStatsCommandTests(TestCase):
+    def _record(self, content_hash, metrics):
+        entry, _ = claim_ingest(
+            content_hash, 1, kind=IngestLedger.KIND_EVENTS, source=IngestLedger.SOURCE_WATCHER, file_name="x.json"
+        )
+        record_ingest_result(entry, {"created": 1, "duplicates": 0, "errors": [], "metrics": metrics})
+        return entry
+
+    def _metrics(self, insert_seconds):
+        stages = {name: {"seconds": 0.5, "queries": 1} for name in INGEST_STAGES}
+        stages["insert"] = {"seconds": insert_seconds, "queries": 2}
+        seconds = 0.5 * (len(INGEST_STAGES) - 1) + insert_seconds
+        return {"rows": 100, "seconds": seconds, "events_per_second": 100 / seconds, "queries": 8, "stages": stages}
+
+    def test_ledger_keeps_metrics_and_command_summarizes(self):
+        entry = self._record("a" * 64, self._metrics(7.0))
+        self._record("b" * 64, self._metrics(1.0))
+        entry.refresh_from_db()
+        self.assertEqual(entry.metrics["stages"]["insert"]["seconds"], 7.0)
+        self.assertAlmostEqual(entry.events_per_second, 10.0)
+
+        summary = summarize_ingest_metrics(IngestLedger.objects.values_list("metrics", flat=True))
+        self.assertEqual((summary["files"], summary["rows"]), (2, 200))
+        self.assertEqual(summary["stages"]["insert"]["share"], round(8 / 14, 4))
+
+        out = StringIO()
+        call_command("ingest_stats", stdout=out)
+        self.assertIn("Импортов: 2, событий: 200", out.getvalue())
+        self.assertRegex(out.getvalue(), r"insert\s+8\.000\s+57\.1%\s+4")
@@ -0,0 +1,88 @@
+import io
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from printing.ledger import PROCESSING_TIMEOUT, claim_ingest, hash_stream, record_ingest_failure, record_ingest_result
+from printing.models import IngestLedger
+
+
+class IngestLedgerTests(TestCase):
+    def _claim(self, content_hash="a" * 64, size=10):
+        return claim_ingest(
+            content_hash, size, kind=IngestLedger.KIND_EVENTS, source=IngestLedger.SOURCE_WATCHER, file_name="x.json"
+        )
+
+    def test_hash_stream_hashes_and_copies_in_chunks(self):
+        copy = io.BytesIO()
+        content_hash, size = hash_stream(io.BytesIO(b"[1, 2, 3]"), read_size=2, copy_to=copy)
+
+        self.assertEqual(content_hash, hash_stream(io.BytesIO(b"[1, 2, 3]"))[0])
+        self.assertEqual(size, 9)
+        self.assertEqual(copy.getvalue(), b"[1, 2, 3]")
+
+    def test_done_content_is_not_claimed_again(self):
+        entry, claimed = self._claim()
+        self.assertTrue(claimed)
+        record_ingest_result(entry, {"created": 5, "duplicates": 2, "errors": ["e"]})
+
+        again, claimed = self._claim()
+
+        self.assertFalse(claimed)
+        self.assertEqual(again.pk, entry.pk)
+        entry.refresh_from_db()
+        self.assertEqual(
+            (entry.status, entry.created_count, entry.duplicates_count, entry.errors_count, entry.skipped_count),
+            (IngestLedger.STATUS_DONE, 5, 2, 1, 1),
+        )
+        self.assertIsNotNone(entry.duration)
+
+    def test_failed_or_different_size_content_is_claimed(self):
+        entry, _ = self._claim()
+        record_ingest_failure(entry, OSError("disk"))
+
+        retry, claimed = self._claim()
+        other, other_claimed = self._claim(size=11)
+
+        self.assertTrue(claimed)
+        self.assertEqual(retry.pk, entry.pk)
+        self.assertEqual(retry.attempts, 2)
+        self.assertEqual(retry.status, IngestLedger.STATUS_PROCESSING)
+        self.assertTrue(other_claimed)
+        self.assertNotEqual(other.pk, entry.pk)
+        entry.refresh_from_db()
+        self.assertEqual(entry.last_error, "OSError: disk")
+
+    def test_processing_content_is_not_claimed_twice(self):
+        entry, claimed = self._claim()
+        self.assertTrue(claimed)
+
+        again, claimed_again = self._claim()
+
+        self.assertFalse(claimed_again)
+        self.assertEqual(again.status, IngestLedger.STATUS_PROCESSING)
+        self.assertEqual(again.attempts, 1)
+
+    def test_stale_processing_content_is_reclaimed(self):
+        entry, _ = self._claim()
+        IngestLedger.objects.filter(pk=entry.pk).update(started_at=timezone.now() - PROCESSING_TIMEOUT - timedelta(1))
+
+        with self.assertLogs("printing.ledger", "WARNING"):
+            again, claimed = self._claim()
+
+        self.assertTrue(claimed)
+        self.assertEqual(again.attempts, 2)
+
+    def test_errors_only_result_is_failed_and_retryable(self):
+        entry, _ = self._claim()
+
+        succeeded = record_ingest_result(
+            entry, {"created": 0, "updated": 0, "unchanged": 0, "errors": ["Users import failed: boom"]}
+        )
+
+        self.assertFalse(succeeded)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, IngestLedger.STATUS_FAILED)
+        self.assertEqual(entry.last_error, "Users import failed: boom")
+        self.assertTrue(self._claim()[1])
@@ -0,0 +1,60 @@
+from datetime import UTC, datetime
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from printing.loaders import _copy_value, copy_loader_available, copy_print_events
+from printing.models import PrintEvent
+from printing.services import import_print_events
+from tests.factories import PrinterFactory, PrintEventFactory, UserFactory
+
+
+class CopyValueTests(TestCase):
+    def test_copy_value_escapes_text_format(self):
+        self.assertEqual(_copy_value(None), "\\N")
+        self.assertEqual(_copy_value("a\tb\nc\\d"), "a\\tb\\nc\\\\d")
+        self.assertEqual(_copy_value(datetime(2025, 1, 2, 3, 4, tzinfo=UTC)), "2025-01-02T03:04:00+00:00")
+
+    @override_settings(PRINT_EVENTS_COPY_LOADER=False)
+    def test_loader_disabled_by_setting(self):
+        self.assertFalse(copy_loader_available())
+
+
+@skipUnless(connection.vendor == "postgresql", "COPY доступен только в PostgreSQL")
+@override_settings(PRINT_EVENTS_COPY_LOADER=True)
+class CopyPrintEventsTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.printer = PrinterFactory()
+
+    def _row(self, job_id, name="doc.pdf"):
+        return PrintEvent(
+            document_id=1,
+            document_name=name,
+            user=self.user,
+            printer=self.printer,
+            job_id=job_id,
+            timestamp=timezone.now(),
+            pages=1,
+        )
+
+    def test_copy_skips_existing_job_ids(self):
+        PrintEventFactory(job_id="job-1", user=self.user, printer=self.printer)
+
+        inserted = copy_print_events([self._row("job-1"), self._row("job-2", "tab\there")])
+
+        self.assertEqual([row.job_id for row in inserted], ["job-2"])
+        self.assertEqual(PrintEvent.objects.get(job_id="job-2").document_name, "tab\there")
+        self.assertIsNotNone(inserted[0].pk)
+
+    def test_import_uses_copy_and_reports_duplicates(self):
+        ts = f"/Date({int(timezone.now().timestamp() * 1000)})/"
+        event = {"JobID": "job-9", "Param3": self.user.username, "Param5": "hp-b1-it-1-1", "TimeCreated": ts}
+
+        first = import_print_events([event, event])
+        second = import_print_events([event])
+
+        self.assertEqual((first["created"], first["duplicates"]), (1, 1))
+        self.assertEqual((second["created"], second["duplicates"]), (0, 1))
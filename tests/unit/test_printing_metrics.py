@@ -0,0 +1,163 @@
+import json
+import tempfile
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from printing.caching import get_or_compute
+from printing.metrics import (
+    HTTP_REQUESTS,
+    INGEST_EVENTS,
+    REGISTRY,
+    STATS_CACHE,
+    Counter,
+    Histogram,
+    Registry,
+    start_metrics_server,
+)
+from printing.services import import_print_events
+from tests.factories import DepartmentFactory, UserFactory
+
+
+def _samples(metric):
+    return {tuple(json.loads(key)): value for key, value in metric.snapshot()["samples"].items()}
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.requests = Counter("test_requests_total", "Запросы", ("view",), registry=self.registry)
+        self.duration = Histogram(
+            "test_duration_seconds", "Время", ("view",), buckets=(0.1, 1.0), registry=self.registry
+        )
+
+    def test_render_counters_and_cumulative_buckets(self):
+        self.requests.inc(view="dashboard")
+        self.requests.inc(2, view="dashboard")
+        self.duration.observe(0.05, view="tree")
+        self.duration.observe(0.5, view="tree")
+        self.duration.observe(5, view="tree")
+
+        text = self.registry.collect()
+
+        self.assertIn("# TYPE test_requests_total counter", text)
+        self.assertIn('test_requests_total{view="dashboard"} 3.0', text)
+        self.assertIn('test_duration_seconds_bucket{view="tree",le="0.1"} 1', text)
+        self.assertIn('test_duration_seconds_bucket{view="tree",le="1.0"} 2', text)
+        self.assertIn('test_duration_seconds_bucket{view="tree",le="+Inf"} 3', text)
+        self.assertIn('test_duration_seconds_sum{view="tree"} 5.55', text)
+        self.assertIn('test_duration_seconds_count{view="tree"} 3', text)
+
+    def test_wrong_labels_rejected(self):
+        with self.assertRaises(ValueError):
+            self.requests.inc(status=200)
+
+    def test_collect_sums_other_process_snapshots(self):
+        self.requests.inc(view="dashboard")
+        self.duration.observe(0.5, view="tree")
+        with tempfile.TemporaryDirectory() as directory:
+            # Снимок другого воркера — те же метрики с другими значениями
+            (Path(directory) / "99999999.json").write_text(json.dumps(self.registry.snapshot()), encoding="utf-8")
+            (Path(directory) / "broken.json").write_text("{", encoding="utf-8")
+            self.registry.flush(directory, force=True)  # собственный снимок не складывается с живыми значениями
+
+            with self.assertLogs("printing.metrics", "WARNING"):
+                text = self.registry.collect(directory)
+
+        self.assertIn('test_requests_total{view="dashboard"} 2.0', text)
+        self.assertIn('test_duration_seconds_count{view="tree"} 2', text)
+
+
+class MetricsHTTPTests(TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+
+    def test_middleware_records_view_and_queries(self):
+        self.client.get(reverse("printing:health_check"))
+        self.client.get("/no-such-page/")
+
+        requests = _samples(HTTP_REQUESTS)
+        self.assertEqual(requests[("health_check", "200")], 1)
+        self.assertEqual(requests[("unmatched", "404")], 1)
+        self.assertIn('advisor_db_queries_total{view="health_check"}', REGISTRY.collect())
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_requires_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('advisor_http_requests_total{view="metrics",status="403"} 2.0', response.content.decode())
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_disabled(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+
+class CacheAndIngestMetricsTests(TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+        cache.clear()
+
+    def test_cache_results_counted_by_family(self):
+        get_or_compute("stats_v1", lambda: 1, 60, metric="dashboard_stats")
+        get_or_compute("stats_v1", lambda: 1, 60, metric="dashboard_stats")
+        get_or_compute("other", lambda: 1, 60)
+
+        samples = _samples(STATS_CACHE)
+        self.assertEqual(samples, {("dashboard_stats", "miss"): 1, ("dashboard_stats", "hit"): 1})
+
+    def test_ingest_events_counted(self):
+        UserFactory(username="alice", department=DepartmentFactory(code="IT"))
+        event = {
+            "JobID": "job-1",
+            "Param1": 1,
+            "Param2": "doc.pdf",
+            "Param3": "alice",
+            "Param4": "pc1",
+            "Param5": "hp-bld1-it-101-1",
+            "Param6": "usb001",
+            "Param7": 1024,
+            "Param8": 3,
+            "TimeCreated": "/Date(1741600800000)/",
+        }
+        import_print_events([event])
+        import_print_events([event, {"JobID": "job-2"}])
+
+        samples = _samples(INGEST_EVENTS)
+        self.assertEqual(samples[("created",)], 1)
+        self.assertEqual(samples[("duplicate",)], 1)
+        self.assertEqual(samples[("error",)], 1)
+
+
+class MetricsServerTests(SimpleTestCase):
+    def _get(self, port, path):
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+            return response.status, response.read().decode()
+
+    def test_serves_metrics_and_health(self):
+        healthy = [True]
+        server = start_metrics_server(0, "127.0.0.1", health=lambda: healthy[0])
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        port = server.server_address[1]
+
+        status, body = self._get(port, "/metrics")
+        self.assertEqual(status, 200)
+        self.assertIn("# TYPE advisor_watcher_files_total counter", body)
+        self.assertEqual(self._get(port, "/healthz"), (200, "ok\n"))
+
+        healthy[0] = False
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self._get(port, "/healthz")
+        self.assertEqual(ctx.exception.code, 503)
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            self._get(port, "/other")
+        self.assertEqual(ctx.exception.code, 404)
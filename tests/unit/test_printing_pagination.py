@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from printing.models import PrintEvent
+from printing.pagination import (
+    EstimatedCountPaginator,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    estimate_count,
+    keyset_paginate,
+)
+from printing.views import PrintEventsView
+from tests.factories import PrinterFactory, PrintEventFactory, UserFactory
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory(username="pager")
+        self.user.set_password("testpass")
+        self.user.save()
+        printer = PrinterFactory()
+        now = timezone.now().replace(microsecond=0)
+        # Пары событий с одинаковым временем — порядок внутри пары задаёт id
+        for i in range(7):
+            for _ in range(2):
+                PrintEventFactory(user=self.user, printer=printer, timestamp=now - timedelta(minutes=i))
+        self.expected = list(PrintEvent.objects.order_by("-timestamp", "-pk").values_list("pk", flat=True))
+
+    def test_cursor_roundtrip(self):
+        event = PrintEvent.objects.first()
+        self.assertEqual(decode_cursor(encode_cursor(event.timestamp, event.pk)), (event.timestamp, event.pk))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+    def test_forward_pages_cover_all_rows_once(self):
+        seen: list[int] = []
+        page = keyset_paginate(PrintEvent.objects.all(), 4)
+        self.assertFalse(page.has_previous)
+        while True:
+            seen.extend(event.pk for event in page)
+            if not page.has_next:
+                break
+            page = keyset_paginate(PrintEvent.objects.all(), 4, after=page.next_cursor)
+            self.assertTrue(page.has_previous)
+        self.assertEqual(seen, self.expected)
+
+    def test_backward_page_returns_preceding_rows(self):
+        second = keyset_paginate(
+            PrintEvent.objects.all(), 5, after=keyset_paginate(PrintEvent.objects.all(), 5).next_cursor
+        )
+        first = keyset_paginate(PrintEvent.objects.all(), 5, before=second.previous_cursor)
+        self.assertEqual([event.pk for event in first], self.expected[:5])
+        self.assertFalse(first.has_previous)
+        self.assertTrue(first.has_next)
+
+    def test_estimate_count_small_tables_are_exact(self):
+        self.assertEqual(estimate_count(PrintEvent.objects.all()), len(self.expected))
+        self.assertEqual(EstimatedCountPaginator(PrintEvent.objects.all(), 5).num_pages, 3)
+
+    @override_settings(PRINT_EVENTS_PAGINATION="keyset", PRINT_EVENTS_COUNT="estimate")
+    @patch.object(PrintEventsView, "paginate_by", 5)
+    def test_events_view_keyset_mode(self):
+        client = Client()
+        client.login(username="pager", password="testpass")
+        params = {"timestamp_min": "2000-01-01", "timestamp_max": "2100-01-01"}
+        response = client.get("/events/", params)
+        self.assertEqual(response.status_code, 200)
+        page = response.context["keyset_page"]
+        self.assertEqual(page.count, len(self.expected))
+        self.assertEqual([row.record.pk for row in response.context["table"].rows], self.expected[:5])
+        self.assertIn("after=", page.next_url)
+        self.assertContains(response, "Старее")
+
+        response = client.get("/events/", {**params, "after": page.next_cursor})
+        self.assertEqual([row.record.pk for row in response.context["table"].rows], self.expected[5:10])
+
+    @override_settings(PRINT_EVENTS_PAGINATION="keyset")
+    def test_events_view_keyset_invalid_cursor_falls_back_to_first_page(self):
+        client = Client()
+        client.login(username="pager", password="testpass")
+        response = client.get(
+            "/events/", {"timestamp_min": "2000-01-01", "timestamp_max": "2100-01-01", "after": "garbage"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["keyset_page"].has_previous)
+
+    def test_estimate_uses_planner_on_postgres(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("Оценка по EXPLAIN доступна только на PostgreSQL")
+        with self.assertNumQueries(2):  # EXPLAIN + точный COUNT для малой оценки
+            estimate_count(PrintEvent.objects.filter(pages__gt=0))
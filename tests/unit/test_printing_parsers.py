@@ -0,0 +1,45 @@
+import io
+import json
+
+import pytest
+
+from printing.parsers import JSONArrayExpectedError, iter_json_array
+
+
+def _events(n):
+    return [{"JobID": f"job-{i}", "Param2": f"документ {i}.pdf", "Param8": i} for i in range(n)]
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 4096])
+def test_iter_json_array_yields_all_items(read_size):
+    events = _events(50)
+    stream = io.BytesIO(json.dumps(events, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    assert list(iter_json_array(stream, read_size=read_size)) == events
+
+
+def test_iter_json_array_handles_bom_text_streams_and_scalars():
+    payload = '\ufeff[1, 23456, true, null, "x"]'.encode()
+    assert list(iter_json_array(io.BytesIO(payload), read_size=2)) == [1, 23456, True, None, "x"]
+    assert list(iter_json_array(io.StringIO("[ ]"))) == []
+
+
+def test_iter_json_array_rejects_non_array_eagerly():
+    with pytest.raises(JSONArrayExpectedError):
+        iter_json_array(io.BytesIO(b'{"test": "data"}'))
+    with pytest.raises(json.JSONDecodeError):
+        iter_json_array(io.BytesIO(b"   "))
+
+
+@pytest.mark.parametrize("payload", [b'[{"a": 1} {"b": 2}]', b'[{"a": 1}, {"b": ', b"[1, 2] 3", b"[{'a': 1}]"])
+def test_iter_json_array_raises_on_malformed_input(payload):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.BytesIO(payload), read_size=3))
+
+
+def test_iter_json_array_is_lazy():
+    stream = io.BytesIO(json.dumps(_events(1000)).encode("utf-8"))
+    items = iter_json_array(stream, read_size=1024)
+
+    assert next(items)["JobID"] == "job-0"
+    assert stream.tell() < 4096
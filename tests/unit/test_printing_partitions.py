@@ -0,0 +1,123 @@
+from datetime import date, datetime
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from printing.models import PrintEvent
+from printing.partitions import (
+    DEFAULT_PARTITION,
+    PartitioningError,
+    add_months,
+    convert_to_partitioned,
+    detach_partitions,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    partition_name,
+)
+from printing.services import get_statistics_data
+from tests.factories import PrintEventFactory
+
+
+def aware(year, month, day):
+    return timezone.make_aware(datetime(year, month, day, 12, 0))
+
+
+class PartitionHelpersTests(TestCase):
+    def test_add_months(self):
+        self.assertEqual(add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+
+    def test_not_partitioned_by_default(self):
+        self.assertFalse(is_partitioned())
+        self.assertEqual(ensure_partitions(), [])
+
+
+class PrintEventPartitioningTests(TestCase):
+    def setUp(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("Секционирование поддерживается только на PostgreSQL")
+        self.old = PrintEventFactory(timestamp=aware(2024, 11, 5), pages=4)
+        self.recent = PrintEventFactory(timestamp=timezone.now(), pages=2)
+
+    def test_convert_keeps_rows_and_creates_monthly_partitions(self):
+        created = convert_to_partitioned(months_ahead=2)
+
+        self.assertTrue(is_partitioned())
+        self.assertEqual(created[0], partition_name(date(2024, 11, 1)))
+        self.assertEqual(created[-1], partition_name(add_months(timezone.localdate().replace(day=1), 2)))
+        self.assertIn(DEFAULT_PARTITION, [name for name, _month in list_partitions()])
+        self.assertEqual(set(PrintEvent.objects.values_list("pk", flat=True)), {self.old.pk, self.recent.pk})
+        # Новые строки получают id из последовательности после перенесённых
+        event = PrintEventFactory(timestamp=timezone.now())
+        self.assertGreater(event.pk, self.recent.pk)
+        with self.assertRaises(PartitioningError):
+            convert_to_partitioned()
+
+    @override_settings(PRINT_EVENTS_PARTITIONING=True, PRINT_EVENTS_PARTITIONS_AHEAD=1)
+    def test_migration_partitions_like_convert(self):
+        migration = import_module("printing.migrations.0009_printevent_partitioning")
+        with connection.schema_editor() as schema_editor:
+            migration.partition_print_events(apps, schema_editor)
+            migration.partition_print_events(apps, schema_editor)  # повторный запуск ничего не делает
+
+        self.assertTrue(is_partitioned())
+        months = [month for _name, month in list_partitions() if month is not None]
+        current = timezone.localdate().replace(day=1)
+        self.assertEqual((months[0], months[-1]), (date(2024, 11, 1), add_months(current, 1)))
+        self.assertEqual(PrintEvent.objects.count(), 2)
+        self.assertGreater(PrintEventFactory(timestamp=timezone.now()).pk, self.recent.pk)
+        self.assertIn(partition_name(add_months(current, 2)), ensure_partitions(months_ahead=2))
+
+    def test_date_range_query_is_pruned(self):
+        convert_to_partitioned(months_ahead=0)
+        queryset = PrintEvent.objects.filter(timestamp__gte=aware(2024, 11, 1), timestamp__lte=aware(2024, 11, 30))
+        plan = queryset.explain()
+        self.assertIn(partition_name(date(2024, 11, 1)), plan)
+        self.assertNotIn(partition_name(timezone.localdate().replace(day=1)), plan)
+
+    def test_ensure_moves_rows_out_of_default_partition(self):
+        convert_to_partitioned(months_ahead=0)
+        far = PrintEventFactory(timestamp=aware(2031, 6, 1))
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        created = ensure_partitions(months_ahead=1)
+
+        self.assertIn(partition_name(date(2031, 6, 1)), created)
+        self.assertIn(partition_name(add_months(timezone.localdate().replace(day=1), 1)), created)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertTrue(PrintEvent.objects.filter(pk=far.pk).exists())
+
+    def test_detach_archives_old_months(self):
+        convert_to_partitioned(months_ahead=0)
+        start, end = aware(2024, 11, 1), aware(2024, 11, 30)
+        self.assertEqual(get_statistics_data(start, end)["department_stats"][0].total_pages, 4)
+
+        detached = detach_partitions(date(2025, 1, 1))
+
+        self.assertEqual(detached[0], partition_name(date(2024, 11, 1)))
+        self.assertFalse(PrintEvent.objects.filter(pk=self.old.pk).exists())
+        self.assertTrue(PrintEvent.objects.filter(pk=self.recent.pk).exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {partition_name(date(2024, 11, 1))}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("print_event_partitions", "convert", "--ahead", "0", stdout=out)
+        call_command("print_event_partitions", "detach", "--before", "2025-01", "--drop", stdout=out)
+        call_command("print_event_partitions", "status", stdout=out)
+        output = out.getvalue()
+        self.assertIn("Удалено секций: 2", output)
+        status = output.split("Секций:")[1]
+        self.assertIn(partition_name(date(2025, 1, 1)), status)
+        self.assertNotIn(partition_name(date(2024, 11, 1)), status)
@@ -0,0 +1,111 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from printing.querylog import QUERY_LOG, QueryLog, QueryStat, fingerprint, log_queries, top_queries
+from tests.factories import UserFactory
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_literals_and_value_lists_stripped(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'O''Brien' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s), (%s, %s) RETURNING "t"."id"'),
+            'INSERT INTO "t" ("a", "b") VALUES (...) RETURNING "t"."id"',
+        )
+
+    def test_identifiers_with_digits_kept(self):
+        self.assertEqual(
+            fingerprint("SELECT  COUNT(*)\n FROM printing_printevent_2025_01 WHERE pages > 10.5"),
+            "SELECT COUNT(*) FROM printing_printevent_2025_01 WHERE pages > ?",
+        )
+
+    def test_same_shape_same_fingerprint(self):
+        self.assertEqual(fingerprint("SELECT 1 WHERE id IN (%s)"), fingerprint("SELECT 2 WHERE id IN (%s, %s)"))
+
+
+class QueryLogTests(TestCase):
+    def test_p95_and_top(self):
+        stat = QueryStat("q", "v")
+        stat.samples.extend(n / 100 for n in range(1, 101))
+        self.assertEqual(stat.p95, 0.95)
+        fast, slow = QueryStat("a", "v", count=10, total=1.0), QueryStat("b", "v", count=1, total=2.0)
+        self.assertEqual(top_queries([fast, slow], "total", 1), [slow])
+        self.assertEqual(top_queries([fast, slow], "count", 1), [fast])
+        with self.assertRaises(ValueError):
+            top_queries([fast], "pages")
+
+    def test_records_queries_and_logs_slow_with_call_site(self):
+        query_log = QueryLog()
+        with (
+            self.assertLogs("printing.querylog", "WARNING") as logs,
+            log_queries("report", threshold_ms=0, query_log=query_log),
+        ):
+            User.objects.filter(username="a").count()
+            User.objects.filter(username="b").count()
+
+        (stat,) = query_log.collect()
+        self.assertEqual((stat.view, stat.count, stat.slow), ("report", 2, 2))
+        self.assertIn("tests/unit/test_printing_querylog.py", stat.site)
+        self.assertIn("test_records_queries_and_logs_slow_with_call_site", logs.output[0])
+        self.assertIn("[report]", logs.output[0])
+
+    def test_fast_queries_not_logged(self):
+        query_log = QueryLog()
+        with (
+            self.assertNoLogs("printing.querylog", "WARNING"),
+            log_queries("report", threshold_ms=60_000, query_log=query_log),
+        ):
+            User.objects.count()
+        self.assertEqual(query_log.collect()[0].slow, 0)
+
+    def test_collect_merges_process_snapshots(self):
+        query_log = QueryLog()
+        query_log.record("statistics", "SELECT 1", 0.5)
+        with tempfile.TemporaryDirectory() as directory:
+            (Path(directory) / "99999999.json").write_text(json.dumps(query_log.snapshot()), encoding="utf-8")
+
+            (stat,) = query_log.collect(directory)
+            query_log.reset(directory)
+            self.assertEqual(list(Path(directory).iterdir()), [])
+
+        self.assertEqual((stat.count, stat.total, len(stat.samples)), (2, 1.0, 2))
+        self.assertEqual(query_log.collect(), [])
+
+
+@override_settings(SLOW_QUERY_LOG=True, SLOW_QUERY_THRESHOLD_MS=60_000)
+class SlowQueryReportTests(TestCase):
+    def setUp(self):
+        QUERY_LOG.clear()
+        self.addCleanup(QUERY_LOG.clear)
+
+    def test_middleware_labels_queries_by_view(self):
+        self.client.get(reverse("printing:health_check"))
+
+        views = {stat.view for stat in QUERY_LOG.collect()}
+        self.assertIn("health_check", views)
+
+    def test_report_for_staff_only(self):
+        url = reverse("printing:slow_queries")
+        self.client.force_login(UserFactory(is_staff=False))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(UserFactory(is_staff=True))
+        self.client.get(reverse("printing:health_check"))
+        response = self.client.get(url, {"order": "count", "view": "health_check"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["order"], "count")
+        self.assertTrue(response.context["rows"])
+        self.assertTrue(all(row.view == "health_check" for row in response.context["rows"]))
+        self.assertContains(response, "SELECT ?")
+
+        self.assertRedirects(self.client.post(url), url)
+        self.assertNotIn("health_check", {stat.view for stat in QUERY_LOG.collect()})
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from printing.models import Building, Department, Printer
+from printing.resolvers import DimensionResolver, get_dimension_cache_version
+from tests.factories import DepartmentFactory, UserFactory
+
+
+class DimensionResolverTests(TestCase):
+    """Тесты кэширующего резолвера справочников."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_memoized_keys_do_not_hit_database(self):
+        DepartmentFactory(code="IT")
+        resolver = DimensionResolver()
+
+        first = resolver.departments(["it", "HR"])
+        with self.assertNumQueries(0):
+            second = resolver.departments(["IT", "hr"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(Department.objects.filter(code="HR").count(), 1)
+        self.assertEqual((resolver.hits, resolver.misses), (2, 2))
+
+    def test_printers_resolved_case_insensitively_by_room(self):
+        resolver = DimensionResolver()
+        building_id = resolver.buildings(["bld1"])["bld1"]
+        department_id = resolver.departments(["IT"])["it"]
+        model_id = resolver.printer_models(["hp"])["hp"]
+        key = (building_id, "101a", 1)
+        candidate = Printer(
+            name="hp-bld1-it-101A-1",
+            model_id=model_id,
+            department_id=department_id,
+            building_id=building_id,
+            room_number="101A",
+            printer_index=1,
+        )
+
+        pks = resolver.printers({key: candidate})
+        fresh = DimensionResolver().printers({key: candidate})
+
+        self.assertEqual(pks, fresh)
+        self.assertEqual(Printer.objects.count(), 1)
+
+    def test_entries_bounded_by_max_entries(self):
+        resolver = DimensionResolver(max_entries=2)
+
+        resolver.buildings(["a", "b", "c"])
+
+        with self.assertNumQueries(0):
+            resolver.buildings(["b", "c"])
+        self.assertEqual(Building.objects.count(), 3)
+        self.assertEqual(len(resolver._memo["buildings"]), 2)
+
+    def test_admin_edit_invalidates_resolver(self):
+        department = DepartmentFactory(code="IT")
+        resolver = DimensionResolver()
+        resolver.departments(["IT"])
+
+        department.code = "ITX"
+        department.save()
+        resolver.refresh()
+
+        self.assertEqual(resolver._memo, {})
+
+    def test_non_key_updates_do_not_invalidate(self):
+        user = UserFactory(username="ivanov")
+        version = get_dimension_cache_version()
+
+        user.save(update_fields=["last_login"])
+
+        self.assertEqual(get_dimension_cache_version(), version)
+
+    def test_auto_created_users_reported(self):
+        errors = []
+
+        pks = DimensionResolver().users(["petrov"], errors)
+
+        self.assertIn("petrov", pks)
+        self.assertEqual(errors, ["User 'petrov' was automatically created (missing FIO and department)"])
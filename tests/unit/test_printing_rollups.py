@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from printing.models import PrintDailyRollup, PrintEvent
+from printing.rollups import local_date
+from printing.services import get_dashboard_stats, get_statistics_data, import_print_events
+from tests.factories import DepartmentFactory, PrinterFactory, PrintEventFactory, UserFactory
+
+
+class PrintDailyRollupTests(TestCase):
+    def setUp(self):
+        self.it = DepartmentFactory(code="IT")
+        self.hr = DepartmentFactory(code="HR")
+        self.alice = UserFactory(username="alice", department=self.it)
+        self.bob = UserFactory(username="bob", department=self.hr)
+        self.printer = PrinterFactory()
+        self.day = timezone.make_aware(datetime(2025, 3, 10, 12, 0))
+
+    def _event(self, job_id, username, when, pages=2):
+        return {
+            "JobID": job_id,
+            "Param1": 1,
+            "Param2": f"{job_id}.pdf",
+            "Param3": username,
+            "Param5": "hp-bld1-it-101-1",
+            "Param7": 100,
+            "Param8": pages,
+            "TimeCreated": f"/Date({int(when.timestamp() * 1000)})/",
+        }
+
+    def _assert_rollups_match_events(self):
+        expected = {(local_date(e.timestamp), e.user_id, e.printer_id) for e in PrintEvent.objects.all()}
+        self.assertEqual(set(PrintDailyRollup.objects.values_list("date", "user_id", "printer_id")), expected)
+        totals = PrintDailyRollup.objects.aggregate(pages=Sum("pages"), documents=Sum("documents"))
+        raw = PrintEvent.objects.aggregate(pages=Sum("pages"), documents=Count("id"))
+        self.assertEqual(totals, raw)
+
+    def test_import_maintains_rollups_incrementally(self):
+        import_print_events(
+            [
+                self._event("a1", "alice", self.day, pages=3),
+                self._event("a2", "alice", self.day + timedelta(hours=1), pages=4),
+                self._event("b1", "bob", self.day + timedelta(days=1)),
+            ]
+        )
+        import_print_events([self._event("a3", "alice", self.day, pages=5), self._event("a1", "alice", self.day)])
+
+        rollup = PrintDailyRollup.objects.get(user=self.alice, date=local_date(self.day))
+        self.assertEqual((rollup.pages, rollup.documents, rollup.byte_size), (12, 3, 300))
+        self.assertEqual(rollup.department, self.it)
+        self._assert_rollups_match_events()
+
+    def test_statistics_read_from_rollups(self):
+        import_print_events(
+            [
+                self._event("a1", "alice", self.day, pages=10),
+                self._event("b1", "bob", self.day, pages=4),
+                self._event("b2", "bob", self.day + timedelta(days=40), pages=100),
+            ]
+        )
+
+        data = get_statistics_data(self.day - timedelta(hours=12), self.day + timedelta(days=1))
+
+        self.assertEqual(
+            [(d.code, d.total_pages, d.total_documents) for d in data["department_stats"]],
+            [("IT", 10, 1), ("HR", 4, 1)],
+        )
+        self.assertEqual([(u.username, u.total_pages) for u in data["user_stats"]], [("alice", 10), ("bob", 4)])
+
+    def test_dashboard_stats_use_rollups(self):
+        PrintEventFactory(user=self.alice, printer=self.printer, pages=7)
+        PrintEventFactory(user=self.bob, printer=self.printer, pages=3, timestamp=timezone.now() - timedelta(days=60))
+
+        stats = get_dashboard_stats(days=30)
+
+        self.assertEqual((stats["total_pages"], stats["total_documents"]), (7, 1))
+        self.assertEqual([row["pages"] for row in stats["daily_stats"]], [7])
+
+    def test_user_department_change_moves_rollups(self):
+        PrintEventFactory(user=self.alice, printer=self.printer, timestamp=self.day)
+
+        self.alice.department = self.hr
+        self.alice.save()
+
+        self.assertEqual(PrintDailyRollup.objects.get(user=self.alice).department, self.hr)
+
+    def test_rebuild_command_recreates_rollups(self):
+        for offset in (0, 1, 35):
+            PrintEventFactory(user=self.alice, printer=self.printer, timestamp=self.day + timedelta(days=offset))
+        PrintEventFactory(user=self.bob, printer=self.printer, timestamp=self.day)
+        PrintDailyRollup.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_print_rollups", stdout=out)
+
+        self.assertIn("4 строк", out.getvalue())
+        self._assert_rollups_match_events()
+
+        PrintDailyRollup.objects.update(pages=0)
+        call_command("rebuild_print_rollups", "--start", "2025-03-01", "--end", "2025-03-31", stdout=StringIO())
+        self.assertFalse(PrintDailyRollup.objects.filter(date__month=3, pages=0).exists())
+        self.assertTrue(PrintDailyRollup.objects.filter(date__month=4, pages=0).exists())
+
+    def test_editing_event_refreshes_old_and_new_rollups(self):
+        event = PrintEventFactory(user=self.alice, printer=self.printer, timestamp=self.day, pages=3)
+        PrintEventFactory(user=self.alice, printer=self.printer, timestamp=self.day, pages=4)
+
+        event.pages = 10
+        event.save()
+        self.assertEqual(PrintDailyRollup.objects.get(user=self.alice, date=local_date(self.day)).pages, 14)
+
+        # Перенос на другой день и другому пользователю (правка в админке или import-export)
+        event.user = self.bob
+        event.timestamp = self.day + timedelta(days=1)
+        event.save()
+
+        self.assertEqual(PrintDailyRollup.objects.get(user=self.alice, date=local_date(self.day)).pages, 4)
+        moved = PrintDailyRollup.objects.get(user=self.bob)
+        self.assertEqual((moved.date, moved.pages, moved.department), (local_date(event.timestamp), 10, self.hr))
+        self._assert_rollups_match_events()
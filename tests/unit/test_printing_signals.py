@@ -70,8 +70,8 @@ class PrintingSignalsTests(TestCase):
         self.assertIsNone(cache.get(department_cache_key))
         self.assertIsNone(cache.get("total_print_stats"))
 
-    def test_update_statistics_not_created(self):
-        """Тест, что сигнал не срабатывает при обновлении (не создании)."""
+    def test_update_statistics_on_edit(self):
+        """Тест, что сигнал сбрасывает кэш и при изменении события (админка, import-export)."""
         # Создаем событие печати
         event = PrintEventFactory(user=self.user, printer=self.printer, pages=5, byte_size=1024)
 
@@ -82,9 +82,9 @@ class PrintingSignalsTests(TestCase):
         # Вызываем функцию сигнала с created=False
         update_statistics(sender=PrintEvent, instance=event, created=False)
 
-        # Проверяем, что кэш НЕ был очищен
-        self.assertEqual(cache.get("department_stats_top"), "test_data")
-        self.assertEqual(cache.get("user_stats_top10"), "test_data")
+        # Проверяем, что кэш был очищен
+        self.assertIsNone(cache.get("department_stats_top"))
+        self.assertIsNone(cache.get("user_stats_top10"))
 
     def test_update_statistics_cache_keys(self):
         """Тест очистки всех ключей кэша."""
@@ -0,0 +1,129 @@
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from printing.models import PrintDailyRollup, Printer, PrintEvent
+from printing.services import import_print_events, import_users_from_csv_stream
+from printing.synthetic import SyntheticDataError, generate_dimensions, iter_synthetic_events, load_print_events
+
+
+class SyntheticEventsTests(TestCase):
+    def setUp(self):
+        self.dims = generate_dimensions(departments=3, buildings=2, printers=9, users=30, save=False)
+        self.end = timezone.make_aware(datetime(2025, 3, 14, 18, 0))  # пятница
+
+    def test_events_are_deterministic_and_realistic(self):
+        events = list(iter_synthetic_events(self.dims, 2000, end=self.end, days=28))
+        again = list(iter_synthetic_events(self.dims, 2000, end=self.end, days=28))
+
+        self.assertEqual(events, again)
+        self.assertEqual([event.number for event in events[:3]], [0, 1, 2])
+        local_times = [timezone.localtime(event.timestamp) for event in events]
+        self.assertTrue(all(t <= self.end for t in local_times))
+        self.assertLess(sum(t.weekday() >= 5 for t in local_times), len(events) * 0.1)
+        self.assertGreater(sum(8 <= t.hour < 19 for t in local_times), len(events) * 0.8)
+        self.assertTrue(all(1 <= event.pages <= 500 for event in events))
+        # Ципф: самый активный пользователь печатает заметно больше среднего
+        by_user = [sum(event.user == n for event in events) for n in range(len(self.dims.users))]
+        self.assertGreater(by_user[0], 3 * len(events) / len(by_user))
+        shifted = next(iter_synthetic_events(self.dims, 1, start_index=2000, end=self.end, days=28))
+        self.assertEqual(shifted.number, 2000)
+
+    def test_printer_names_follow_import_format(self):
+        for printer in self.dims.printers:
+            model, building, department, room, index = printer.name.split("-")
+            self.assertEqual(model, printer.model.code)
+            self.assertEqual(building, printer.building.code)
+            self.assertEqual(department.upper(), printer.department.code)
+            self.assertEqual((room, int(index)), (printer.room_number, printer.printer_index))
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(SyntheticDataError):
+            generate_dimensions(prefix="bad-prefix", save=False)
+        with self.assertRaises(SyntheticDataError):
+            next(iter_synthetic_events(self.dims, 1, days=0))
+
+
+class LoadSyntheticEventsTests(TestCase):
+    def test_load_writes_events_and_rollups(self):
+        dims = generate_dimensions(departments=2, buildings=1, printers=4, users=10)
+
+        created = load_print_events(dims, 500, batch_size=200)
+
+        self.assertEqual(created, 500)
+        self.assertEqual(PrintEvent.objects.count(), 500)
+        self.assertEqual(
+            PrintDailyRollup.objects.aggregate(total=Sum("pages"))["total"],
+            PrintEvent.objects.aggregate(total=Sum("pages"))["total"],
+        )
+        # Повторный запуск с тем же start_index не дублирует задания
+        self.assertEqual(load_print_events(dims, 100), 0)
+        self.assertEqual(load_print_events(dims, 100, start_index=500), 100)
+
+    def test_command_loads_database(self):
+        out = StringIO()
+        call_command(
+            "generate_print_events",
+            "--events",
+            "300",
+            "--users",
+            "12",
+            "--printers",
+            "5",
+            "--batch-size",
+            "100",
+            stdout=out,
+        )
+
+        self.assertEqual(PrintEvent.objects.count(), 300)
+        self.assertEqual(User.objects.filter(username__startswith="syn.").count(), 12)
+        self.assertIn("Создано событий: 300", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("generate_print_events", "--events", "10", stdout=StringIO())
+
+
+class SyntheticFilesTests(TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_files_round_trip_through_import(self):
+        call_command(
+            "generate_print_events",
+            "--events",
+            "250",
+            "--users",
+            "15",
+            "--printers",
+            "6",
+            "--per-file",
+            "100",
+            "--output-dir",
+            str(self.temp_dir),
+            stdout=StringIO(),
+        )
+        self.assertFalse(PrintEvent.objects.exists())
+        event_files = sorted(self.temp_dir.glob("syn_events_*.json"))
+        self.assertEqual([path.name for path in event_files], [f"syn_events_0000{n}.json" for n in (1, 2, 3)])
+
+        with (self.temp_dir / "syn_users.csv").open("rb") as f:
+            self.assertEqual(import_users_from_csv_stream(f)["errors"], [])
+        for path in event_files:
+            result = import_print_events(json.loads(path.read_text(encoding="utf-8")))
+            self.assertEqual(result["errors"], [])
+
+        self.assertEqual(PrintEvent.objects.count(), 250)
+        self.assertEqual(Printer.objects.count(), 6)
+        self.assertEqual(User.objects.filter(username__startswith="syn.").count(), 15)
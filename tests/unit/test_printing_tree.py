@@ -0,0 +1,147 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from printing.models import PrintEvent
+from printing.services import build_print_tree
+from printing.tree import fetch_tree_rows, tree_node_children
+from tests.factories import (
+    DepartmentFactory,
+    PrinterFactory,
+    PrinterModelFactory,
+    PrintEventFactory,
+    UserFactory,
+)
+
+
+class PrintTreeTests(TestCase):
+    def setUp(self):
+        self.day = timezone.make_aware(datetime(2025, 3, 10, 12, 0))
+        self.start = self.day - timedelta(days=1)
+        self.end = self.day + timedelta(days=1)
+        it = DepartmentFactory(code="IT", name="ИТ")
+        hr = DepartmentFactory(code="HR", name="Кадры")
+        model = PrinterModelFactory(code="HP400")
+        self.it_printer = PrinterFactory(model=model, department=it, room_number="101", printer_index=1)
+        self.hr_printer = PrinterFactory(model=model, department=hr, room_number="202", printer_index=2)
+        self.alice = alice = UserFactory(username="alice", fio="Алиса", department=it)
+        bob = UserFactory(username="bob", fio="Борис", department=hr)
+
+        for pages, user, printer, doc in [
+            (5, alice, self.it_printer, "report.pdf"),
+            (7, alice, self.it_printer, "report.pdf"),
+            (1, alice, self.it_printer, "memo.docx"),
+            (2, bob, self.it_printer, "x" * 100),
+            (30, bob, self.hr_printer, "payroll.xlsx"),
+        ]:
+            PrintEventFactory(user=user, printer=printer, document_name=doc, pages=pages, timestamp=self.day)
+        # Событие вне периода не учитывается
+        PrintEventFactory(user=alice, printer=self.it_printer, pages=100, timestamp=self.day - timedelta(days=40))
+
+    def test_tree_levels_totals_and_order(self):
+        data = build_print_tree(self.start, self.end)
+
+        self.assertEqual(data["total_pages"], 45)
+        self.assertEqual(list(data["tree"]), ["Кадры", "ИТ"])
+        it = data["tree"]["ИТ"]
+        self.assertEqual((it["total"], it["percent"]), (15, 33.3))
+        printer = it["printers"]["HP400-101-1"]
+        self.assertEqual((printer["total"], printer["percent"]), (15, 100.0))
+        self.assertEqual(list(printer["users"]), ["Алиса", "Борис"])
+        alice = printer["users"]["Алиса"]
+        self.assertEqual((alice["total"], alice["percent"]), (13, 86.7))
+        self.assertEqual(list(alice["docs"]), ["report.pdf", "memo.docx"])
+        self.assertEqual(alice["docs"]["report.pdf"][0]["pages"], 12)
+        self.assertEqual(alice["docs"]["report.pdf"][0]["timestamp"], self.day)
+        bob_docs = printer["users"]["Борис"]["docs"]
+        self.assertEqual(list(bob_docs), ["x" * 79 + "…"])
+
+    def test_level_totals_match_raw_events(self):
+        expected = defaultdict(int)
+        for event in PrintEvent.objects.filter(timestamp__gte=self.start, timestamp__lte=self.end).select_related(
+            "printer__department", "user"
+        ):
+            expected[(1, event.printer.department.name)] += event.pages
+            expected[(3, event.printer.department.name, event.user.fio)] += event.pages
+
+        rows = fetch_tree_rows(self.start, self.end)
+
+        actual = {(1, row.department): row.pages for row in rows if row.level == 1}
+        actual.update({(3, row.department, row.fio): row.pages for row in rows if row.level == 3})
+        self.assertEqual(actual, dict(expected))
+        self.assertEqual([row.level for row in rows], sorted(row.level for row in rows))
+
+    def test_postgres_uses_single_rollup_query(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("GROUP BY ROLLUP используется только на PostgreSQL")
+        with CaptureQueriesContext(connection) as queries:
+            fetch_tree_rows(self.start, self.end)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("ROLLUP", queries[0]["sql"])
+
+    def test_empty_period(self):
+        data = build_print_tree(self.end + timedelta(days=10), self.end + timedelta(days=11))
+        self.assertEqual(data, {"tree": {}, "total_pages": 0, "other": None})
+
+    def test_top_k_keeps_largest_children_and_other_bucket(self):
+        data = build_print_tree(self.start, self.end, top_k=1)
+
+        self.assertEqual(data["total_pages"], 45)
+        self.assertEqual(list(data["tree"]), ["Кадры"])
+        self.assertEqual(data["other"], {"count": 1, "total": 15, "percent": 33.3})
+        hr = data["tree"]["Кадры"]
+        self.assertIsNone(hr["other"])
+        self.assertEqual(list(hr["printers"]["HP400-202-2"]["users"]), ["Борис"])
+
+        data = build_print_tree(self.start, self.end, top_k=2)
+        alice = data["tree"]["ИТ"]["printers"]["HP400-101-1"]["users"]["Алиса"]
+        self.assertEqual(list(alice["docs"]), ["report.pdf", "memo.docx"])
+        self.assertIsNone(alice["other"])
+
+        PrintEventFactory(user=self.alice, printer=self.it_printer, document_name="a.txt", pages=1, timestamp=self.day)
+        data = build_print_tree(self.start, self.end, top_k=2)
+        alice = data["tree"]["ИТ"]["printers"]["HP400-101-1"]["users"]["Алиса"]
+        self.assertEqual(list(alice["docs"]), ["report.pdf", "a.txt"])
+        self.assertEqual(alice["other"], {"count": 1, "total": 1, "percent": 7.1})
+
+    def test_top_k_rows_are_bounded_per_parent(self):
+        rows = fetch_tree_rows(self.start, self.end, top_k=1)
+        # Итог, по одной строке на уровень: дети отдела «ИТ» не попадают в результат запроса
+        self.assertEqual(
+            [(row.level, row.department, row.pages) for row in rows],
+            [(0, None, 45), (1, "Кадры", 30), (2, "Кадры", 30), (3, "Кадры", 30), (4, "Кадры", 30)],
+        )
+        self.assertEqual(rows[1].siblings, 2)
+
+    def test_node_children_levels(self):
+        departments = tree_node_children(self.start, self.end)
+        self.assertEqual(departments["level"], "departments")
+        self.assertEqual(departments["total"], 45)
+        self.assertEqual([(node["name"], node["total"]) for node in departments["nodes"]], [("Кадры", 30), ("ИТ", 15)])
+        self.assertIsNone(departments["other"])
+
+        it_params = departments["nodes"][1]["params"]
+        printers = tree_node_children(self.start, self.end, **it_params)
+        self.assertEqual(printers["level"], "printers")
+        self.assertEqual(printers["nodes"][0]["name"], "HP400-101-1")
+
+        users = tree_node_children(self.start, self.end, **printers["nodes"][0]["params"])
+        self.assertEqual(
+            [(node["name"], node["percent"]) for node in users["nodes"]], [("Алиса", 86.7), ("Борис", 13.3)]
+        )
+
+        documents = tree_node_children(self.start, self.end, **users["nodes"][0]["params"])
+        self.assertEqual(documents["level"], "documents")
+        self.assertEqual(
+            [(node["name"], node["total"]) for node in documents["nodes"]], [("report.pdf", 12), ("memo.docx", 1)]
+        )
+        self.assertIsNone(documents["nodes"][0]["params"])
+
+    def test_node_children_limit_collapses_rest_into_other(self):
+        data = tree_node_children(self.start, self.end, limit=1)
+        self.assertEqual(len(data["nodes"]), 1)
+        self.assertEqual(data["other"], {"count": 1, "total": 15, "percent": 33.3})
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -102,6 +103,34 @@ class PrintingViewsTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_print_tree_lazy_mode(self):
+        """Ленивое дерево: на странице только отделы, дети — из JSON-эндпоинта."""
+        self.client.login(username="testuser", password="testpass")
+        today = timezone.localdate().strftime("%Y-%m-%d")
+        period = {"start_date": today, "end_date": today}
+
+        response = self.client.get("/tree/", {**period, "mode": "lazy"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["lazy"])
+        self.assertContains(response, 'id="lazy-tree"')
+        self.assertContains(response, f"data-params='{{\"department\": {self.department.pk}}}'")
+
+        response = self.client.get("/tree/nodes/", {**period, "department": self.department.pk})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["level"], "printers")
+        self.assertEqual(data["nodes"][0]["params"], {"department": self.department.pk, "printer": self.printer.pk})
+
+        response = self.client.get("/tree/nodes/", {**period, "printer": self.printer.pk, "user": self.user.pk})
+        self.assertEqual(response.json()["level"], "documents")
+        self.assertEqual(response.json()["total"], 5)
+
+    def test_print_tree_nodes_invalid_params(self):
+        """Некорректные параметры узла — 400."""
+        self.client.login(username="testuser", password="testpass")
+        self.assertEqual(self.client.get("/tree/nodes/", {"department": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get("/tree/nodes/", {"user": self.user.pk}).status_code, 400)
+
     def test_import_users_view_get(self):
         """Тест GET запроса страницы импорта пользователей."""
         self.client.login(username="testuser", password="testpass")
@@ -190,3 +219,66 @@ class PrintingViewsTests(TestCase):
         response = self.client.get("/user-info/")
 
         self.assertEqual(response.status_code, 200)
+
+    def test_import_print_events_view_streams_json_body(self):
+        """Тело запроса разбирается потоково, без json.loads(request.body)."""
+        import json
+
+        self.client.login(username="testuser", password="testpass")
+        events = [
+            {
+                "JobID": f"stream_job_{i}",
+                "Param1": i,
+                "Param2": "test.pdf",
+                "Param3": "testuser",
+                "Param5": "HP400-BLD1-IT-ROOM1-1",
+                "Param7": 1024,
+                "Param8": 1,
+                "TimeCreated": "/Date(1696000000000)/",
+            }
+            for i in range(20)
+        ]
+
+        response = self.client.post(
+            "/import/print-events/", data=json.dumps(events), content_type="application/json", **self.import_headers
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"]["created"], 20)
+
+    def test_import_print_events_view_rejects_non_list(self):
+        """Документ, не являющийся массивом, отклоняется до импорта."""
+        self.client.login(username="testuser", password="testpass")
+
+        response = self.client.post(
+            "/import/print-events/", data='{"a": 1}', content_type="application/json", **self.import_headers
+        )
+
+        self.assertEqual(response.context["result"]["error"], "Неверный формат. Ожидается список событий")
+
+    def test_import_print_events_view_skips_already_ingested_payload(self):
+        """Повторная загрузка того же содержимого не разбирается (журнал IngestLedger)."""
+        import json
+
+        from printing.models import IngestLedger
+
+        self.client.login(username="testuser", password="testpass")
+        payload = json.dumps([{"JobID": "ledger_job", "Param3": "testuser", "Param5": "HP400-BLD1-IT-ROOM1-1"}])
+
+        first = self.client.post(
+            "/import/print-events/", data=payload, content_type="application/json", **self.import_headers
+        )
+        with patch("printing.views.import_print_events") as import_mock:
+            second = self.client.post(
+                "/import/print-events/", data=payload, content_type="application/json", **self.import_headers
+            )
+
+        self.assertEqual(first.context["result"]["created"], 1)
+        import_mock.assert_not_called()
+        self.assertTrue(second.context["result"]["already_imported"])
+        self.assertContains(second, "Этот файл уже импортирован")
+        entry = IngestLedger.objects.get()
+        self.assertEqual(entry.status, IngestLedger.STATUS_DONE)
+        self.assertEqual(entry.created_count, 1)
+        self.assertEqual(entry.skipped_count, 1)
+        self.assertEqual(entry.source, IngestLedger.SOURCE_UPLOAD)
@@ -0,0 +1,105 @@
+import threading
+from datetime import date, datetime
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from printing import services as svc
+from printing.warming import StatsCacheWarmer, periods_to_warm, warm_statistics_cache
+from tests.factories import DepartmentFactory, PrinterFactory, UserFactory
+
+
+class WarmPeriodsTests(TestCase):
+    def test_periods_for_imported_dates(self):
+        today = date(2025, 3, 15)
+        dates = {date(2025, 1, 5), date(2025, 1, 20), date(2025, 3, 14)}
+
+        self.assertEqual(
+            periods_to_warm(dates, ["current_month", "touched_months"], today=today),
+            [(date(2025, 3, 1), today), (date(2025, 1, 1), date(2025, 1, 31))],
+        )
+        self.assertEqual(periods_to_warm(dates, ["dashboard"], today=today), [])
+
+
+class WarmStatisticsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory(username="alice", department=DepartmentFactory(code="IT"))
+        PrinterFactory()
+
+    def _import(self, when):
+        return svc.import_print_events(
+            [
+                {
+                    "JobID": f"job-{when:%Y%m%d}",
+                    "Param1": 1,
+                    "Param2": "doc.pdf",
+                    "Param3": "alice",
+                    "Param5": "hp-bld1-it-101-1",
+                    "Param7": 100,
+                    "Param8": 3,
+                    "TimeCreated": f"/Date({int(when.timestamp() * 1000)})/",
+                }
+            ]
+        )
+
+    def test_warmed_periods_are_served_from_cache(self):
+        self._import(timezone.now())
+        start_dt, end_dt = svc.period_bounds(timezone.localdate().replace(day=1), timezone.localdate())
+
+        self.assertEqual(warm_statistics_cache([timezone.localdate()]), 2)
+
+        with self.assertNumQueries(0):
+            data = svc.get_statistics_data(start_date=start_dt, end_date=end_dt)
+            tree = svc.get_print_tree(start_dt, end_dt)
+            dashboard = svc.get_dashboard_stats(days=30)
+        self.assertEqual([dept.total_pages for dept in data["department_stats"]], [3])
+        self.assertEqual(tree["total_pages"], 3)
+        self.assertEqual(dashboard["total_pages"], 3)
+
+    @override_settings(STATS_WARM_MODE="sync")
+    def test_import_triggers_warming_after_commit(self):
+        past = timezone.make_aware(datetime(2025, 1, 10, 12, 0))
+        with (
+            patch("printing.signals.schedule_statistics_warming") as schedule,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self._import(past)
+        schedule.assert_called_once_with({date(2025, 1, 10)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._import(past.replace(day=11))
+        start_dt, end_dt = svc.period_bounds(date(2025, 1, 1), date(2025, 1, 31))
+        with self.assertNumQueries(0):
+            self.assertEqual(svc.get_print_tree(start_dt, end_dt)["total_pages"], 6)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("warm_statistics_cache", "--date", "2025-01-10", "--periods", "touched_months", stdout=out)
+        self.assertIn("Кэш прогрет: 1 периодов", out.getvalue())
+
+
+class StatsCacheWarmerTests(TestCase):
+    def test_schedules_coalesce_into_one_background_run(self):
+        done = threading.Event()
+        calls = []
+
+        def warm(dates):
+            calls.append(set(dates))
+            done.set()
+            return 0
+
+        warmer = StatsCacheWarmer(delay=0.2)
+        with patch("printing.warming.warm_statistics_cache", side_effect=warm):
+            warmer.schedule([date(2025, 1, 1)])
+            warmer.schedule([date(2025, 2, 1)])
+            self.assertTrue(done.wait(5))
+            thread = warmer._thread
+            if thread is not None:
+                thread.join(5)
+
+        self.assertEqual(calls, [{date(2025, 1, 1), date(2025, 2, 1)}])
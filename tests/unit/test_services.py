@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import io
+from unittest.mock import patch
 
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from accounts.models import User
-from printing.models import Department, PrintEvent
-from printing.services import import_print_events, import_users_from_csv_stream
+from printing.models import Department, PrintDailyRollup, PrintEvent
+from printing.services import _UserDiffSync, import_print_events, import_users_from_csv_stream
 
 
 class ImportUsersServiceTests(TestCase):
@@ -42,3 +45,272 @@ class ImportPrintEventsServiceTests(TestCase):
         self.assertEqual(result["created"], 1)
         self.assertFalse(result["errors"])
         self.assertTrue(PrintEvent.objects.filter(job_id="job-1").exists())
+
+
+class BulkImportPrintEventsTests(TestCase):
+    """Тесты set-based импорта событий печати."""
+
+    def setUp(self):
+        self.ts = f"/Date({int(timezone.now().timestamp() * 1000)})/"
+
+    def _event(self, job_id, **overrides):
+        event = {
+            "JobID": job_id,
+            "Param1": 1,
+            "Param2": f"{job_id}.pdf",
+            "Param3": "user1",
+            "Param4": "PC-01",
+            "Param5": "hp-bld1-it-101-1",
+            "Param6": "USB001",
+            "Param7": 2048,
+            "Param8": 2,
+            "TimeCreated": self.ts,
+        }
+        event.update(overrides)
+        return event
+
+    def test_dimensions_resolved_with_constant_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from printing.models import Building, Computer, Port, Printer
+
+        events = [
+            self._event(f"job-{i}", Param3=f"user{i % 5}", Param5=f"hp-bld1-it-10{i % 3}-1", Param4=f"pc-{i % 7}")
+            for i in range(300)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            result = import_print_events(events)
+
+        self.assertEqual(result["created"], 300)
+        self.assertEqual(PrintEvent.objects.count(), 300)
+        self.assertEqual(Building.objects.count(), 1)
+        self.assertEqual(Printer.objects.count(), 3)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Computer.objects.count(), 7)
+        self.assertEqual(Port.objects.count(), 1)
+        # Число запросов (включая SAVEPOINT) не зависит от количества событий
+        self.assertLess(len(ctx.captured_queries), 60)
+
+    def test_matches_existing_dimensions_case_insensitively(self):
+        dept = Department.objects.create(code="IT", name="IT")
+        user = User.objects.create_user(username="User1", password="x", department=dept)
+
+        result = import_print_events([self._event("job-1", Param3="USER1")])
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(Department.objects.count(), 1)
+        self.assertEqual(PrintEvent.objects.get(job_id="job-1").user, user)
+
+    def test_duplicates_skipped_within_batch_and_on_reimport(self):
+        events = [self._event("job-1"), self._event("job-1"), self._event("", Param1=7)]
+
+        first = import_print_events(events)
+        second = import_print_events(events)
+
+        self.assertEqual(first["created"], 2)
+        self.assertEqual(second["created"], 0)
+        self.assertFalse([e for e in second["errors"] if "automatically created" not in e])
+        self.assertEqual(PrintEvent.objects.filter(job_id__startswith="AUTO-").count(), 1)
+
+    def test_invalid_events_reported_and_valid_ones_imported(self):
+        events = [
+            self._event("job-1"),
+            self._event("job-2", Param3=""),
+            self._event("job-3", Param5="broken-printer"),
+            self._event("job-4", Param5="hp-bld1-it-101-x"),
+            self._event("job-5", Param8="many"),
+        ]
+
+        result = import_print_events(events)
+
+        self.assertEqual(result["created"], 1)
+        self.assertIn("Missing username (Param3)", result["errors"])
+        self.assertIn("Invalid printer format: broken-printer", result["errors"])
+        self.assertIn("Invalid printer index: x", result["errors"])
+        self.assertTrue(any(e.startswith("Event validation error") for e in result["errors"]))
+
+    def test_failed_row_does_not_abort_chunk(self):
+        events = [self._event("job-1"), self._event("job-2", Param2=None), self._event("job-3")]
+
+        result = import_print_events(events)
+
+        self.assertEqual(result["created"], 2)
+        self.assertTrue(any(e.startswith("Event integrity error") for e in result["errors"]))
+        self.assertFalse(PrintEvent.objects.filter(job_id="job-2").exists())
+
+    def test_statistics_cache_invalidated_once_per_import(self):
+        from django.core.cache import cache
+
+        from printing.services import STATS_CACHE_VERSION_KEY, print_events_imported
+
+        calls = []
+        print_events_imported.connect(lambda **kwargs: calls.append(kwargs), weak=False, dispatch_uid="test_import")
+        self.addCleanup(print_events_imported.disconnect, dispatch_uid="test_import")
+        cache.set(STATS_CACHE_VERSION_KEY, 1, None)
+
+        import_print_events([self._event(f"job-{i}") for i in range(10)])
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["dates"], {timezone.localdate()})
+        # Глобальная версия не меняется — сбрасывается только текущий месяц
+        self.assertEqual(cache.get(STATS_CACHE_VERSION_KEY), 1)
+
+    def test_import_invalidates_only_touched_months(self):
+        from datetime import date, datetime
+
+        from printing.services import get_stats_cache_token
+
+        january = get_stats_cache_token(date(2025, 1, 1), date(2025, 1, 31))
+        march = get_stats_cache_token(date(2025, 3, 1), date(2025, 3, 31))
+        year = get_stats_cache_token(date(2025, 1, 1), date(2025, 12, 31))
+        when = timezone.make_aware(datetime(2025, 3, 15, 12, 0))
+
+        import_print_events([self._event("job-march", TimeCreated=f"/Date({int(when.timestamp() * 1000)})/")])
+
+        self.assertEqual(get_stats_cache_token(date(2025, 1, 1), date(2025, 1, 31)), january)
+        self.assertNotEqual(get_stats_cache_token(date(2025, 3, 1), date(2025, 3, 31)), march)
+        self.assertNotEqual(get_stats_cache_token(date(2025, 1, 1), date(2025, 12, 31)), year)
+
+
+class ImportUsersBulkTests(TestCase):
+    def _import(self, csv_content: str, **kwargs):
+        return import_users_from_csv_stream(io.BytesIO(csv_content.encode("utf-8-sig")), **kwargs)
+
+    def test_bulk_upsert_creates_and_updates(self):
+        it = Department.objects.create(code="IT", name="IT")
+        User.objects.create_user(username="user1", fio="Old Name", department=it, is_active=False)
+
+        result = self._import(
+            "SamAccountName,DisplayName,OU\nUSER1,User One,hr\nuser2,,it\nuser2,User Two,it\n,No Login,IT\n"
+        )
+
+        self.assertEqual(result, {"created": 1, "updated": 1, "unchanged": 0, "deactivated": 0, "errors": []})
+        user1 = User.objects.get(username="user1")
+        self.assertEqual((user1.fio, user1.department.code, user1.is_active), ("User One", "HR", True))
+        # Последняя строка с тем же логином побеждает, отдел найден без учёта регистра
+        user2 = User.objects.get(username="user2")
+        self.assertEqual((user2.fio, user2.department_id), ("User Two", it.pk))
+        self.assertEqual(Department.objects.filter(code__iexact="it").count(), 1)
+
+    def test_bulk_upsert_uses_constant_number_of_queries(self):
+        rows = "".join(f"user{i},User {i},DEPT{i % 3}\n" for i in range(200))
+        with CaptureQueriesContext(connection) as queries:
+            result = self._import("SamAccountName,DisplayName,OU\n" + rows)
+        self.assertEqual(result["created"], 200)
+        # Построчный импорт делал бы несколько запросов на каждую строку
+        self.assertLess(len(queries), 20)
+
+    def test_bulk_failure_falls_back_to_rows_with_line_numbers(self):
+        csv_content = "SamAccountName,DisplayName,OU\nuser1,User One,IT\nuser2,User Two,HR\n"
+        with patch("printing.services._UserDiffSync.apply", side_effect=IntegrityError("boom")):
+            result = self._import(csv_content)
+        self.assertEqual(result["created"], 2)
+        self.assertTrue(User.objects.filter(username="user2").exists())
+
+        with patch("printing.services._get_or_create_ci_department", side_effect=ValueError("bad OU")):
+            result = self._import("SamAccountName,DisplayName,OU\nuser3,User Three,IT\n", bulk=False)
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["errors"], ["Row validation error (line 2): bad OU"])
+
+    def test_row_fallback_keeps_imported_users_active(self):
+        it = Department.objects.create(code="IT", name="IT")
+        for username in ("alice", "bob", "gone"):
+            User.objects.create_user(username=username, fio="Old", department=it)
+        apply = _UserDiffSync.apply
+        calls = []
+
+        def failing_first_apply(sync, rows):
+            calls.append(rows)
+            if len(calls) == 1:
+                raise IntegrityError("boom")
+            apply(sync, rows)
+
+        with (
+            patch("printing.services.USERS_IMPORT_CHUNK_SIZE", 1),
+            patch("printing.services._UserDiffSync.apply", failing_first_apply),
+        ):
+            result = self._import(
+                "SamAccountName,DisplayName,OU\nalice,Alice,IT\nbob,Bob,IT\n", deactivate_missing=True
+            )
+
+        self.assertEqual((result["updated"], result["deactivated"]), (2, 1))
+        self.assertTrue(User.objects.get(username="alice").is_active)
+        self.assertFalse(User.objects.get(username="gone").is_active)
+
+    def test_deactivation_skipped_on_errors_and_keeps_rows_without_ou(self):
+        it = Department.objects.create(code="IT", name="IT")
+        for username in ("nodept", "gone"):
+            User.objects.create_user(username=username, department=it)
+
+        result = self._import(
+            "SamAccountName,DisplayName,OU\nuser1,User One,IT\nnodept,No Dept,\n", deactivate_missing=True
+        )
+        self.assertEqual(result["deactivated"], 1)
+        self.assertTrue(User.objects.get(username="nodept").is_active)
+        self.assertFalse(User.objects.get(username="gone").is_active)
+
+        # Ошибка в строке — выгрузка неполна, никто не деактивируется
+        User.objects.filter(username="gone").update(is_active=True)
+        with (
+            patch("printing.services._UserDiffSync.apply", side_effect=IntegrityError("boom")),
+            patch("printing.services._upsert_user_row", side_effect=ValueError("bad row")),
+        ):
+            result = self._import("SamAccountName,DisplayName,OU\nuser1,User One,IT\n", deactivate_missing=True)
+        self.assertEqual(result["deactivated"], 0)
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertTrue(User.objects.get(username="gone").is_active)
+
+    def test_bulk_department_change_moves_rollups(self):
+        it = Department.objects.create(code="IT", name="IT")
+        user = User.objects.create_user(username="user1", department=it)
+        events = [
+            {
+                "Param3": "user1",
+                "Param2": "doc.pdf",
+                "Param1": 1,
+                "Param7": 10,
+                "Param8": 2,
+                "TimeCreated": f"/Date({int(timezone.now().timestamp() * 1000)})/",
+                "JobID": "job-1",
+                "Param5": "HP-1-it-101-1",
+            }
+        ]
+        import_print_events(events)
+
+        self._import("SamAccountName,DisplayName,OU\nuser1,User One,HR\n")
+
+        hr = Department.objects.get(code="HR")
+        self.assertEqual(
+            set(PrintDailyRollup.objects.filter(user=user).values_list("department_id", flat=True)), {hr.pk}
+        )
+
+    def test_diff_sync_writes_only_changed_rows(self):
+        csv_content = "SamAccountName,DisplayName,OU\nuser1,User One,IT\nuser2,User Two,HR\n"
+        self._import(csv_content)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self._import(csv_content.replace("User Two", "User 2"))
+
+        self.assertEqual((result["created"], result["updated"], result["unchanged"]), (0, 1, 1))
+        writes = [q["sql"] for q in queries.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn("User 2", writes[0])
+        self.assertEqual(User.objects.get(username="user2").fio, "User 2")
+
+    def test_diff_sync_deactivates_missing_users(self):
+        it = Department.objects.create(code="IT", name="IT")
+        User.objects.create_user(username="gone", department=it)
+        User.objects.create_user(username="admin", department=it, is_staff=True)
+
+        result = self._import("SamAccountName,DisplayName,OU\nuser1,User One,IT\n", deactivate_missing=True)
+
+        self.assertEqual(result["deactivated"], 1)
+        self.assertFalse(User.objects.get(username="gone").is_active)
+        self.assertTrue(User.objects.get(username="admin").is_active)
+
+        # Без флага (по умолчанию) отсутствующие пользователи не трогаются, возвращённый — активируется
+        result = self._import("SamAccountName,DisplayName,OU\ngone,Gone,IT\n")
+        self.assertEqual((result["updated"], result["deactivated"]), (1, 0))
+        self.assertTrue(User.objects.get(username="gone").is_active)
+        self.assertTrue(User.objects.get(username="user1").is_active)